@@ -197,6 +197,8 @@ const syncFormSubmission = async (activeJob = {}) => {
           });
 
         const syncData = {
+          // stable across retries, the server stores a submission once
+          submissionId: `${d.id}-${d.createdAt}`,
           formId: d.formId,
           name: d.name,
           duration: Math.round(d.duration),
@@ -1,4 +1,5 @@
 import re
+from collections import Counter
 from uuid import uuid4
 from django.db.models import Sum, Count, Q, F
 from django.db import transaction
@@ -547,16 +548,18 @@ class ListBatchSummarySerializer(serializers.ModelSerializer):
                 .count()
             )
         else:
-            data = []
-            for option in instance.question.options.all():
-                val = Answers.objects.filter(
-                    data__data_batch_list__batch=batch,
-                    data__is_pending=True,
-                    question_id=instance.question.id,
-                    options__contains=option.value,
-                ).count()
-                data.append({"type": option.label, "total": val})
-            return data
+            # count every option from one query instead of one per option
+            counts = Counter()
+            for options in Answers.objects.filter(
+                data__data_batch_list__batch=batch,
+                data__is_pending=True,
+                question_id=instance.question.id,
+            ).values_list("options", flat=True):
+                counts.update(set(options or []))
+            return [
+                {"type": option.label, "total": counts[option.value]}
+                for option in instance.question.options.all()
+            ]
 
     class Meta:
         model = Answers
@@ -1,4 +1,3 @@
-from math import ceil
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import (
     extend_schema,
@@ -8,7 +7,6 @@ from drf_spectacular.utils import (
 from rest_framework import serializers, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.generics import get_object_or_404
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -38,7 +36,7 @@ from api.v1.v1_forms.constants import (
 from api.v1.v1_forms.models import Questions
 from api.v1.v1_users.models import SystemUser
 from api.v1.v1_data.models import Answers
-from mis.settings import REST_FRAMEWORK
+from utils.custom_pagination import KeysetPagination
 from utils.custom_permissions import (
     IsSuperAdmin,
     IsSubmitter,
@@ -85,6 +83,12 @@ period_length = 60 * 15
             type=OpenApiTypes.BOOL,
             location=OpenApiParameter.QUERY,
         ),
+        OpenApiParameter(
+            name="cursor",
+            required=False,
+            type=OpenApiTypes.STR,
+            location=OpenApiParameter.QUERY,
+        ),
     ],
     summary="To get list of pending batch",
 )
@@ -98,7 +102,6 @@ def list_pending_batch(request, version):
             status=status.HTTP_400_BAD_REQUEST,
         )
     user: SystemUser = request.user
-    page_size = REST_FRAMEWORK.get("PAGE_SIZE")
 
     subordinate = serializer.validated_data.get("subordinate")
     approved = serializer.validated_data.get("approved")
@@ -166,16 +169,13 @@ def list_pending_batch(request, version):
             approved=approved,
         )
     queryset = queryset.distinct().order_by("-id")
-    paginator = PageNumberPagination()
-    paginator.paginate_queryset(queryset, request)
-    total = queryset.count()
+    paginator = KeysetPagination(ordering=["-id"])
+    instance = paginator.paginate_queryset(queryset, request)
 
     data = {
-        "current": int(request.GET.get("page", "1")),
-        "total": total,
-        "total_page": ceil(total / page_size),
+        **paginator.get_page_info(),
         "batch": ListDataBatchSerializer(
-            instance=queryset,
+            instance=instance,
             context={
                 "user": user,
                 "approved": approved,
@@ -271,6 +271,12 @@ class BatchView(APIView):
                 type=OpenApiTypes.BOOL,
                 location=OpenApiParameter.QUERY,
             ),
+            OpenApiParameter(
+                name="cursor",
+                required=False,
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+            ),
         ],
     )
     def get(self, request, version):
@@ -288,13 +294,10 @@ class BatchView(APIView):
         if form:
             forms = [form] + list(form.children.all())
             queryset = queryset.filter(form__in=forms)
-        paginator = PageNumberPagination()
+        paginator = KeysetPagination(ordering=["-id"])
         instance = paginator.paginate_queryset(queryset, request)
-        page_size = REST_FRAMEWORK.get("PAGE_SIZE")
         data = {
-            "current": int(request.GET.get("page", "1")),
-            "total": queryset.count(),
-            "total_page": ceil(queryset.count() / page_size),
+            **paginator.get_page_info(),
             "data": ListBatchSerializer(instance=instance, many=True).data,
         }
         return Response(data, status=status.HTTP_200_OK)
@@ -0,0 +1,8 @@
+class DataRollupStatus:
+    pending = 1
+    approved = 2
+
+    FieldStr = {
+        pending: "pending",
+        approved: "approved",
+    }
@@ -1,13 +1,23 @@
 import re
 import base64
 from django.core.cache import cache
+from django.db import connection
+from django.db.models import Exists, OuterRef, Prefetch, Q
+from django.db.models.functions import Substr
 from datetime import datetime
 from django.utils import timezone
 from datetime import timedelta
 from api.v1.v1_forms.constants import QuestionTypes
-from api.v1.v1_data.models import Answers
+from api.v1.v1_data.models import (
+    FormData,
+    Answers,
+    AnswerHistory,
+    DataSnapshot,
+    ANSWER_NAME_PREFIX,
+)
 from api.v1.v1_profile.models import Entity, EntityData
 from faker import Faker
+from rest_framework.exceptions import ValidationError
 
 fake = Faker()
 
@@ -29,6 +39,266 @@ def create_cache(name, resp, timeout=None):
     cache.add(cache_name, resp, timeout=timeout)
 
 
+def get_sync_horizon() -> int:
+    """
+    Oldest transaction still in progress. Every row written by an older
+    transaction is committed, or never will be, so the next round can
+    start from here without missing a change.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT txid_snapshot_xmin(txid_current_snapshot())")
+        return cursor.fetchone()[0]
+
+
+def touch_form_data(data_ids) -> int:
+    """
+    Mark datapoints as written after their answers were changed on
+    their own, so the export cache and the mobile delta sync pick them
+    up again. The sync_txid trigger stamps every updated row.
+    """
+    return FormData.objects_with_deleted.filter(pk__in=data_ids).update(
+        sync_txid=None
+    )
+
+
+def prefetch_form_data_list(queryset, questions=None):
+    """
+    Resolve everything ListFormDataSerializer reads for a page of
+    form data in a fixed number of queries: the creators, the
+    first pending child and the answers of the selected questions
+    """
+    queryset = queryset.select_related(
+        "created_by", "updated_by"
+    ).prefetch_related(
+        Prefetch(
+            "children",
+            queryset=FormData.objects.filter(
+                is_pending=True
+            ).select_related("created_by").order_by("pk"),
+            to_attr="pending_children",
+        )
+    )
+    if questions:
+        queryset = queryset.prefetch_related(
+            Prefetch(
+                "data_answer",
+                queryset=Answers.objects.filter(
+                    question__in=questions
+                ).select_related("question").order_by("question_id", "index"),
+                to_attr="selected_answers",
+            )
+        )
+    return queryset
+
+
+def prefetch_data_json(queryset):
+    """
+    Load what FormData.to_json needs for many datapoints at once
+    """
+    return queryset.select_related("form").prefetch_related(
+        Prefetch(
+            "data_answer",
+            queryset=Answers.objects.select_related("question").order_by(
+                "question__question_group_id", "question__order"
+            ),
+            to_attr="ordered_answers",
+        )
+    )
+
+
+def publish_data_json(ids):
+    """
+    Write the datapoint JSON of the given form data ids in a fixed
+    number of queries, returns how many were published
+    """
+    data = prefetch_data_json(
+        FormData.objects.filter(pk__in=ids, form__parent__isnull=True)
+    )
+    data = list(data)
+    snapshots = DataSnapshot.objects.in_bulk(
+        [str(d.uuid) for d in data], field_name="uuid"
+    )
+    for d in data:
+        d.publish_json(snapshots.get(str(d.uuid)))
+    return len(data)
+
+
+def parse_answer_criteria(values, size=2):
+    """
+    Split `question_id||value[||value]` filters, as sent by the
+    advanced filters of the dashboard, into lists of parts
+    """
+    criteria = []
+    for value in values:
+        parts = value.split("||")
+        if len(parts) != size or not parts[0].isdigit():
+            raise ValueError(value)
+        criteria.append([int(parts[0])] + parts[1:])
+    return criteria
+
+
+def filter_form_data_by_answers(
+    queryset, options=None, numbers=None, texts=None
+):
+    """
+    Narrow form data down with one EXISTS per question: options of
+    the same question are OR-ed, different questions are AND-ed.
+    Each subquery is served by the answer indexes (GIN on options,
+    question/value and question/name prefix).
+    """
+    conditions = {}
+    for question_id, option in options or []:
+        conditions.setdefault(question_id, Q())
+        conditions[question_id] |= Q(options__contains=[option])
+    for question_id, minimum, maximum in numbers or []:
+        condition = Q()
+        if minimum != "":
+            condition &= Q(value__gte=float(minimum))
+        if maximum != "":
+            condition &= Q(value__lte=float(maximum))
+        conditions.setdefault(question_id, Q())
+        conditions[question_id] |= condition
+    for question_id, text in texts or []:
+        conditions.setdefault(question_id, Q())
+        conditions[question_id] |= Q(
+            name_prefix=text[:ANSWER_NAME_PREFIX], name=text
+        )
+    for question_id, condition in conditions.items():
+        answers = Answers.objects.annotate(
+            name_prefix=Substr("name", 1, ANSWER_NAME_PREFIX)
+        ).filter(condition, data=OuterRef("pk"), question_id=question_id)
+        queryset = queryset.filter(Exists(answers))
+    return queryset
+
+
+def validate_answer_value(question, value):
+    """
+    Check a submitted value against the question type, administration
+    values are returned as integers
+    """
+    if value == "" or (isinstance(value, list) and len(value) == 0):
+        raise ValidationError(
+            "Value is required for Question:{0}".format(question.id)
+        )
+    if not isinstance(value, list) and question.type in [
+        QuestionTypes.geo,
+        QuestionTypes.option,
+        QuestionTypes.multiple_option,
+    ]:
+        raise ValidationError(
+            "Valid list value is required for Question:{0}".format(
+                question.id
+            )
+        )
+    elif not isinstance(value, str) and question.type in [
+        QuestionTypes.text,
+        QuestionTypes.photo,
+        QuestionTypes.date,
+        QuestionTypes.attachment,
+        QuestionTypes.signature,
+    ]:
+        raise ValidationError(
+            "Valid string value is required for Question:{0}".format(
+                question.id
+            )
+        )
+    elif not isinstance(value, (int, float)) and question.type in [
+        QuestionTypes.number,
+        QuestionTypes.administration,
+        QuestionTypes.cascade,
+    ]:
+        raise ValidationError(
+            "Valid number value is required for Question:{0}".format(
+                question.id
+            )
+        )
+    if question.type == QuestionTypes.administration:
+        return int(float(value))
+    return value
+
+
+def get_answer_fields(question, value):
+    """
+    Map a submitted value onto the (name, value, options) columns
+    """
+    if question.type in [
+        QuestionTypes.geo,
+        QuestionTypes.option,
+        QuestionTypes.multiple_option,
+    ]:
+        return None, None, value
+    if question.type in [
+        QuestionTypes.text,
+        QuestionTypes.photo,
+        QuestionTypes.date,
+        QuestionTypes.attachment,
+        QuestionTypes.signature,
+    ]:
+        return value, None, None
+    # for administration,number question type
+    return None, value, None
+
+
+def bulk_update_answers(data, answers, user, create_missing=True):
+    """
+    Apply validated answers to a datapoint in a fixed number of
+    queries: the current answers are loaded at once, moved to the
+    history with bulk_create and overwritten with bulk_update.
+    Should run inside a transaction.
+    """
+    submitted = {a["question"].id: a for a in answers}
+    current = {}
+    for answer in Answers.objects.filter(
+        data=data, question_id__in=list(submitted)
+    ).order_by("pk"):
+        current.setdefault(answer.question_id, answer)
+
+    missing = set(submitted) - set(current)
+    if missing and not create_missing:
+        raise Answers.DoesNotExist(
+            "No answer for question {0}".format(
+                ", ".join(map(str, sorted(missing)))
+            )
+        )
+
+    now = timezone.now()
+    history, updated, created = [], [], []
+    for question_id, answer in submitted.items():
+        form_answer = current.get(question_id)
+        if form_answer:
+            history.append(
+                AnswerHistory(
+                    data=data,
+                    question_id=question_id,
+                    name=form_answer.name,
+                    value=form_answer.value,
+                    options=form_answer.options,
+                    created_by=user,
+                )
+            )
+            updated.append(form_answer)
+        else:
+            form_answer = Answers(
+                data=data,
+                question_id=question_id,
+                created_by=user,
+            )
+            created.append(form_answer)
+        (
+            form_answer.name,
+            form_answer.value,
+            form_answer.options,
+        ) = get_answer_fields(answer["question"], answer.get("value"))
+        form_answer.updated = now
+
+    AnswerHistory.objects.bulk_create(history)
+    Answers.objects.bulk_update(
+        updated, ["name", "value", "options", "updated"]
+    )
+    Answers.objects.bulk_create(created)
+    return len(history) + len(created)
+
+
 def set_answer_data(data, question):
     name = None
     value = None
@@ -0,0 +1,35 @@
+from django.core.management import BaseCommand
+from api.v1.v1_forms.models import Forms
+from api.v1.v1_data.pivot import (
+    drop_pivot_table,
+    get_pivot_form_ids,
+    rebuild_pivot_table,
+)
+
+
+class Command(BaseCommand):
+    help = "Create or rebuild the wide answer pivot table of forms"
+
+    def add_arguments(self, parser):
+        parser.add_argument("form", nargs="*", type=int)
+        parser.add_argument(
+            "-d",
+            "--drop",
+            nargs="?",
+            const=1,
+            default=False,
+            type=int,
+            help="Drop the tables first, e.g. after question type changes",
+        )
+        parser.add_argument(
+            "-t", "--test", nargs="?", const=1, default=False, type=int
+        )
+
+    def handle(self, *args, **options):
+        form_ids = options.get("form") or get_pivot_form_ids()
+        for form in Forms.objects.filter(pk__in=form_ids).order_by("id"):
+            if options.get("drop"):
+                drop_pivot_table(form.id)
+            total = rebuild_pivot_table(form)
+            if not options.get("test"):
+                self.stdout.write(f"{form.name}: {total} rows")
@@ -0,0 +1,17 @@
+from django.core.management import BaseCommand
+from api.v1.v1_data.rollup import rebuild_data_rollup
+
+
+class Command(BaseCommand):
+    help = "Count the submissions per form, administration, month and status"
+
+    def add_arguments(self, parser):
+        parser.add_argument("form", nargs="*", type=int)
+        parser.add_argument(
+            "-t", "--test", nargs="?", const=1, default=False, type=int
+        )
+
+    def handle(self, *args, **options):
+        total = rebuild_data_rollup(form_ids=options.get("form"))
+        if not options.get("test"):
+            self.stdout.write(f"{total} rollup rows")
@@ -1,6 +1,37 @@
+import os
+import multiprocessing
+import django
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from django.core.management import BaseCommand
+from django.db import connections
+from api.v1.v1_data.functions import publish_data_json
 from api.v1.v1_data.models import FormData
 
+CHECKPOINT_FILE = "./tmp/generate_data_json.checkpoint"
+
+
+def publish_chunk(ids):
+    # runs in a spawned pool process with its own connection
+    total = publish_data_json(ids)
+    connections.close_all()
+    return ids[-1], total
+
+
+def read_checkpoint():
+    if not os.path.exists(CHECKPOINT_FILE):
+        return 0
+    with open(CHECKPOINT_FILE, "r") as f:
+        value = f.read().strip()
+    return int(value) if value.isdigit() else 0
+
+
+def write_checkpoint(last_id):
+    os.makedirs(os.path.dirname(CHECKPOINT_FILE), exist_ok=True)
+    tmp_file = f"{CHECKPOINT_FILE}.tmp"
+    with open(tmp_file, "w") as f:
+        f.write(str(last_id))
+    os.replace(tmp_file, CHECKPOINT_FILE)
+
 
 class Command(BaseCommand):
     def add_arguments(self, parser):
@@ -12,18 +43,109 @@ class Command(BaseCommand):
             default=False,
             type=int
         )
+        parser.add_argument(
+            "-c", "--chunk-size", nargs="?", default=500, type=int
+        )
+        parser.add_argument(
+            "-w", "--workers", nargs="?", default=1, type=int
+        )
+        parser.add_argument(
+            "-r",
+            "--resume",
+            nargs="?",
+            const=1,
+            default=False,
+            type=int,
+            help="Continue after the last completed chunk",
+        )
+
+    def get_chunks(self, queryset, chunk_size):
+        # server side cursor, ids are never all held in memory
+        chunk = []
+        for pk in queryset.values_list("id", flat=True).iterator(
+            chunk_size=chunk_size
+        ):
+            chunk.append(pk)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
 
     def handle(self, *args, **options):
         test = options.get("test")
+        chunk_size = max(options.get("chunk_size"), 1)
+        workers = max(options.get("workers"), 1)
         data = FormData.objects.filter(
             is_pending=False, form__parent__isnull=True
-        ).all()
-        for d in data:
-            d.save_to_file
+        ).order_by("id")
+        if options.get("resume"):
+            data = data.filter(id__gt=read_checkpoint())
+        total = data.count()
+        chunks = self.get_chunks(data, chunk_size)
+
+        done = 0
+        if workers == 1:
+            for ids in chunks:
+                done += publish_data_json(ids)
+                write_checkpoint(ids[-1])
+                self.report(done, total, test)
+        else:
+            done = self.run_pool(chunks, workers, total, test)
+        if os.path.exists(CHECKPOINT_FILE):
+            os.remove(CHECKPOINT_FILE)
         if not test:
             self.stdout.write(
                 self.style.SUCCESS(
-                    f"Successfully saved {data.count()} "
+                    f"Successfully saved {done} "
                     "form data entries to file."
                 )
             )
+
+    def run_pool(self, chunks, workers, total, test):
+        done = 0
+        # the checkpoint only moves past chunks that all finished
+        pending = []
+        finished = set()
+        running = set()
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=django.setup,
+        ) as executor:
+            for ids in chunks:
+                pending.append(ids[-1])
+                running.add(executor.submit(publish_chunk, ids))
+                # keep a bounded number of chunks in flight
+                if len(running) < workers * 2:
+                    continue
+                completed, running = wait(
+                    running, return_when=FIRST_COMPLETED
+                )
+                done += self.collect(completed, pending, finished)
+                self.report(done, total, test)
+            while running:
+                completed, running = wait(
+                    running, return_when=FIRST_COMPLETED
+                )
+                done += self.collect(completed, pending, finished)
+                self.report(done, total, test)
+        return done
+
+    def collect(self, completed, pending, finished):
+        count = 0
+        for future in completed:
+            last_id, total = future.result()
+            count += total
+            finished.add(last_id)
+        checkpoint = None
+        while pending and pending[0] in finished:
+            checkpoint = pending.pop(0)
+        if checkpoint:
+            write_checkpoint(checkpoint)
+        return count
+
+    def report(self, done, total, test):
+        if test:
+            return
+        self.stdout.write(f"{done}/{total} form data entries saved")
@@ -1,4 +1,4 @@
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, call_command
 from api.v1.v1_forms.models import Questions, QuestionOptions
 from api.v1.v1_forms.constants import QuestionTypes
 from api.v1.v1_data.models import (
@@ -6,9 +6,12 @@ from api.v1.v1_data.models import (
     Answers,
     AnswerHistory,
 )
+from api.v1.v1_data.functions import touch_form_data
+from api.v1.v1_data.tasks import queue_data_publish
 
 
 def set_answer_data(answers, option_labels, option_dict, model_name):
+    data_ids = set()
     for answer in answers:
         new_answer = []
         for answer_option in answer.options:
@@ -19,6 +22,8 @@ def set_answer_data(answers, option_labels, option_dict, model_name):
         if len(new_answer) == len(answer.options):
             answer.options = new_answer
             answer.save()
+            data_ids.add(answer.data_id)
+    return data_ids
 
 
 class Command(BaseCommand):
@@ -35,7 +40,10 @@ class Command(BaseCommand):
 
             # Process all answers (both regular and pending)
             answers = Answers.objects.filter(question=q["id"]).all()
-            set_answer_data(answers, option_labels, option_dict, "Answers")
+            data_ids = set_answer_data(
+                answers, option_labels, option_dict, "Answers"
+            )
+            touch_form_data(data_ids)
 
             # Process all answer history
             answer_history = AnswerHistory.objects.filter(
@@ -46,5 +54,5 @@ class Command(BaseCommand):
             )
 
         # Update files for all form data
-        for data in FormData.objects.all():
-            data.save_to_file
+        queue_data_publish(FormData.objects.only("id", "uuid", "form_id"))
+        call_command("build_answer_pivot", test=True)
@@ -0,0 +1,28 @@
+# Generated by Django 4.0.4 on 2026-10-18 09:21
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.expressions
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('v1_data', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='answers',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['options'], name='answer_options_gin', opclasses=['jsonb_path_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='answers',
+            index=models.Index(fields=['question', 'value'], name='answer_question_value_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='answers',
+            index=models.Index(django.db.models.expressions.F('question'), django.db.models.functions.text.Substr('name', 1, 255), name='answer_question_name_idx'),
+        ),
+    ]
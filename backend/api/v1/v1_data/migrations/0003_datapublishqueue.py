@@ -0,0 +1,27 @@
+# Generated by Django 4.0.4 on 2026-10-18 09:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('v1_data', '0002_answer_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataPublishQueue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(unique=True)),
+                ('queued', models.DateTimeField()),
+                ('requested', models.DateTimeField()),
+                ('data', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='data_publish_queue', to='v1_data.formdata')),
+            ],
+            options={
+                'db_table': 'data_publish_queue',
+            },
+        ),
+    ]
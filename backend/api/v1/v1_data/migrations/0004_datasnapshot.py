@@ -0,0 +1,31 @@
+# Generated by Django 4.0.4 on 2026-10-18 09:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('v1_data', '0003_datapublishqueue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.CharField(max_length=255, unique=True)),
+                ('hash', models.CharField(max_length=64)),
+                ('version', models.IntegerField(default=1)),
+                ('updated', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'data_snapshot',
+            },
+        ),
+        migrations.AlterField(
+            model_name='datapublishqueue',
+            name='uuid',
+            field=models.CharField(max_length=255, unique=True),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.0.4 on 2026-10-18 10:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('v1_forms', '0003_remove_formapprovalassignment_administration_and_more'),
+        ('v1_profile', '0004_administrationclosure'),
+        ('v1_data', '0004_datasnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FormDataRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField()),
+                ('status', models.IntegerField(choices=[(1, 'pending'), (2, 'approved')])),
+                ('count', models.IntegerField(default=0)),
+                ('administration', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='administration_data_rollup', to='v1_profile.administration')),
+                ('form', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='form_data_rollup', to='v1_forms.forms')),
+            ],
+            options={
+                'db_table': 'data_rollup',
+                'unique_together': {('form', 'administration', 'period', 'status')},
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.0.4 on 2026-10-18 10:27
+
+from django.db import migrations, models
+from utils.geohash import get_geohash
+
+
+def backfill_geohash(apps, schema_editor):
+    FormData = apps.get_model("v1_data", "FormData")
+    rows = []
+    queryset = FormData.objects.filter(geo__isnull=False).only("id", "geo")
+    for data in queryset.iterator(chunk_size=2000):
+        data.geohash = get_geohash(data.geo)
+        rows.append(data)
+        if len(rows) == 2000:
+            FormData.objects.bulk_update(rows, ["geohash"])
+            rows = []
+    FormData.objects.bulk_update(rows, ["geohash"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('v1_data', '0005_data_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='formdata',
+            name='geohash',
+            field=models.CharField(default=None, max_length=12, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='formdata',
+            index=models.Index(fields=['geohash'], name='data_geohash_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+    ]
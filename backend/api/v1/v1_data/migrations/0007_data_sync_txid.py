@@ -0,0 +1,43 @@
+# Generated by Django 4.0.4 on 2026-10-18 10:33
+
+from django.db import migrations, models
+
+SYNC_TRIGGER = """
+CREATE OR REPLACE FUNCTION data_set_sync_txid() RETURNS trigger AS $$
+BEGIN
+    NEW.sync_txid := txid_current();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER data_sync_txid
+BEFORE INSERT OR UPDATE ON data
+FOR EACH ROW EXECUTE PROCEDURE data_set_sync_txid();
+
+UPDATE data SET sync_txid = txid_current();
+"""
+
+DROP_SYNC_TRIGGER = """
+DROP TRIGGER IF EXISTS data_sync_txid ON data;
+DROP FUNCTION IF EXISTS data_set_sync_txid();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('v1_data', '0006_data_geohash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='formdata',
+            name='sync_txid',
+            field=models.BigIntegerField(default=None, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='formdata',
+            index=models.Index(fields=['sync_txid', 'id'], name='data_sync_idx'),
+        ),
+        migrations.RunSQL(SYNC_TRIGGER, DROP_SYNC_TRIGGER),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.0.4 on 2026-10-18 15:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+PIVOT_TABLE_PREFIX = "answer_pivot_"
+
+
+def register_pivot_tables(apps, schema_editor):
+    Forms = apps.get_model("v1_forms", "Forms")
+    PivotedForm = apps.get_model("v1_data", "PivotedForm")
+    form_ids = [
+        int(table[len(PIVOT_TABLE_PREFIX):])
+        for table in schema_editor.connection.introspection.table_names()
+        if table.startswith(PIVOT_TABLE_PREFIX)
+        and table[len(PIVOT_TABLE_PREFIX):].isdigit()
+    ]
+    PivotedForm.objects.bulk_create(
+        [
+            PivotedForm(form_id=form_id)
+            for form_id in Forms.objects.filter(
+                pk__in=form_ids
+            ).values_list("id", flat=True)
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('v1_forms', '0003_remove_formapprovalassignment_administration_and_more'),
+        ('v1_data', '0007_data_sync_txid'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PivotedForm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('form', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='pivoted_form', to='v1_forms.forms')),
+            ],
+            options={
+                'db_table': 'pivoted_forms',
+            },
+        ),
+        migrations.RunPython(
+            register_pivot_tables, migrations.RunPython.noop
+        ),
+    ]
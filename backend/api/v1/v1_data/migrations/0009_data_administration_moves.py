@@ -0,0 +1,54 @@
+# Generated by Django 4.0.4 on 2026-10-18 18:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+MOVE_TRIGGER = """
+CREATE OR REPLACE FUNCTION data_log_administration_move() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO data_administration_moves (data_id, administration_id, txid, created)
+    VALUES (NEW.id, OLD.administration_id, txid_current(), now());
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER data_administration_move
+AFTER UPDATE OF administration_id ON data
+FOR EACH ROW
+WHEN (OLD.administration_id IS DISTINCT FROM NEW.administration_id)
+EXECUTE PROCEDURE data_log_administration_move();
+"""
+
+DROP_MOVE_TRIGGER = """
+DROP TRIGGER IF EXISTS data_administration_move ON data;
+DROP FUNCTION IF EXISTS data_log_administration_move();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('v1_profile', '0005_administration_tree_version'),
+        ('v1_data', '0008_pivoted_forms'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataAdministrationMove',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('txid', models.BigIntegerField()),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('administration', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='administration_data_moves', to='v1_profile.administration')),
+                ('data', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='data_administration_moves', to='v1_data.formdata')),
+            ],
+            options={
+                'db_table': 'data_administration_moves',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='dataadministrationmove',
+            index=models.Index(fields=['data', 'txid'], name='data_administration_move_idx'),
+        ),
+        migrations.RunSQL(MOVE_TRIGGER, DROP_MOVE_TRIGGER),
+    ]
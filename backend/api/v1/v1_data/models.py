@@ -1,7 +1,14 @@
-import os
 import uuid
 import json
+import hashlib
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
+from django.db.models import F
+from django.db.models.signals import pre_save
+from django.dispatch import receiver
+from django.db.models.functions import Substr
+from django.utils import timezone
+from api.v1.v1_data.constants import DataRollupStatus
 from api.v1.v1_forms.constants import QuestionTypes
 from api.v1.v1_forms.models import Forms, Questions
 from api.v1.v1_profile.models import (
@@ -9,9 +16,14 @@ from api.v1.v1_profile.models import (
     UserRole,
     DataAccessTypes,
 )
+from api.v1.v1_profile.tree import administration_tree
 from api.v1.v1_users.models import SystemUser
 from utils.soft_deletes_model import SoftDeletes
 from utils import storage
+from utils.geohash import get_geohash
+
+# length of the indexed prefix of the text answers
+ANSWER_NAME_PREFIX = 255
 
 
 class FormData(SoftDeletes):
@@ -32,6 +44,8 @@ class FormData(SoftDeletes):
         related_name="administration_form_data",
     )
     geo = models.JSONField(null=True, default=None)
+    # geohash of the geo point, prefixes are the map grid cells
+    geohash = models.CharField(max_length=12, null=True, default=None)
     uuid = models.CharField(max_length=255, default=uuid.uuid4, null=True)
     created_by = models.ForeignKey(
         to=SystemUser,
@@ -50,19 +64,23 @@ class FormData(SoftDeletes):
     duration = models.IntegerField(default=0)
     submitter = models.CharField(max_length=255, default=None, null=True)
     is_pending = models.BooleanField(default=False)
+    # id of the last transaction that wrote the row, set by a trigger,
+    # the mobile delta sync reads the changes from a cursor on it
+    sync_txid = models.BigIntegerField(null=True, default=None)
 
     def __str__(self):
         return self.name
 
     @property
     def to_data_frame(self):
-        administration = self.administration
         data = {
             "id": self.id,
             "datapoint_name": self.name,
             "administration": (
-                administration.administration_column
-                if administration
+                administration_tree.get_full_path_name(
+                    self.administration_id
+                )
+                if self.administration_id
                 else None
             ),
             "uuid": self.uuid,
@@ -87,34 +105,67 @@ class FormData(SoftDeletes):
         return data
 
     @property
-    def save_to_file(self):
-        # If the data is a child of another form, do not save to file
-        if self.form.parent:
-            return None
+    def to_json(self):
         data = {
             "id": self.id,
             "datapoint_name": self.name,
-            "administration": (
-                self.administration.id if self.administration else None
-            ),
+            "administration": self.administration_id,
             "uuid": str(self.uuid),
             "geolocation": self.geo,
         }
         answers = {}
-
-        for a in self.data_answer.order_by(
-            "question__question_group_id", "question__order"
-        ).all():
+        # prefetched by prefetch_data_json
+        ordered_answers = getattr(self, "ordered_answers", None)
+        if ordered_answers is None:
+            ordered_answers = self.data_answer.select_related(
+                "question"
+            ).order_by(
+                "question__question_group_id", "question__order"
+            ).all()
+        for a in ordered_answers:
             answers.update(a.to_key)
         data.update({"answers": answers})
+        return data
+
+    @property
+    def save_to_file(self):
+        # If the data is a child of another form, do not save to file
+        if self.form.parent:
+            return None
+        return self.publish_json(
+            DataSnapshot.objects.filter(uuid=self.uuid).first()
+        )
+
+    def publish_json(self, snapshot=None):
+        """
+        Write the datapoint JSON to storage, unless the given snapshot
+        already holds the same content
+        """
+        data = self.to_json
         json_data = json.dumps(data)
+        checksum = hashlib.sha256(json_data.encode("utf-8")).hexdigest()
         file_name = f"{str(self.uuid)}.json"
-        # write to json file
-        with open(file_name, "w") as f:
-            f.write(json_data)
-        storage.upload(file=file_name, folder="datapoints")
-        # delete file
-        os.remove(file_name)
+        # skip the write when the published content is the same
+        if (
+            snapshot
+            and snapshot.hash == checksum
+            and storage.check(f"datapoints/{file_name}")
+        ):
+            return data
+        storage.write(json_data, folder="datapoints", filename=file_name)
+        DataSnapshot.objects.update_or_create(
+            uuid=self.uuid,
+            defaults={
+                "hash": checksum,
+                "version": snapshot.version + 1 if snapshot else 1,
+                "updated": timezone.now(),
+            },
+        )
+        # published after the write of the datapoint, the mobile delta
+        # sync sends it again with the new hash
+        FormData.objects_with_deleted.filter(pk=self.pk).update(
+            sync_txid=None
+        )
         return data
 
     @property
@@ -142,6 +193,20 @@ class FormData(SoftDeletes):
 
     class Meta:
         db_table = "data"
+        indexes = [
+            # prefix lookups of the grid cells
+            models.Index(
+                fields=["geohash"],
+                name="data_geohash_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+            models.Index(fields=["sync_txid", "id"], name="data_sync_idx"),
+        ]
+
+
+@receiver(pre_save, sender=FormData)
+def set_data_geohash(sender, instance: FormData, **_):
+    instance.geohash = get_geohash(instance.geo)
 
 
 class Answers(models.Model):
@@ -186,9 +251,11 @@ class Answers(models.Model):
         ]:
             answer = self.name
         elif q.type == QuestionTypes.administration:
-            answer = Administration.objects.filter(pk=self.value).first()
-            if answer:
-                answer = answer.administration_column
+            answer = None
+            if self.value:
+                answer = administration_tree.get_full_path_name(
+                    int(self.value)
+                ) or None
         else:
             answer = self.value
         return {qname: answer}
@@ -220,6 +287,23 @@ class Answers(models.Model):
 
     class Meta:
         db_table = "answer"
+        indexes = [
+            GinIndex(
+                fields=["options"],
+                name="answer_options_gin",
+                opclasses=["jsonb_path_ops"],
+            ),
+            models.Index(
+                fields=["question", "value"],
+                name="answer_question_value_idx",
+            ),
+            # text answers can be longer than a btree entry allows
+            models.Index(
+                F("question"),
+                Substr("name", 1, ANSWER_NAME_PREFIX),
+                name="answer_question_name_idx",
+            ),
+        ]
 
 
 class AnswerHistory(models.Model):
@@ -249,3 +333,106 @@ class AnswerHistory(models.Model):
 
     class Meta:
         db_table = "answer_history"
+
+
+class DataPublishQueue(models.Model):
+    uuid = models.CharField(max_length=255, unique=True)
+    data = models.ForeignKey(
+        to=FormData,
+        on_delete=models.CASCADE,
+        related_name="data_publish_queue",
+    )
+    # first and latest publish request since the last write
+    queued = models.DateTimeField()
+    requested = models.DateTimeField()
+
+    def __str__(self):
+        return str(self.uuid)
+
+    class Meta:
+        db_table = "data_publish_queue"
+
+
+class DataSnapshot(models.Model):
+    uuid = models.CharField(max_length=255, unique=True)
+    hash = models.CharField(max_length=64)
+    version = models.IntegerField(default=1)
+    updated = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.uuid} v{self.version}"
+
+    class Meta:
+        db_table = "data_snapshot"
+
+
+class DataAdministrationMove(models.Model):
+    """
+    Administration a datapoint was moved away from, logged by a trigger
+    with the transaction that moved it. The mobile delta sync only
+    removes the datapoint from the devices that could hold it.
+    """
+
+    data = models.ForeignKey(
+        to=FormData,
+        on_delete=models.CASCADE,
+        related_name="data_administration_moves",
+    )
+    administration = models.ForeignKey(
+        to=Administration,
+        on_delete=models.CASCADE,
+        related_name="administration_data_moves",
+    )
+    txid = models.BigIntegerField()
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.data_id} from {self.administration_id}"
+
+    class Meta:
+        db_table = "data_administration_moves"
+        indexes = [
+            models.Index(
+                fields=["data", "txid"], name="data_administration_move_idx"
+            ),
+        ]
+
+
+class FormDataRollup(models.Model):
+    form = models.ForeignKey(
+        to=Forms, on_delete=models.CASCADE, related_name="form_data_rollup"
+    )
+    administration = models.ForeignKey(
+        to=Administration,
+        on_delete=models.CASCADE,
+        related_name="administration_data_rollup",
+    )
+    # first day of the month the datapoints were submitted
+    period = models.DateField()
+    status = models.IntegerField(choices=DataRollupStatus.FieldStr.items())
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.form_id} {self.administration_id} {self.period}"
+
+    class Meta:
+        unique_together = ("form", "administration", "period", "status")
+        db_table = "data_rollup"
+
+
+class PivotedForm(models.Model):
+    """
+    Forms that have an answer pivot table, read on every datapoint
+    write instead of the database catalog
+    """
+
+    form = models.OneToOneField(
+        to=Forms, on_delete=models.CASCADE, related_name="pivoted_form"
+    )
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.form_id}"
+
+    class Meta:
+        db_table = "pivoted_forms"
@@ -0,0 +1,184 @@
+from django.db import connection, transaction
+from api.v1.v1_forms.constants import QuestionTypes
+from api.v1.v1_forms.models import Forms, Questions
+from api.v1.v1_data.models import PivotedForm
+
+PIVOT_TABLE_PREFIX = "answer_pivot_"
+
+# answer column and column type of each question type, the other
+# types keep the name column as text
+PIVOT_COLUMNS = {
+    QuestionTypes.number: ("value", "double precision"),
+    QuestionTypes.administration: ("value", "integer"),
+    QuestionTypes.option: ("options", "jsonb"),
+    QuestionTypes.multiple_option: ("options", "jsonb"),
+    QuestionTypes.geo: ("options", "jsonb"),
+}
+
+
+def get_pivot_table(form_id: int) -> str:
+    return f"{PIVOT_TABLE_PREFIX}{int(form_id)}"
+
+
+def get_pivot_column(question_id: int) -> str:
+    return f"q_{int(question_id)}"
+
+
+def get_pivot_form_ids() -> list:
+    """
+    Forms that have a pivot table, only those are kept up to date
+    """
+    return list(PivotedForm.objects.values_list("form_id", flat=True))
+
+
+def get_pivot_questions(form_id: int) -> list:
+    return list(
+        Questions.objects.filter(form_id=form_id)
+        .order_by("question_group__order", "order")
+        .values_list("id", "type")
+    )
+
+
+def create_pivot_table(form: Forms):
+    """
+    Create the wide table of a form, one row per approved datapoint
+    and one typed column per question. Columns of new questions are
+    added to an existing table.
+    """
+    table = get_pivot_table(form.id)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                data_id bigint PRIMARY KEY,
+                uuid varchar(255),
+                administration_id bigint,
+                created timestamp with time zone,
+                updated timestamp with time zone
+            )
+            """
+        )
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {table}_administration_idx "
+            f"ON {table} (administration_id)"
+        )
+        for question_id, question_type in get_pivot_questions(form.id):
+            _, column_type = PIVOT_COLUMNS.get(question_type, ("name", "text"))
+            cursor.execute(
+                f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS "
+                f"{get_pivot_column(question_id)} {column_type}"
+            )
+    PivotedForm.objects.get_or_create(form=form)
+
+
+def drop_pivot_table(form_id: int):
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {get_pivot_table(form_id)}")
+    PivotedForm.objects.filter(form_id=form_id).delete()
+
+
+def get_pivot_table_columns(table: str) -> set:
+    with connection.cursor() as cursor:
+        description = connection.introspection.get_table_description(
+            cursor, table
+        )
+    return {column.name for column in description}
+
+
+def get_pivot_question_column(question: Questions):
+    """
+    Pivot column of a question, None when its form has no pivot table
+    or the question was added after the table was built. Answers of
+    repeated groups keep only the last repeat in the table and are not
+    read from it.
+    """
+    if question.question_group.repeatable:
+        return None
+    if not PivotedForm.objects.filter(form_id=question.form_id).exists():
+        return None
+    column = get_pivot_column(question.id)
+    table = get_pivot_table(question.form_id)
+    if column not in get_pivot_table_columns(table):
+        return None
+    return column
+
+
+def refresh_pivot_rows(form_id: int, data_ids=None):
+    """
+    Render the pivot rows of a form again in one statement, either for
+    all datapoints or the given ones. Rows of datapoints that are no
+    longer approved or were deleted are removed. Questions added since
+    the table was created are left out until it is rebuilt.
+    """
+    table = get_pivot_table(form_id)
+    table_columns = get_pivot_table_columns(table)
+    columns = []
+    values = []
+    for question_id, question_type in get_pivot_questions(form_id):
+        if get_pivot_column(question_id) not in table_columns:
+            continue
+        answer_column, column_type = PIVOT_COLUMNS.get(
+            question_type, ("name", "text")
+        )
+        columns.append(get_pivot_column(question_id))
+        # the highest index of a repeated answer wins
+        values.append(
+            f"((array_agg(a.{answer_column} ORDER BY a.index DESC, a.id DESC)"
+            f" FILTER (WHERE a.question_id = {int(question_id)}))[1])"
+            f"::{column_type}"
+        )
+    data_filter = ""
+    params = [form_id]
+    if data_ids is not None:
+        data_filter = "AND d.id = ANY(%s)"
+        params.append(list(data_ids))
+    delete_filter = "WHERE data_id = ANY(%s)" if data_ids is not None else ""
+    insert_columns = ", ".join(
+        ["data_id", "uuid", "administration_id", "created", "updated"]
+        + columns
+    )
+    select_values = ", ".join(
+        ["d.id", "d.uuid", "d.administration_id", "d.created", "d.updated"]
+        + values
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {table} {delete_filter}",
+            [list(data_ids)] if data_ids is not None else [],
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO {table} ({insert_columns})
+            SELECT {select_values}
+            FROM data d
+            LEFT JOIN answer a ON a.data_id = d.id
+            WHERE d.form_id = %s
+                AND d.is_pending = false
+                AND d.deleted_at IS NULL
+                {data_filter}
+            GROUP BY d.id
+            """,
+            params,
+        )
+        return cursor.rowcount
+
+
+def rebuild_pivot_table(form: Forms) -> int:
+    create_pivot_table(form)
+    return refresh_pivot_rows(form.id)
+
+
+def refresh_answer_pivot(data_list):
+    """
+    Refresh the pivot rows of the given datapoints, for the forms that
+    have a pivot table
+    """
+    form_ids = set(get_pivot_form_ids())
+    if not form_ids:
+        return
+    data_ids = {}
+    for data in data_list:
+        if data.form_id in form_ids:
+            data_ids.setdefault(data.form_id, []).append(data.id)
+    for form_id, ids in data_ids.items():
+        refresh_pivot_rows(form_id, ids)
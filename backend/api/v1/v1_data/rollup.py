@@ -0,0 +1,146 @@
+import hashlib
+from datetime import datetime
+from django.db import connection, transaction
+from django.db.models import Count, DateField, Q
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from api.v1.v1_data.constants import DataRollupStatus
+from api.v1.v1_data.models import FormData, FormDataRollup
+
+
+def get_rollup_period(created):
+    """
+    First day of the month of a submission, in the current timezone
+    like TruncMonth
+    """
+    if timezone.is_aware(created):
+        created = timezone.localtime(created)
+    return created.date().replace(day=1)
+
+
+def get_period_range(period):
+    start = datetime(period.year, period.month, 1)
+    end = datetime(
+        period.year + period.month // 12, period.month % 12 + 1, 1
+    )
+    if timezone.is_aware(timezone.now()):
+        start = timezone.make_aware(start)
+        end = timezone.make_aware(end)
+    return start, end
+
+
+def get_rollup_status(is_pending: bool) -> int:
+    if is_pending:
+        return DataRollupStatus.pending
+    return DataRollupStatus.approved
+
+
+def get_rollup_counts(queryset):
+    """
+    Number of datapoints per form, administration, month and status
+    """
+    return (
+        queryset.annotate(
+            period=TruncMonth("created", output_field=DateField())
+        )
+        .values("form_id", "administration_id", "period", "is_pending")
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+
+
+def get_rollup_lock_id(key) -> int:
+    """
+    Advisory lock of a rollup cell, a signed 64 bits hash of its key
+    """
+    form_id, administration_id, period = key
+    value = f"data_rollup:{form_id}:{administration_id}:{period}"
+    digest = hashlib.sha256(value.encode()).digest()
+    return int.from_bytes(digest[:8], "big", signed=True)
+
+
+def refresh_data_rollup(data_list):
+    """
+    Count again the rollup cells the given datapoints belong to. Only
+    the datapoints of those forms, administrations and months are
+    scanned and cells that dropped to zero are removed. Refreshes of
+    the same cell take turns on an advisory lock held until commit,
+    the last one counts the rows the others committed.
+    """
+    keys = {
+        (data.form_id, data.administration_id, get_rollup_period(data.created))
+        for data in data_list
+        if data.created
+    }
+    if not keys:
+        return
+    data_filter = Q()
+    rollup_filter = Q()
+    for form_id, administration_id, period in keys:
+        start, end = get_period_range(period)
+        data_filter |= Q(
+            form_id=form_id,
+            administration_id=administration_id,
+            created__gte=start,
+            created__lt=end,
+        )
+        rollup_filter |= Q(
+            form_id=form_id, administration_id=administration_id, period=period
+        )
+    counts = {
+        (key, status): 0
+        for key in keys
+        for status in DataRollupStatus.FieldStr
+    }
+    with transaction.atomic(), connection.cursor() as cursor:
+        # taken in order so that two refreshes can not deadlock, the
+        # count below only starts once the cells are ours
+        for lock_id in sorted({get_rollup_lock_id(key) for key in keys}):
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", [lock_id])
+        for row in get_rollup_counts(FormData.objects.filter(data_filter)):
+            key = (row["form_id"], row["administration_id"], row["period"])
+            status = get_rollup_status(row["is_pending"])
+            counts[(key, status)] = row["count"]
+        values = []
+        for ((form_id, administration_id, period), status), count in sorted(
+            counts.items()
+        ):
+            values += [form_id, administration_id, period, status, count]
+        cursor.execute(
+            f"""
+            INSERT INTO {FormDataRollup._meta.db_table}
+                (form_id, administration_id, period, status, count)
+            VALUES {", ".join(["(%s, %s, %s, %s, %s)"] * len(counts))}
+            ON CONFLICT (form_id, administration_id, period, status)
+            DO UPDATE SET count = EXCLUDED.count
+            """,
+            values,
+        )
+        FormDataRollup.objects.filter(rollup_filter, count=0).delete()
+
+
+def rebuild_data_rollup(form_ids=None) -> int:
+    """
+    Count all the rollup cells again, of every form or the given ones
+    """
+    data = FormData.objects.all()
+    rollup = FormDataRollup.objects.all()
+    if form_ids:
+        data = data.filter(form_id__in=form_ids)
+        rollup = rollup.filter(form_id__in=form_ids)
+    with transaction.atomic():
+        rollup.delete()
+        rows = FormDataRollup.objects.bulk_create(
+            [
+                FormDataRollup(
+                    form_id=row["form_id"],
+                    administration_id=row["administration_id"],
+                    period=row["period"],
+                    status=get_rollup_status(row["is_pending"]),
+                    count=row["count"],
+                )
+                for row in get_rollup_counts(data).iterator()
+            ],
+            batch_size=1000,
+        )
+    return len(rows)
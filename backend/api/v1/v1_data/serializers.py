@@ -16,6 +16,7 @@ from api.v1.v1_forms.models import (
     Questions,
 )
 from api.v1.v1_profile.models import Administration, EntityData
+from api.v1.v1_profile.tree import administration_tree
 from api.v1.v1_users.models import Organisation
 from utils.custom_serializer_fields import (
     CustomPrimaryKeyRelatedField,
@@ -24,6 +25,13 @@ from utils.custom_serializer_fields import (
     CustomCharField,
     CustomIntegerField,
 )
+from api.v1.v1_data.functions import (
+    parse_answer_criteria,
+    validate_answer_value,
+)
+from api.v1.v1_data.pivot import refresh_answer_pivot
+from api.v1.v1_data.rollup import refresh_data_rollup
+from api.v1.v1_data.tasks import queue_data_publish
 from utils.functions import update_date_time_format, get_answer_value
 from utils.functions import get_answer_history
 
@@ -69,66 +77,9 @@ class SubmitFormDataAnswerSerializer(serializers.ModelSerializer):
         return value
 
     def validate(self, attrs):
-        if attrs.get("value") == "":
-            raise ValidationError(
-                "Value is required for Question:{0}".format(
-                    attrs.get("question").id
-                )
-            )
-
-        if (
-            isinstance(attrs.get("value"), list)
-            and len(attrs.get("value")) == 0
-        ):
-            raise ValidationError(
-                "Value is required for Question:{0}".format(
-                    attrs.get("question").id
-                )
-            )
-
-        if not isinstance(attrs.get("value"), list) and attrs.get(
-            "question"
-        ).type in [
-            QuestionTypes.geo,
-            QuestionTypes.option,
-            QuestionTypes.multiple_option,
-        ]:
-            raise ValidationError(
-                "Valid list value is required for Question:{0}".format(
-                    attrs.get("question").id
-                )
-            )
-        elif not isinstance(attrs.get("value"), str) and attrs.get(
-            "question"
-        ).type in [
-            QuestionTypes.text,
-            QuestionTypes.photo,
-            QuestionTypes.date,
-            QuestionTypes.attachment,
-            QuestionTypes.signature,
-        ]:
-            raise ValidationError(
-                "Valid string value is required for Question:{0}".format(
-                    attrs.get("question").id
-                )
-            )
-        elif not (
-            isinstance(attrs.get("value"), int)
-            or isinstance(attrs.get("value"), float)
-        ) and attrs.get("question").type in [
-            QuestionTypes.number,
-            QuestionTypes.administration,
-            QuestionTypes.cascade,
-        ]:
-            raise ValidationError(
-                "Valid number value is required for Question:{0}".format(
-                    attrs.get("question").id
-                )
-            )
-
-        if attrs.get("question").type == QuestionTypes.administration:
-            attrs["value"] = int(float(attrs.get("value")))
-
+        attrs["value"] = validate_answer_value(
+            attrs.get("question"), attrs.get("value")
+        )
         return attrs
 
     class Meta:
@@ -213,7 +164,9 @@ class SubmitFormSerializer(serializers.Serializer):
                 options=option,
                 created_by=self.context.get("user"),
             )
-        obj_data.save_to_file
+        refresh_answer_pivot([obj_data])
+        refresh_data_rollup([obj_data])
+        queue_data_publish([obj_data])
 
         return object
 
@@ -284,6 +237,9 @@ class ListFormDataRequestSerializer(serializers.Serializer):
         required=False,
     )
     parent = serializers.CharField(required=False)
+    options = CustomListField(child=serializers.CharField(), required=False)
+    number = CustomListField(child=serializers.CharField(), required=False)
+    text = CustomListField(child=serializers.CharField(), required=False)
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -292,6 +248,28 @@ class ListFormDataRequestSerializer(serializers.Serializer):
         ).queryset = Administration.objects.all()
         self.fields.get("questions").child.queryset = Questions.objects.all()
 
+    def _validate_criteria(self, value, size, example):
+        try:
+            return parse_answer_criteria(value, size)
+        except ValueError:
+            raise ValidationError(f"Filter should be formatted as {example}")
+
+    def validate_options(self, value):
+        return self._validate_criteria(value, 2, "question_id||option")
+
+    def validate_number(self, value):
+        criteria = self._validate_criteria(value, 3, "question_id||min||max")
+        for _, minimum, maximum in criteria:
+            for limit in [minimum, maximum]:
+                try:
+                    float(limit or 0)
+                except ValueError:
+                    raise ValidationError(f"{limit} is not a number")
+        return criteria
+
+    def validate_text(self, value):
+        return self._validate_criteria(value, 2, "question_id||text")
+
 
 class ListFormDataSerializer(serializers.ModelSerializer):
     created_by = serializers.SerializerMethodField()
@@ -300,6 +278,13 @@ class ListFormDataSerializer(serializers.ModelSerializer):
     updated = serializers.SerializerMethodField()
     administration = serializers.SerializerMethodField()
     pending_data = serializers.SerializerMethodField()
+    answers = serializers.SerializerMethodField()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # answer columns are only inlined for the selected questions
+        if not self.context.get("questions"):
+            self.fields.pop("answers")
 
     @extend_schema_field(OpenApiTypes.STR)
     def get_created_by(self, instance: FormData):
@@ -329,9 +314,14 @@ class ListFormDataSerializer(serializers.ModelSerializer):
         )
     )
     def get_pending_data(self, instance: FormData):
-        pending_data = instance.children.filter(
-            is_pending=True,
-        ).first()
+        # prefetched by prefetch_form_data_list
+        if hasattr(instance, "pending_children"):
+            pending_children = instance.pending_children
+            pending_data = pending_children[0] if pending_children else None
+        else:
+            pending_data = instance.children.filter(
+                is_pending=True,
+            ).first()
         if pending_data:
             return {
                 "id": pending_data.id,
@@ -340,7 +330,37 @@ class ListFormDataSerializer(serializers.ModelSerializer):
         return None
 
     def get_administration(self, instance: FormData):
-        return " - ".join(instance.administration.full_name.split("-")[1:])
+        full_name = administration_tree.get_full_name(
+            instance.administration_id
+        )
+        return " - ".join(full_name.split("-")[1:])
+
+    @extend_schema_field(
+        inline_serializer(
+            "ListFormDataAnswer",
+            fields={
+                "question": serializers.IntegerField(),
+                "value": serializers.JSONField(),
+                "index": serializers.IntegerField(),
+            },
+            many=True,
+        )
+    )
+    def get_answers(self, instance: FormData):
+        if hasattr(instance, "selected_answers"):
+            answers = instance.selected_answers
+        else:
+            answers = instance.data_answer.filter(
+                question__in=self.context.get("questions")
+            ).select_related("question")
+        return [
+            {
+                "question": answer.question_id,
+                "value": get_answer_value(answer),
+                "index": answer.index,
+            }
+            for answer in answers
+        ]
 
     class Meta:
         model = FormData
@@ -357,6 +377,7 @@ class ListFormDataSerializer(serializers.ModelSerializer):
             "updated",
             "pending_data",
             "submitter",
+            "answers",
         ]
 
 
@@ -587,10 +608,12 @@ class SubmitPendingFormSerializer(serializers.Serializer):
             ))
 
         Answers.objects.bulk_create(answers)
+        refresh_answer_pivot([obj_data])
+        refresh_data_rollup([obj_data])
 
         if direct_to_data and not obj_data.parent and not obj_data.is_pending:
             # Only save to file if the data is not pending
             # and does not have a parent
-            obj_data.save_to_file
+            queue_data_publish([obj_data])
 
         return obj_data
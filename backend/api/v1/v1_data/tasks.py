@@ -1,5 +1,17 @@
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Count, Min
 from django.utils import timezone
-from api.v1.v1_data.models import FormData
+from django_q.models import Schedule
+from django_q.tasks import schedule
+from api.v1.v1_data.functions import publish_data_json
+from api.v1.v1_data.models import FormData, DataPublishQueue
+from api.v1.v1_data.pivot import refresh_answer_pivot
+from api.v1.v1_data.rollup import refresh_data_rollup
+from api.v1.v1_forms.models import Forms
+from mis.settings import DATA_PUBLISH_WINDOW
+
+PUBLISH_TASK = "api.v1.v1_data.tasks.publish_queued_data"
 
 
 def seed_approved_data(data: FormData):
@@ -10,10 +22,100 @@ def seed_approved_data(data: FormData):
     data.updated = timezone.now()
     data.is_pending = False
     data.save()
+    refresh_answer_pivot([data])
+    refresh_data_rollup([data])
 
     # Save to file after approval
     if not data.form.parent:
-        # If the form is a parent form, save to file
-        data.save_to_file
+        # If the form is a parent form, queue the file write
+        queue_data_publish([data])
 
     return data
+
+
+def schedule_data_publish(next_run=None):
+    # one pending run is enough, it drains every due uuid
+    if Schedule.objects.filter(func=PUBLISH_TASK).exists():
+        return
+    if not next_run:
+        next_run = timezone.now() + timedelta(seconds=DATA_PUBLISH_WINDOW)
+    schedule(PUBLISH_TASK, schedule_type=Schedule.ONCE, next_run=next_run)
+
+
+def queue_data_publish(data_list):
+    """
+    Ask for the datapoint JSON of the given form data to be written
+    by a worker. Requests for the same uuid are coalesced until the
+    publish window of its first request is over.
+    """
+    now = timezone.now()
+    data_list = list(data_list)
+    # only the datapoints of registration forms are written to file
+    form_ids = Forms.objects.filter(
+        pk__in={d.form_id for d in data_list},
+        parent__isnull=True,
+    ).values_list("id", flat=True)
+    form_ids = set(form_ids)
+    items = {
+        str(d.uuid): d.id
+        for d in data_list
+        if d.uuid and d.form_id in form_ids
+    }
+    if not items:
+        return
+    DataPublishQueue.objects.filter(uuid__in=list(items)).update(
+        requested=now
+    )
+    # rows updated above are skipped as conflicts
+    DataPublishQueue.objects.bulk_create(
+        [
+            DataPublishQueue(
+                uuid=uuid, data_id=data_id, queued=now, requested=now
+            )
+            for uuid, data_id in items.items()
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+    schedule_data_publish()
+
+
+def publish_queued_data(batch_size: int = 500):
+    """
+    Write the datapoint JSON of every uuid whose publish window is
+    over, then schedule the next run if requests are left
+    """
+    due = timezone.now() - timedelta(seconds=DATA_PUBLISH_WINDOW)
+    total = 0
+    while True:
+        with transaction.atomic():
+            items = list(
+                DataPublishQueue.objects.select_for_update(
+                    skip_locked=True
+                ).filter(queued__lte=due).order_by("queued")[:batch_size]
+            )
+            if not items:
+                break
+            publish_data_json([item.data_id for item in items])
+            DataPublishQueue.objects.filter(
+                pk__in=[item.pk for item in items]
+            ).delete()
+            total += len(items)
+    oldest = DataPublishQueue.objects.aggregate(oldest=Min("queued"))
+    if oldest["oldest"]:
+        schedule_data_publish(
+            oldest["oldest"] + timedelta(seconds=DATA_PUBLISH_WINDOW)
+        )
+    return total
+
+
+def get_data_publish_lag():
+    stats = DataPublishQueue.objects.aggregate(
+        pending=Count("id"), oldest=Min("queued")
+    )
+    oldest = stats["oldest"]
+    return {
+        "pending": stats["pending"],
+        "oldest": oldest,
+        "lag": (timezone.now() - oldest).total_seconds() if oldest else 0,
+    }
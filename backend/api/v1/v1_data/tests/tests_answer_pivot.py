@@ -0,0 +1,116 @@
+import json
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import override_settings
+from api.v1.v1_data.models import FormData, Answers
+from api.v1.v1_data.pivot import (
+    drop_pivot_table,
+    get_pivot_column,
+    get_pivot_form_ids,
+    get_pivot_table,
+    refresh_answer_pivot,
+)
+from api.v1.v1_data.tasks import seed_approved_data
+from api.v1.v1_forms.constants import QuestionTypes
+from api.v1.v1_profile.tests.mixins import ProfileTestHelperMixin
+
+
+@override_settings(USE_TZ=False)
+class AnswerPivotTestCase(TestCase, ProfileTestHelperMixin):
+    def setUp(self):
+        call_command("administration_seeder", "--test")
+        call_command("form_seeder", "--test")
+        self.create_user("test@akvo.org", self.IS_SUPER_ADMIN)
+        call_command("fake_data_seeder", "-r", 2, "-t", True)
+        answer = Answers.objects.filter(
+            question__type=QuestionTypes.number,
+            data__is_pending=False,
+        ).first()
+        self.data = answer.data
+        self.form = self.data.form
+        call_command("build_answer_pivot", self.form.id, "--test")
+
+    def get_row(self, data_id, question_id):
+        column = get_pivot_column(question_id)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT {column} FROM {get_pivot_table(self.form.id)} "
+                "WHERE data_id = %s",
+                [data_id],
+            )
+            return cursor.fetchone()
+
+    def test_pivot_rows(self):
+        self.assertIn(self.form.id, get_pivot_form_ids())
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT COUNT(*) FROM {get_pivot_table(self.form.id)}"
+            )
+            total = cursor.fetchone()[0]
+        self.assertEqual(
+            total,
+            FormData.objects.filter(form=self.form, is_pending=False).count(),
+        )
+        for answer in self.data.data_answer.select_related("question"):
+            (value,) = self.get_row(self.data.id, answer.question_id)
+            if answer.question.type == QuestionTypes.number:
+                self.assertEqual(value, answer.value)
+            elif answer.question.type in [
+                QuestionTypes.option,
+                QuestionTypes.multiple_option,
+            ]:
+                # raw cursors return jsonb undecoded
+                self.assertEqual(json.loads(value), answer.options)
+            elif answer.question.type == QuestionTypes.text:
+                self.assertEqual(value, answer.name)
+
+    def test_pivot_rows_are_refreshed(self):
+        answer = self.data.data_answer.filter(
+            question__type=QuestionTypes.number
+        ).first()
+        answer.value = 12345
+        answer.save()
+        refresh_answer_pivot([self.data])
+        self.assertEqual(
+            self.get_row(self.data.id, answer.question_id), (12345,)
+        )
+
+        self.data.delete()
+        refresh_answer_pivot([self.data])
+        self.assertIsNone(self.get_row(self.data.id, answer.question_id))
+
+    def test_approved_data_is_added(self):
+        pending = FormData.objects.create(
+            name="Pending datapoint",
+            form=self.form,
+            administration=self.data.administration,
+            created_by=self.data.created_by,
+            is_pending=True,
+        )
+        answer = self.data.data_answer.first()
+        Answers.objects.create(
+            data=pending,
+            question=answer.question,
+            name=answer.name,
+            value=answer.value,
+            options=answer.options,
+            created_by=self.data.created_by,
+        )
+        refresh_answer_pivot([pending])
+        self.assertIsNone(self.get_row(pending.id, answer.question_id))
+        seed_approved_data(pending)
+        self.assertIsNotNone(self.get_row(pending.id, answer.question_id))
+
+    def test_pivot_forms_are_registered(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(get_pivot_form_ids(), [self.form.id])
+        drop_pivot_table(self.form.id)
+        self.assertEqual(get_pivot_form_ids(), [])
+        self.assertNotIn(
+            get_pivot_table(self.form.id),
+            connection.introspection.table_names(),
+        )
+        # datapoints of forms without a pivot table are left alone
+        with self.assertNumQueries(1):
+            refresh_answer_pivot([self.data])
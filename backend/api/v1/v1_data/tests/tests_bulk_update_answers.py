@@ -0,0 +1,68 @@
+from django.core.management import call_command
+from django.test import TestCase
+from django.test.utils import override_settings
+from api.v1.v1_data.functions import bulk_update_answers
+from api.v1.v1_data.models import FormData, Answers, AnswerHistory
+from api.v1.v1_forms.constants import QuestionTypes
+from api.v1.v1_profile.tests.mixins import ProfileTestHelperMixin
+
+
+@override_settings(USE_TZ=False)
+class BulkUpdateAnswersTestCase(TestCase, ProfileTestHelperMixin):
+    def setUp(self):
+        call_command("administration_seeder", "--test")
+        call_command("form_seeder", "--test")
+        self.create_user("test@akvo.org", self.IS_SUPER_ADMIN)
+        call_command("fake_data_seeder", "-r", 1, "-t", True)
+        self.data = FormData.objects.filter(
+            parent__isnull=True, is_pending=False
+        ).first()
+        self.user = self.data.created_by
+
+    def get_payload(self):
+        payload = []
+        for answer in self.data.data_answer.select_related("question"):
+            question = answer.question
+            if question.type == QuestionTypes.number:
+                value = (answer.value or 0) + 1
+            elif question.type == QuestionTypes.text:
+                value = f"{answer.name} updated"
+            else:
+                continue
+            payload.append({"question": question, "value": value})
+        return payload
+
+    def test_query_count_does_not_grow_with_answers(self):
+        payload = self.get_payload()
+        self.assertGreater(len(payload), 1)
+        with self.assertNumQueries(3):
+            total = bulk_update_answers(self.data, payload, self.user)
+        self.assertEqual(total, len(payload))
+        self.assertEqual(
+            AnswerHistory.objects.filter(data=self.data).count(),
+            len(payload),
+        )
+        for item in payload:
+            answer = Answers.objects.get(
+                data=self.data, question=item["question"]
+            )
+            if item["question"].type == QuestionTypes.number:
+                self.assertEqual(answer.value, item["value"])
+            else:
+                self.assertEqual(answer.name, item["value"])
+            self.assertIsNotNone(answer.updated)
+
+    def test_missing_answer(self):
+        payload = self.get_payload()
+        question = payload[0]["question"]
+        Answers.objects.filter(data=self.data, question=question).delete()
+        with self.assertRaises(Answers.DoesNotExist):
+            bulk_update_answers(
+                self.data, payload, self.user, create_missing=False
+            )
+        bulk_update_answers(self.data, payload, self.user)
+        self.assertTrue(
+            Answers.objects.filter(
+                data=self.data, question=question
+            ).exists()
+        )
@@ -0,0 +1,172 @@
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import override_settings, CaptureQueriesContext
+from api.v1.v1_data.models import FormData, Answers
+from api.v1.v1_forms.constants import QuestionTypes
+
+
+@override_settings(USE_TZ=False)
+class DataListTestCase(TestCase):
+    def setUp(self):
+        call_command("administration_seeder", "--test")
+        call_command("form_seeder", "--test")
+
+        user_payload = {"email": "admin@akvo.org", "password": "Test105*"}
+        user_response = self.client.post(
+            "/api/v1/login", user_payload, content_type="application/json"
+        )
+        self.token = user_response.json().get("token")
+        call_command("fake_data_seeder", "-r", 2, "-t", True)
+        self.data = FormData.objects.filter(
+            parent__isnull=True, is_pending=False
+        ).first()
+        self.form = self.data.form
+
+    def get_list(self, query=""):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(
+                f"/api/v1/form-data/{self.form.id}?page=1{query}",
+                HTTP_AUTHORIZATION=f"Bearer {self.token}",
+            )
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        # warm up the administration tree
+        self.get_list()
+        result, queries = self.get_list()
+        total = result["total"]
+        for i in range(3):
+            data = FormData.objects.create(
+                name=f"{self.data.name} {i}",
+                form=self.form,
+                administration=self.data.administration,
+                created_by=self.data.created_by,
+                updated_by=self.data.created_by,
+            )
+            FormData.objects.create(
+                parent=data,
+                name=data.name,
+                form=self.form,
+                administration=data.administration,
+                created_by=data.created_by,
+                is_pending=True,
+            )
+        result, more_queries = self.get_list()
+        self.assertGreater(result["total"], total)
+        self.assertEqual(queries, more_queries)
+
+    def test_pending_data_and_selected_answers(self):
+        pending = FormData.objects.create(
+            parent=self.data,
+            name=self.data.name,
+            form=self.form,
+            administration=self.data.administration,
+            created_by=self.data.created_by,
+            is_pending=True,
+        )
+        result, _ = self.get_list()
+        row = [d for d in result["data"] if d["id"] == self.data.id][0]
+        self.assertEqual(
+            row["pending_data"],
+            {
+                "id": pending.id,
+                "created_by": self.data.created_by.get_full_name(),
+            },
+        )
+        self.assertNotIn("answers", row)
+
+        question = self.data.data_answer.first().question
+        result, _ = self.get_list(f"&questions={question.id}")
+        row = [d for d in result["data"] if d["id"] == self.data.id][0]
+        self.assertEqual(
+            [a["question"] for a in row["answers"]], [question.id]
+        )
+
+    @override_settings(CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    })
+    def test_cursor_pagination(self):
+        for i in range(12):
+            FormData.objects.create(
+                name=f"{self.data.name} {i}",
+                form=self.form,
+                administration=self.data.administration,
+                created_by=self.data.created_by,
+            )
+        result, _ = self.get_list()
+        total = result["total"]
+
+        ids = []
+        cursor = ""
+        while cursor is not None:
+            result, _ = self.get_list(f"&cursor={cursor}")
+            self.assertEqual(list(result), ["cursor", "next", "total", "data"])
+            self.assertEqual(result["total"], total)
+            ids += [d["id"] for d in result["data"]]
+            cursor = result["next"]
+        self.assertEqual(len(ids), total)
+        self.assertEqual(len(set(ids)), total)
+        expected = FormData.objects.filter(
+            form=self.form, is_pending=False
+        ).order_by("-created", "-id").values_list("id", flat=True)
+        self.assertEqual(ids, list(expected))
+
+        response = self.client.get(
+            f"/api/v1/form-data/{self.form.id}?cursor=invalid",
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_filter_by_answers(self):
+        answer = Answers.objects.filter(
+            data__parent__isnull=True,
+            data__is_pending=False,
+            question__type=QuestionTypes.option,
+        ).first()
+        self.form = answer.data.form
+        option = answer.options[0]
+        result, _ = self.get_list(
+            f"&options={answer.question_id}||{option}"
+        )
+        expected = FormData.objects.filter(
+            form=self.form,
+            is_pending=False,
+            data_answer__question=answer.question,
+            data_answer__options__contains=[option],
+        ).count()
+        self.assertEqual(result["total"], expected)
+        self.assertIn(answer.data_id, [d["id"] for d in result["data"]])
+
+        result, _ = self.get_list(
+            f"&options={answer.question_id}||not-an-option"
+        )
+        self.assertEqual(result["total"], 0)
+
+        number = Answers.objects.filter(
+            data=answer.data, question__type=QuestionTypes.number
+        ).first()
+        if number:
+            result, _ = self.get_list(
+                f"&options={answer.question_id}||{option}"
+                f"&number={number.question_id}||{number.value}||"
+            )
+            self.assertIn(
+                answer.data_id, [d["id"] for d in result["data"]]
+            )
+            result, _ = self.get_list(
+                f"&number={number.question_id}||||{number.value - 1}"
+                f"&text={number.question_id}||missing"
+            )
+            self.assertNotIn(
+                answer.data_id, [d["id"] for d in result["data"]]
+            )
+
+        response = self.client.get(
+            f"/api/v1/form-data/{self.form.id}?page=1&options=invalid",
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+        )
+        self.assertEqual(response.status_code, 400)
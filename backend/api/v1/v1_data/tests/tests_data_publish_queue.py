@@ -0,0 +1,77 @@
+import os
+from datetime import timedelta
+from django.core.management import call_command
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+from django_q.models import Schedule
+from api.v1.v1_data.models import FormData, DataPublishQueue
+from api.v1.v1_data.tasks import (
+    PUBLISH_TASK,
+    queue_data_publish,
+    publish_queued_data,
+)
+from api.v1.v1_profile.tests.mixins import ProfileTestHelperMixin
+from mis.settings import STORAGE_PATH
+
+
+@override_settings(USE_TZ=False)
+class DataPublishQueueTestCase(TestCase, ProfileTestHelperMixin):
+    def setUp(self):
+        call_command("administration_seeder", "--test")
+        call_command("form_seeder", "--test")
+        self.create_user("test@akvo.org", self.IS_SUPER_ADMIN)
+        call_command("fake_data_seeder", "-r", 1, "-t", True)
+        self.data = FormData.objects.filter(
+            form__parent__isnull=True, is_pending=False
+        ).first()
+        self.file = f"{STORAGE_PATH}/datapoints/{self.data.uuid}.json"
+        if os.path.exists(self.file):
+            os.remove(self.file)
+
+    def test_requests_are_coalesced(self):
+        queue_data_publish([self.data])
+        first = DataPublishQueue.objects.get(uuid=self.data.uuid)
+        queue_data_publish([self.data])
+        queue_data_publish([self.data])
+        self.assertEqual(DataPublishQueue.objects.count(), 1)
+        item = DataPublishQueue.objects.get(uuid=self.data.uuid)
+        self.assertEqual(item.queued, first.queued)
+        self.assertGreaterEqual(item.requested, first.requested)
+        self.assertEqual(Schedule.objects.filter(func=PUBLISH_TASK).count(), 1)
+        self.assertFalse(os.path.exists(self.file))
+
+    def test_publish_due_items(self):
+        queue_data_publish([self.data])
+        # nothing is due within the window
+        self.assertEqual(publish_queued_data(), 0)
+        self.assertFalse(os.path.exists(self.file))
+
+        response = self.client.get("/api/v1/health/publish-queue")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["pending"], 1)
+
+        DataPublishQueue.objects.update(
+            queued=timezone.now() - timedelta(minutes=1)
+        )
+        Schedule.objects.filter(func=PUBLISH_TASK).delete()
+        self.assertEqual(publish_queued_data(), 1)
+        self.assertTrue(os.path.exists(self.file))
+        self.assertFalse(DataPublishQueue.objects.exists())
+        self.assertFalse(Schedule.objects.filter(func=PUBLISH_TASK).exists())
+        self.assertEqual(
+            self.client.get("/api/v1/health/publish-queue").json()["lag"], 0
+        )
+
+    def test_monitoring_data_is_not_queued(self):
+        child = FormData.objects.filter(form__parent__isnull=False).first()
+        if not child:
+            child = FormData.objects.create(
+                name=self.data.name,
+                uuid=self.data.uuid,
+                form=self.data.form.children.first(),
+                administration=self.data.administration,
+                created_by=self.data.created_by,
+            )
+        queue_data_publish([child])
+        self.assertFalse(DataPublishQueue.objects.exists())
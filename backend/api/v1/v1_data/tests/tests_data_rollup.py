@@ -0,0 +1,120 @@
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase
+from django.test.utils import override_settings
+from api.v1.v1_data.constants import DataRollupStatus
+from api.v1.v1_data.models import FormData, FormDataRollup
+from api.v1.v1_data.rollup import (
+    get_rollup_lock_id,
+    get_rollup_period,
+    refresh_data_rollup,
+)
+from api.v1.v1_data.tasks import seed_approved_data
+from api.v1.v1_profile.tests.mixins import ProfileTestHelperMixin
+
+
+@override_settings(USE_TZ=False)
+class DataRollupTestCase(TestCase, ProfileTestHelperMixin):
+    def setUp(self):
+        call_command("administration_seeder", "--test")
+        call_command("form_seeder", "--test")
+        self.create_user("test@akvo.org", self.IS_SUPER_ADMIN)
+        call_command("fake_data_seeder", "-r", 4, "-t", True)
+        call_command("build_data_rollup", "--test")
+        self.data = FormData.objects.filter(is_pending=False).first()
+
+    def get_count(self, data, status):
+        return (
+            FormDataRollup.objects.filter(
+                form_id=data.form_id,
+                administration_id=data.administration_id,
+                period=get_rollup_period(data.created),
+                status=status,
+            )
+            .values_list("count", flat=True)
+            .first()
+        ) or 0
+
+    def test_rebuild_matches_the_data(self):
+        for is_pending, status in [
+            (True, DataRollupStatus.pending),
+            (False, DataRollupStatus.approved),
+        ]:
+            total = FormDataRollup.objects.filter(status=status).aggregate(
+                total=Sum("count")
+            )["total"] or 0
+            self.assertEqual(
+                total, FormData.objects.filter(is_pending=is_pending).count()
+            )
+        self.assertFalse(FormDataRollup.objects.filter(count=0).exists())
+
+    def test_refresh_follows_approval_and_deletion(self):
+        data = FormData.objects.create(
+            name="New datapoint",
+            form=self.data.form,
+            administration=self.data.administration,
+            created_by=self.data.created_by,
+            is_pending=True,
+        )
+        approved = self.get_count(data, DataRollupStatus.approved)
+        pending = self.get_count(data, DataRollupStatus.pending)
+        refresh_data_rollup([data])
+        self.assertEqual(
+            self.get_count(data, DataRollupStatus.pending), pending + 1
+        )
+
+        seed_approved_data(data)
+        self.assertEqual(
+            self.get_count(data, DataRollupStatus.pending), pending
+        )
+        self.assertEqual(
+            self.get_count(data, DataRollupStatus.approved), approved + 1
+        )
+
+        data.delete()
+        refresh_data_rollup([data])
+        self.assertEqual(
+            self.get_count(data, DataRollupStatus.approved), approved
+        )
+
+        total = self.get_count(self.data, DataRollupStatus.approved)
+        self.data.delete()
+        refresh_data_rollup([self.data])
+        # refreshing again gives the same counts
+        refresh_data_rollup([self.data])
+        self.assertEqual(
+            self.get_count(self.data, DataRollupStatus.approved), total - 1
+        )
+
+    def test_cells_are_locked_before_counting(self):
+        key = (
+            self.data.form_id,
+            self.data.administration_id,
+            get_rollup_period(self.data.created),
+        )
+        with CaptureQueriesContext(connection) as queries:
+            refresh_data_rollup([self.data])
+        statements = [q["sql"] for q in queries.captured_queries]
+        locks = [
+            ix for ix, sql in enumerate(statements)
+            if "pg_advisory_xact_lock" in sql
+        ]
+        counts = [
+            ix for ix, sql in enumerate(statements)
+            if "COUNT(" in sql
+        ]
+        self.assertEqual(len(locks), 1)
+        self.assertIn(str(get_rollup_lock_id(key)), statements[locks[0]])
+        self.assertLess(locks[0], counts[0])
+        self.assertEqual(
+            self.get_count(self.data, DataRollupStatus.approved),
+            FormData.objects.filter(
+                form_id=self.data.form_id,
+                administration_id=self.data.administration_id,
+                is_pending=False,
+                created__month=self.data.created.month,
+                created__year=self.data.created.year,
+            ).count(),
+        )
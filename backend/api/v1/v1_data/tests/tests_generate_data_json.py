@@ -1,9 +1,14 @@
 import os
+import hashlib
 from mis.settings import STORAGE_PATH
 from django.core.management import call_command
 from django.test import TestCase
 from django.test.utils import override_settings
-from api.v1.v1_data.models import FormData
+from api.v1.v1_data.models import FormData, DataSnapshot
+from api.v1.v1_data.management.commands.generate_data_json import (
+    CHECKPOINT_FILE,
+    write_checkpoint,
+)
 
 
 @override_settings(USE_TZ=False)
@@ -26,3 +31,50 @@ class GenerateDataJSONTestCase(TestCase):
             os.path.exists(f"{STORAGE_PATH}/datapoints/{form_data.uuid}.json"),
             "File not exists"
         )
+
+    def test_unchanged_snapshot_is_not_rewritten(self):
+        form_data = FormData.objects.filter(
+            is_pending=False, form__parent__isnull=True
+        ).first()
+        file = f"{STORAGE_PATH}/datapoints/{form_data.uuid}.json"
+        snapshot = DataSnapshot.objects.get(uuid=form_data.uuid)
+        with open(file) as f:
+            content = f.read()
+        self.assertEqual(
+            snapshot.hash,
+            hashlib.sha256(content.encode("utf-8")).hexdigest(),
+        )
+        modified = os.path.getmtime(file)
+
+        call_command("generate_data_json", "--test", 1)
+        snapshot.refresh_from_db()
+        self.assertEqual(os.path.getmtime(file), modified)
+
+        form_data.name = "Renamed datapoint"
+        form_data.save()
+        form_data.save_to_file
+        updated = DataSnapshot.objects.get(uuid=form_data.uuid)
+        self.assertEqual(updated.version, snapshot.version + 1)
+        self.assertNotEqual(updated.hash, snapshot.hash)
+
+    def test_resume_from_checkpoint(self):
+        data = FormData.objects.filter(
+            is_pending=False, form__parent__isnull=True
+        ).order_by("id")
+        first, last = data.first(), data.last()
+        for form_data in [first, last]:
+            file = f"{STORAGE_PATH}/datapoints/{form_data.uuid}.json"
+            os.remove(file)
+        # a previous run stopped after the first chunk
+        write_checkpoint(first.id)
+        call_command(
+            "generate_data_json", "--test", 1, "--resume", 1,
+            "--chunk-size", 1
+        )
+        self.assertFalse(
+            os.path.exists(f"{STORAGE_PATH}/datapoints/{first.uuid}.json")
+        )
+        self.assertTrue(
+            os.path.exists(f"{STORAGE_PATH}/datapoints/{last.uuid}.json")
+        )
+        self.assertFalse(os.path.exists(CHECKPOINT_FILE))
@@ -7,6 +7,7 @@ from api.v1.v1_data.views import (
     PendingFormDataView,
     PendingDataDetailDeleteView,
     DataDetailDeleteView,
+    data_publish_status,
 )
 from api.v1.v1_users.views import health_check, get_config_file, email_template
 
@@ -35,6 +36,9 @@ urlpatterns = [
         r"^(?P<version>(v1))/export/form/(?P<form_id>[0-9]+)", export_form_data
     ),
     re_path(r"^(?P<version>(v1))/health/check", health_check),
+    re_path(
+        r"^(?P<version>(v1))/health/publish-queue", data_publish_status
+    ),
     re_path(r"^(?P<version>(v1))/config.js", get_config_file),
     re_path(r"^(?P<version>(v1))/email_template", email_template),
 ]
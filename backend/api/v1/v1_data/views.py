@@ -3,8 +3,8 @@ import pandas as pd
 import os
 import pathlib
 
-from math import ceil
 from wsgiref.util import FileWrapper
+from django.db import transaction
 from django.utils import timezone
 from django.http import HttpResponse
 from drf_spectacular.types import OpenApiTypes
@@ -17,16 +17,23 @@ from drf_spectacular.utils import (
 from rest_framework import serializers, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.generics import get_object_or_404
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from api.v1.v1_data.functions import (
+    bulk_update_answers,
+    filter_form_data_by_answers,
+    prefetch_form_data_list,
+)
 from api.v1.v1_data.models import (
     FormData,
     Answers,
     AnswerHistory,
 )
+from api.v1.v1_data.pivot import refresh_answer_pivot
+from api.v1.v1_data.rollup import refresh_data_rollup
+from api.v1.v1_data.tasks import get_data_publish_lag, queue_data_publish
 from api.v1.v1_data.serializers import (
     SubmitFormSerializer,
     ListFormDataSerializer,
@@ -38,14 +45,11 @@ from api.v1.v1_data.serializers import (
     SubmitFormDataAnswerSerializer,
     FormDataSerializer,
 )
-from api.v1.v1_forms.constants import (
-    QuestionTypes
-)
-from api.v1.v1_forms.models import Forms, Questions
+from api.v1.v1_forms.models import Forms
 from api.v1.v1_profile.models import Administration
 from api.v1.v1_approval.constants import DataApprovalStatus
 
-from mis.settings import REST_FRAMEWORK
+from utils.custom_pagination import KeysetPagination
 from utils.custom_permissions import (
     IsEditor,
     IsSuperAdminOrFormUser,
@@ -106,12 +110,30 @@ class FormDataAddListView(APIView):
                 type={"type": "array", "items": {"type": "string"}},
                 location=OpenApiParameter.QUERY,
             ),
+            OpenApiParameter(
+                name="number",
+                required=False,
+                type={"type": "array", "items": {"type": "string"}},
+                location=OpenApiParameter.QUERY,
+            ),
+            OpenApiParameter(
+                name="text",
+                required=False,
+                type={"type": "array", "items": {"type": "string"}},
+                location=OpenApiParameter.QUERY,
+            ),
             OpenApiParameter(
                 name="parent",
                 required=False,
                 type=OpenApiTypes.STR,
                 location=OpenApiParameter.QUERY,
             ),
+            OpenApiParameter(
+                name="cursor",
+                required=False,
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+            ),
         ],
         summary="To get list of form data",
     )
@@ -125,9 +147,7 @@ class FormDataAddListView(APIView):
                 {"message": validate_serializers_message(serializer.errors)},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        page_size = REST_FRAMEWORK.get("PAGE_SIZE")
-
-        paginator = PageNumberPagination()
+        paginator = KeysetPagination()
 
         parent = serializer.validated_data.get("parent")
         if parent:
@@ -137,17 +157,15 @@ class FormDataAddListView(APIView):
                 is_pending=False
             )
             queryset = queryset.order_by("-created")
-            instance = paginator.paginate_queryset(queryset, request)
-            total = queryset.count()
+            questions = serializer.validated_data.get("questions")
+            instance = paginator.paginate_queryset(
+                prefetch_form_data_list(queryset, questions), request
+            )
             data = {
-                "current": int(request.GET.get("page", "1")),
-                "total": total,
-                "total_page": ceil(total / page_size),
+                **paginator.get_page_info(),
                 "data": ListFormDataSerializer(
                     instance=instance,
-                    context={
-                        "questions": serializer.validated_data.get("questions")
-                    },
+                    context={"questions": questions},
                     many=True,
                 ).data,
             }
@@ -161,19 +179,9 @@ class FormDataAddListView(APIView):
             filter_administration = serializer.validated_data.get(
                 "administration"
             )
-            if filter_administration.path:
-                filter_path = "{0}{1}.".format(
-                    filter_administration.path, filter_administration.id
-                )
-            else:
-                filter_path = f"{filter_administration.id}."
-            filter_descendants = list(
-                Administration.objects.filter(
-                    path__startswith=filter_path
-                ).values_list("id", flat=True)
-            )
-            filter_descendants.append(filter_administration.id)
-            filter_data["administration_id__in"] = filter_descendants
+            filter_data[
+                "administration__closure_ancestors__ancestor"
+            ] = filter_administration
         else:
             # Filter data by user administration path
             adm = Administration.objects.filter(
@@ -183,24 +191,27 @@ class FormDataAddListView(APIView):
                 user_role = request.user.user_user_role.first()
                 if user_role:
                     adm = user_role.administration
-            user_path = adm.path if adm.path else f"{adm.pk}."
-            filter_data["administration__path__startswith"] = user_path
+            filter_data["administration__closure_ancestors__ancestor"] = adm
 
         queryset = form.form_form_data.filter(**filter_data).order_by(
             "-created"
         )
+        queryset = filter_form_data_by_answers(
+            queryset,
+            options=serializer.validated_data.get("options"),
+            numbers=serializer.validated_data.get("number"),
+            texts=serializer.validated_data.get("text"),
+        )
 
-        instance = paginator.paginate_queryset(queryset, request)
-        total = queryset.count()
+        questions = serializer.validated_data.get("questions")
+        instance = paginator.paginate_queryset(
+            prefetch_form_data_list(queryset, questions), request
+        )
         data = {
-            "current": int(request.GET.get("page", "1")),
-            "total": total,
-            "total_page": ceil(total / page_size),
+            **paginator.get_page_info(),
             "data": ListFormDataSerializer(
                 instance=instance,
-                context={
-                    "questions": serializer.validated_data.get("questions")
-                },
+                context={"questions": questions},
                 many=True,
             ).data,
         }
@@ -259,65 +270,16 @@ class FormDataAddListView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        answers = request.data
-
         # Direct update
-        # move current answer to answer_history
-        for answer in answers:
-            form_answer = Answers.objects.filter(
-                data=data, question=answer.get("question")
-            ).first()
-            if form_answer:
-                AnswerHistory.objects.create(
-                    data=form_answer.data,
-                    question=form_answer.question,
-                    name=form_answer.name,
-                    value=form_answer.value,
-                    options=form_answer.options,
-                    created_by=user,
-                )
-            if not form_answer:
-                form_answer = Answers(
-                    data=data,
-                    question_id=answer.get("question"),
-                    created_by=user,
-                )
-            # prepare updated answer
-            question_id = answer.get("question")
-            question = Questions.objects.get(id=question_id)
-            name = None
-            value = None
-            option = None
-            if question.type in [
-                QuestionTypes.geo,
-                QuestionTypes.option,
-                QuestionTypes.multiple_option,
-            ]:
-                option = answer.get("value")
-            elif question.type in [
-                QuestionTypes.text,
-                QuestionTypes.photo,
-                QuestionTypes.date,
-                QuestionTypes.attachment,
-                QuestionTypes.signature,
-            ]:
-                name = answer.get("value")
-            else:
-                # for administration,number question type
-                value = answer.get("value")
-            # Update answer
-            form_answer.data = data
-            form_answer.question = question
-            form_answer.name = name
-            form_answer.value = value
-            form_answer.options = option
-            form_answer.updated = timezone.now()
-            form_answer.save()
-        # update datapoint
-        data.updated = timezone.now()
-        data.updated_by = user
-        data.save()
-        data.save_to_file
+        # move current answers to answer_history in one batch
+        with transaction.atomic():
+            bulk_update_answers(data, serializer.validated_data, user)
+            # update datapoint
+            data.updated = timezone.now()
+            data.updated_by = user
+            data.save()
+            refresh_answer_pivot([data])
+        queue_data_publish([data])
         return Response(
             {"message": "direct update success"}, status=status.HTTP_200_OK
         )
@@ -355,6 +317,8 @@ class DataAnswerDetailDeleteView(APIView):
         if history.count():
             history.delete()
         instance.delete()
+        refresh_answer_pivot([instance])
+        refresh_data_rollup([instance])
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -404,6 +368,7 @@ class PendingDataDetailDeleteView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
         instance.delete()
+        refresh_data_rollup([instance])
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -437,6 +402,8 @@ class DataDetailDeleteView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
         instance.delete()
+        refresh_answer_pivot([instance])
+        refresh_data_rollup([instance])
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -511,13 +478,18 @@ class PendingFormDataView(APIView):
                 required=True,
                 type=OpenApiTypes.NUMBER,
                 location=OpenApiParameter.QUERY,
-            )
+            ),
+            OpenApiParameter(
+                name="cursor",
+                required=False,
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+            ),
         ],
         summary="To get list of pending form data",
     )
     def get(self, request, form_id, version):
         form = get_object_or_404(Forms, pk=form_id)
-        page_size = REST_FRAMEWORK.get("PAGE_SIZE")
 
         # Get all child form IDs including the parent form
         form_ids = [form.id]
@@ -532,13 +504,11 @@ class PendingFormDataView(APIView):
             is_pending=True
         ).order_by("-created")
 
-        paginator = PageNumberPagination()
+        paginator = KeysetPagination()
         instance = paginator.paginate_queryset(queryset, request)
 
         data = {
-            "current": int(request.GET.get("page", "1")),
-            "total": queryset.count(),
-            "total_page": ceil(queryset.count() / page_size),
+            **paginator.get_page_info(),
             "data": ListPendingFormDataSerializer(
                 instance=instance, many=True
             ).data,
@@ -580,55 +550,18 @@ class PendingFormDataView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        pending_answers = request.data
-        # move current pending_answer to answer_history
-        for answer in pending_answers:
-            form_answer = Answers.objects.get(
-                data=pending_data, question=answer.get("question")
+        # move current pending_answer to answer_history in one batch
+        with transaction.atomic():
+            bulk_update_answers(
+                pending_data,
+                serializer.validated_data,
+                user,
+                create_missing=False,
             )
-            AnswerHistory.objects.create(
-                data=form_answer.data,
-                question=form_answer.question,
-                name=form_answer.name,
-                value=form_answer.value,
-                options=form_answer.options,
-                created_by=user,
-            )
-            # prepare updated answer
-            question_id = answer.get("question")
-            question = Questions.objects.get(id=question_id)
-            name = None
-            value = None
-            option = None
-            if question.type in [
-                QuestionTypes.geo,
-                QuestionTypes.option,
-                QuestionTypes.multiple_option,
-            ]:
-                option = answer.get("value")
-            elif question.type in [
-                QuestionTypes.text,
-                QuestionTypes.photo,
-                QuestionTypes.date,
-                QuestionTypes.attachment,
-                QuestionTypes.signature,
-            ]:
-                name = answer.get("value")
-            else:
-                # for administration,number question type
-                value = answer.get("value")
-            # Update answer
-            form_answer.data = pending_data
-            form_answer.question = question
-            form_answer.name = name
-            form_answer.value = value
-            form_answer.options = option
-            form_answer.updated = timezone.now()
-            form_answer.save()
-        # update datapoint
-        pending_data.updated = timezone.now()
-        pending_data.updated_by = user
-        pending_data.save()
+            # update datapoint
+            pending_data.updated = timezone.now()
+            pending_data.updated_by = user
+            pending_data.save()
         if hasattr(pending_data, "data_batch_list") and \
                 not pending_data.data_batch_list.batch.approved:
             # If this pending data is part of a batch,
@@ -647,3 +580,22 @@ class PendingFormDataView(APIView):
         return Response(
             {"message": "update success"}, status=status.HTTP_200_OK
         )
+
+
+@extend_schema(
+    responses={
+        (200, "application/json"): inline_serializer(
+            "DataPublishLag",
+            fields={
+                "pending": serializers.IntegerField(),
+                "oldest": serializers.DateTimeField(),
+                "lag": serializers.FloatField(),
+            },
+        )
+    },
+    description="Use to check the datapoint JSON publishing lag",
+    tags=["Dev"],
+)
+@api_view(["GET"])
+def data_publish_status(request, version):
+    return Response(get_data_publish_lag(), status=status.HTTP_200_OK)
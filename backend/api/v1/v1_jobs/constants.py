@@ -8,6 +8,24 @@ class DataDownloadTypes:
     }
 
 
+class DataDownloadFormats:
+    xlsx = "xlsx"
+    csv = "csv"
+    parquet = "parquet"
+
+    FieldStr = {
+        xlsx: "xlsx",
+        csv: "csv",
+        parquet: "parquet",
+    }
+
+    Extension = {
+        xlsx: "xlsx",
+        csv: "csv.gz",
+        parquet: "parquet",
+    }
+
+
 class JobTypes:
     send_email = 1
     validate_data = 2
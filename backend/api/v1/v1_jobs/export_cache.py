@@ -0,0 +1,133 @@
+import json
+import heapq
+import hashlib
+from django.db import transaction
+from api.v1.v1_data.functions import get_sync_horizon
+from api.v1.v1_forms.models import Forms
+from api.v1.v1_jobs.export_data import (
+    EXPORT_BATCH_SIZE,
+    get_export_queryset,
+    iter_export_batches,
+)
+from api.v1.v1_jobs.models import DataExportCache, DataExportRow
+from api.v1.v1_profile.tree import administration_tree
+from utils.export_form import get_question_names
+
+
+def get_export_signature(questions) -> str:
+    # rows are rendered again when a question or an administration
+    # name they contain may have changed
+    content = json.dumps(
+        {
+            "questions": [list(q) for q in questions],
+            "administration": administration_tree.get_version(),
+        }
+    )
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def refresh_export_cache(
+    form: Forms,
+    administration=None,
+    download_type: str = "all",
+    questions=None,
+):
+    """
+    Bring the cached export rows of a form, administration subtree and
+    download type up to date. Only the datapoints written by a
+    transaction that was not committed yet at the last refresh are
+    rendered, rows that left the selection are removed.
+
+    Returns the cache and the number of rendered rows.
+    """
+    if questions is None:
+        questions = get_question_names(form=form)
+    signature = get_export_signature(questions)
+    administration_ids = None
+    if administration:
+        administration_ids = administration.descendants.values("id")
+    queryset = get_export_queryset(
+        form=form,
+        administration_ids=administration_ids,
+        download_type=download_type,
+    )
+    export_cache, _ = DataExportCache.objects.get_or_create(
+        form=form, administration=administration, download_type=download_type
+    )
+    rendered = 0
+    with transaction.atomic():
+        # concurrent requests for the same export wait for this one,
+        # then only render what changed in between
+        export_cache = DataExportCache.objects.select_for_update().get(
+            pk=export_cache.pk
+        )
+        # taken before reading, from the database rather than the app
+        # clock, so a write committed late is still seen next time
+        next_horizon = get_sync_horizon()
+        horizon = export_cache.horizon
+        if export_cache.signature != signature or horizon is None:
+            export_cache.rows.all().delete()
+            changed = queryset
+        else:
+            export_cache.rows.exclude(
+                data_id__in=queryset.values("id")
+            ).delete()
+            changed = queryset.filter(sync_txid__gte=horizon)
+        for batch in iter_export_batches(
+            form=form, questions=questions, queryset=changed
+        ):
+            export_cache.rows.filter(
+                data_id__in=[row["id"] for row in batch]
+            ).delete()
+            DataExportRow.objects.bulk_create(
+                [
+                    DataExportRow(
+                        cache=export_cache, data_id=row["id"], values=row
+                    )
+                    for row in batch
+                ]
+            )
+            rendered += len(batch)
+        export_cache.signature = signature
+        export_cache.horizon = next_horizon
+        export_cache.save()
+    return export_cache, rendered
+
+
+def iter_cached_batches(
+    export_cache: DataExportCache, batch_size: int = EXPORT_BATCH_SIZE
+):
+    """
+    Yield the cached row dicts in datapoint order, in the same batches
+    as iter_export_batches
+    """
+    last_id = 0
+    while True:
+        batch = list(
+            export_cache.rows.filter(data_id__gt=last_id)
+            .order_by("data_id")
+            .values_list("data_id", "values")[:batch_size]
+        )
+        if not batch:
+            break
+        last_id = batch[-1][0]
+        yield [values for _, values in batch]
+
+
+def iter_merged_batches(sources, batch_size: int = EXPORT_BATCH_SIZE):
+    """
+    Merge row dict batches of several sources, each in datapoint order,
+    into batches in datapoint order
+    """
+    rows = heapq.merge(
+        *[(row for batch in source for row in batch) for source in sources],
+        key=lambda row: row["id"],
+    )
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,452 @@
+import csv
+import gzip
+import pandas as pd
+import xlsxwriter
+from collections import defaultdict
+from django.db.models import Subquery, Max
+from api.v1.v1_data.models import Answers
+from api.v1.v1_forms.constants import QuestionTypes
+from api.v1.v1_forms.models import Forms, QuestionOptions
+from api.v1.v1_jobs.constants import DataDownloadFormats
+from api.v1.v1_profile.tree import administration_tree
+from utils.export_form import (
+    get_question_names,
+    meta_columns,
+    write_definition_sheets,
+    write_sheet_rows,
+)
+
+EXPORT_BATCH_SIZE = 1000
+DATE_FORMAT = "%B %d, %Y %I:%M %p"
+
+OPTION_TYPES = [
+    QuestionTypes.geo,
+    QuestionTypes.option,
+    QuestionTypes.multiple_option,
+]
+NAME_TYPES = [
+    QuestionTypes.text,
+    QuestionTypes.photo,
+    QuestionTypes.date,
+    QuestionTypes.autofield,
+    QuestionTypes.cascade,
+    QuestionTypes.attachment,
+    QuestionTypes.signature,
+]
+
+
+def get_export_queryset(
+    form: Forms, administration_ids=None, download_type: str = "all"
+):
+    data = form.form_form_data.all()
+    if administration_ids is not None:
+        data = data.filter(administration_id__in=administration_ids)
+    if download_type == "recent":
+        latest_per_uuid = (
+            data.values("uuid")
+            .annotate(latest_created=Max("created"))
+            .values("latest_created")
+        )
+        data = data.filter(created__in=Subquery(latest_per_uuid))
+    return data
+
+
+def get_answer_value(question_type, name, value, options):
+    # same output as Answers.to_data_frame, from plain column values
+    if question_type in OPTION_TYPES:
+        return "|".join(map(str, options)) if options is not None else None
+    if question_type in NAME_TYPES:
+        return name
+    if question_type == QuestionTypes.administration:
+        if not value:
+            return None
+        return administration_tree.get_full_path_name(int(value)) or None
+    return value
+
+
+def get_meta_values(data) -> dict:
+    return {
+        "id": data.id,
+        "created_at": data.created.strftime(DATE_FORMAT),
+        "created_by": data.created_by.get_full_name(),
+        "updated_at": (
+            data.updated.strftime(DATE_FORMAT) if data.updated else None
+        ),
+        "updated_by": (
+            data.updated_by.get_full_name() if data.updated_by else None
+        ),
+        "datapoint_name": data.name,
+        "administration": (
+            administration_tree.get_full_path_name(data.administration_id)
+            if data.administration_id
+            else None
+        ),
+        "geolocation": f"{data.geo[0]}, {data.geo[1]}" if data.geo else None,
+    }
+
+
+def iter_export_batches(
+    form: Forms,
+    questions=None,
+    administration_ids=None,
+    download_type: str = "all",
+    batch_size: int = EXPORT_BATCH_SIZE,
+    queryset=None,
+):
+    """
+    Yield lists of row dicts, keyed by the meta columns and the
+    question names. Datapoints are read in id batches and their
+    answers are pivoted per batch, so memory does not grow with the
+    size of the form.
+    """
+    if questions is None:
+        questions = get_question_names(form=form)
+    question_types = {qid: (name, qtype) for qid, name, qtype in questions}
+    if queryset is None:
+        queryset = get_export_queryset(
+            form=form,
+            administration_ids=administration_ids,
+            download_type=download_type,
+        )
+    queryset = queryset.select_related("created_by", "updated_by")
+    last_id = 0
+    while True:
+        batch = list(queryset.filter(id__gt=last_id).order_by("id")[
+            :batch_size
+        ])
+        if not batch:
+            break
+        last_id = batch[-1].id
+        answers = defaultdict(dict)
+        # the higher index of a repeated answer wins, as in to_data_frame
+        values = Answers.objects.filter(
+            data_id__in=[d.id for d in batch],
+            question_id__in=list(question_types),
+        ).order_by("data_id", "index", "id").values_list(
+            "data_id", "question_id", "name", "value", "options"
+        )
+        for data_id, question_id, name, value, options in values:
+            question_name, question_type = question_types[question_id]
+            answers[data_id][question_name] = get_answer_value(
+                question_type, name, value, options
+            )
+        rows = []
+        for data in batch:
+            row = get_meta_values(data)
+            row.update(answers.pop(data.id, {}))
+            rows.append(row)
+        yield rows
+
+
+def iter_export_rows(
+    form: Forms,
+    questions=None,
+    administration_ids=None,
+    download_type: str = "all",
+    batch_size: int = EXPORT_BATCH_SIZE,
+):
+    """
+    Yield one row dict per datapoint, see iter_export_batches
+    """
+    for rows in iter_export_batches(
+        form=form,
+        questions=questions,
+        administration_ids=administration_ids,
+        download_type=download_type,
+        batch_size=batch_size,
+    ):
+        yield from rows
+
+
+def get_option_labels(question_ids) -> dict:
+    """
+    Option value to label dictionaries of the given questions, loaded
+    with one query
+    """
+    labels = {qid: {} for qid in question_ids}
+    options = QuestionOptions.objects.filter(
+        question_id__in=question_ids
+    ).values_list("question_id", "value", "label")
+    for question_id, value, label in options:
+        labels[question_id][value] = label
+    return labels
+
+
+def translate_option_labels(values: pd.Series, labels: dict) -> pd.Series:
+    """
+    Replace the "|" separated option values of a column by their
+    labels. Unknown values are dropped, empty cells are kept as is.
+    """
+    present = values.notna()
+    if not present.any():
+        return values
+    exploded = values[present].astype(str).str.split("|").explode()
+    translated = exploded.map(labels).dropna()
+    joined = translated.groupby(level=0).agg("|".join)
+    result = values.astype(object)
+    result[present] = joined.reindex(
+        values[present].index, fill_value=""
+    )
+    return result
+
+
+def get_label_columns(questions, use_label: bool = False) -> dict:
+    if not use_label:
+        return {}
+    option_questions = {
+        qid: name
+        for qid, name, qtype in questions
+        if qtype in [QuestionTypes.option, QuestionTypes.multiple_option]
+    }
+    option_labels = get_option_labels(list(option_questions))
+    return {
+        option_questions[qid]: labels
+        for qid, labels in option_labels.items()
+    }
+
+
+def iter_export_values(
+    form: Forms,
+    questions,
+    administration_ids=None,
+    download_type: str = "all",
+    use_label: bool = False,
+    batches=None,
+):
+    """
+    Yield batches of rows as lists of cell values, in the order of
+    meta_columns followed by the questions. Row dict batches can be
+    given, e.g. from the export cache, instead of being rendered.
+    """
+    columns = meta_columns + [q[1] for q in questions]
+    label_columns = get_label_columns(questions, use_label)
+    if batches is None:
+        batches = iter_export_batches(
+            form=form,
+            questions=questions,
+            administration_ids=administration_ids,
+            download_type=download_type,
+        )
+    for batch in batches:
+        if not label_columns:
+            yield [[row.get(column) for column in columns] for row in batch]
+            continue
+        df = pd.DataFrame(batch, columns=columns)
+        for name, labels in label_columns.items():
+            df[name] = translate_option_labels(df[name], labels)
+        # NaN is not a valid cell value
+        df = df.astype(object).where(df.notna(), None)
+        yield list(df.itertuples(index=False, name=None))
+
+
+def write_data_workbook(
+    file_path: str,
+    form: Forms,
+    administration_ids=None,
+    download_type: str = "all",
+    use_label: bool = False,
+    context: list = None,
+    batches=None,
+) -> int:
+    """
+    Write the data, definition and optional context sheets with
+    xlsxwriter in constant_memory mode, every row is flushed to disk
+    as soon as the next one is written.
+    """
+    workbook = xlsxwriter.Workbook(file_path, {"constant_memory": True})
+    header_format = workbook.add_format(
+        {"bold": True, "text_wrap": True, "valign": "top", "border": 1}
+    )
+    questions = get_question_names(form=form)
+    columns = meta_columns + [q[1] for q in questions]
+    values = iter_export_values(
+        form=form,
+        questions=questions,
+        administration_ids=administration_ids,
+        download_type=download_type,
+        use_label=use_label,
+        batches=batches,
+    )
+    total = write_sheet_rows(
+        workbook.add_worksheet("data"),
+        columns,
+        (row for batch in values for row in batch),
+        header_format,
+    )
+    write_definition_sheets(
+        form=form, workbook=workbook, header_format=header_format
+    )
+    if context:
+        write_context_sheet(workbook=workbook, context=context)
+    workbook.close()
+    return total
+
+
+def write_data_csv(
+    file_path: str,
+    form: Forms,
+    administration_ids=None,
+    download_type: str = "all",
+    use_label: bool = False,
+    batches=None,
+) -> int:
+    """
+    Write the data rows to a gzip compressed CSV file, batch by batch
+    """
+    questions = get_question_names(form=form)
+    total = 0
+    with gzip.open(file_path, "wt", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(meta_columns + [q[1] for q in questions])
+        for batch in iter_export_values(
+            form=form,
+            questions=questions,
+            administration_ids=administration_ids,
+            download_type=download_type,
+            use_label=use_label,
+            batches=batches,
+        ):
+            writer.writerows(batch)
+            total += len(batch)
+    return total
+
+
+def get_parquet_schema(questions):
+    import pyarrow as pa
+
+    types = {
+        QuestionTypes.number: pa.float64(),
+        QuestionTypes.date: pa.timestamp("ms"),
+        QuestionTypes.geo: pa.list_(pa.float64()),
+    }
+    fields = [pa.field("id", pa.int64())]
+    fields += [pa.field(column, pa.string()) for column in meta_columns[1:]]
+    fields += [
+        pa.field(name, types.get(qtype, pa.string()))
+        for qid, name, qtype in questions
+    ]
+    return pa.schema(fields)
+
+
+def get_parquet_frame(batch, questions, columns) -> pd.DataFrame:
+    df = pd.DataFrame(batch, columns=columns)
+    for qid, name, qtype in questions:
+        values = df[name]
+        if qtype == QuestionTypes.number:
+            df[name] = pd.to_numeric(values, errors="coerce")
+        elif qtype == QuestionTypes.date:
+            df[name] = pd.to_datetime(values, errors="coerce")
+        elif qtype == QuestionTypes.geo:
+            df[name] = [
+                [float(v) for v in value.split("|")] if value else None
+                for value in values
+            ]
+        else:
+            df[name] = [
+                str(value) if value is not None else None
+                for value in values
+            ]
+    return df
+
+
+def write_data_parquet(
+    file_path: str,
+    form: Forms,
+    administration_ids=None,
+    download_type: str = "all",
+    use_label: bool = False,
+    batches=None,
+) -> int:
+    """
+    Write the data rows to a parquet file with one row group per
+    batch, number, date and geo answers keep their types
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    questions = get_question_names(form=form)
+    columns = meta_columns + [q[1] for q in questions]
+    schema = get_parquet_schema(questions)
+    total = 0
+    with pq.ParquetWriter(file_path, schema) as writer:
+        for batch in iter_export_values(
+            form=form,
+            questions=questions,
+            administration_ids=administration_ids,
+            download_type=download_type,
+            use_label=use_label,
+            batches=batches,
+        ):
+            df = get_parquet_frame(batch, questions, columns)
+            writer.write_table(
+                pa.Table.from_pandas(
+                    df, schema=schema, preserve_index=False
+                )
+            )
+            total += len(batch)
+    return total
+
+
+def write_data_export(
+    file_path: str,
+    form: Forms,
+    file_format: str = DataDownloadFormats.xlsx,
+    administration_ids=None,
+    download_type: str = "all",
+    use_label: bool = False,
+    context: list = None,
+    batches=None,
+) -> int:
+    if file_format == DataDownloadFormats.csv:
+        return write_data_csv(
+            file_path=file_path,
+            form=form,
+            administration_ids=administration_ids,
+            download_type=download_type,
+            use_label=use_label,
+            batches=batches,
+        )
+    if file_format == DataDownloadFormats.parquet:
+        return write_data_parquet(
+            file_path=file_path,
+            form=form,
+            administration_ids=administration_ids,
+            download_type=download_type,
+            use_label=use_label,
+            batches=batches,
+        )
+    return write_data_workbook(
+        file_path=file_path,
+        form=form,
+        administration_ids=administration_ids,
+        download_type=download_type,
+        use_label=use_label,
+        context=context,
+        batches=batches,
+    )
+
+
+def write_context_sheet(workbook, context: list):
+    worksheet = workbook.add_worksheet("context")
+    f = workbook.add_format(
+        {
+            "align": "left",
+            "bold": False,
+            "border": 0,
+        }
+    )
+    worksheet.set_column("A:A", 20, f)
+    worksheet.set_column("B:B", 30, f)
+    merge_format = workbook.add_format(
+        {
+            "bold": True,
+            "border": 1,
+            "align": "center",
+            "valign": "vcenter",
+            "fg_color": "#45add9",
+            "color": "#ffffff",
+        }
+    )
+    worksheet.merge_range("A1:B1", "Context", merge_format)
+    for row, item in enumerate(context, start=1):
+        worksheet.write_row(row, 0, [item["context"], item["value"]])
@@ -3,9 +3,10 @@ import os
 from django_q.models import Task
 
 import pandas as pd
+from django.db import transaction
+from django.db.models import F
 from django.utils import timezone
 from django_q.tasks import async_task
-from django.db.models import Subquery, Max
 from api.v1.v1_jobs.administrations_bulk_upload import (
     seed_administration_data,
     validate_administrations_bulk_upload,
@@ -14,189 +15,179 @@ from utils.upload_entities import (
     validate_entity_file,
     validate_entity_data,
 )
-from api.v1.v1_forms.models import Forms, QuestionOptions
-from api.v1.v1_forms.constants import QuestionTypes
-from api.v1.v1_jobs.constants import JobStatus, JobTypes
+from api.v1.v1_forms.models import Forms
+from api.v1.v1_jobs.constants import (
+    JobStatus,
+    JobTypes,
+    DataDownloadTypes,
+    DataDownloadFormats,
+)
+from api.v1.v1_jobs.export_cache import (
+    refresh_export_cache,
+    iter_cached_batches,
+    iter_merged_batches,
+)
+from api.v1.v1_jobs.export_data import (
+    get_export_queryset,
+    iter_export_batches,
+    iter_export_rows,
+    write_data_export,
+)
 
 # from api.v1.v1_jobs.functions import HText
-from api.v1.v1_jobs.models import Jobs
+from api.v1.v1_jobs.models import Jobs, DataExportCache
 from api.v1.v1_jobs.seed_data import seed_excel_data
 from api.v1.v1_jobs.validate_upload import validate
 from api.v1.v1_profile.models import Administration, EntityData
 from api.v1.v1_users.models import SystemUser
 from utils import storage
 from utils.email_helper import send_email, EmailTypes
-from utils.export_form import (
-    generate_definition_sheet,
-    get_question_names,
-    blank_data_template,
-    meta_columns,
-)
 from utils.functions import update_date_time_format
 from utils.storage import upload
 from utils.custom_generator import generate_sqlite
+from mis.settings import DATA_EXPORT_SHARD_ROWS
 
 logger = logging.getLogger(__name__)
 
 
 def download_data(form: Forms, administration_ids, download_type="all"):
-    filter_data = {}
-    if administration_ids:
-        filter_data["administration_id__in"] = administration_ids
-    data = form.form_form_data.filter(**filter_data)
-    if download_type == "recent":
-        latest_per_uuid = (
-            data.values("uuid")
-            .annotate(latest_created=Max("created"))
-            .values("latest_created")
+    return list(
+        iter_export_rows(
+            form=form,
+            administration_ids=administration_ids,
+            download_type=download_type,
         )
-        data = data.filter(created__in=Subquery(latest_per_uuid))
-    return [d.to_data_frame for d in data.order_by("id")]
-
-
-def get_answer_label(answer_values, question_id):
-    if answer_values is None or answer_values != answer_values:
-        return answer_values
-    answer_value = answer_values.split("|")
-    answer_label = []
-    for value in answer_value:
-        options = QuestionOptions.objects.filter(
-            question_id=question_id, value=value
-        ).first()
-        if options:
-            answer_label.append(options.label)
-    return "|".join(answer_label)
-
-
-def generate_data_sheet(
-    writer: pd.ExcelWriter,
-    form: Forms,
-    administration_ids=None,
-    download_type: str = "all",
-    use_label: bool = False,
-) -> None:
-    questions = get_question_names(form=form)
-    data = download_data(
-        form=form,
-        administration_ids=administration_ids,
-        download_type=download_type,
     )
-    if len(data):
-        df = pd.DataFrame(data)
-        new_columns = {}
-        for question in questions:
-            question_id, question_name, question_type = question
-            if question_name not in df:
-                df[question_name] = None
-            if use_label:
-                if question_type in [
-                    QuestionTypes.option,
-                    QuestionTypes.multiple_option,
-                ]:
-                    new_columns[question_name] = df[question_name].apply(
-                        lambda x: get_answer_label(x, question_id)
-                    )
-        question_names = [question[1] for question in questions]
-        if use_label:
-            new_df = pd.DataFrame(new_columns)
-            df.drop(columns=list(new_df), inplace=True)
-            df = pd.concat([df, new_df], axis=1)
-        # Reorder columns
-        df = df[meta_columns + question_names]
-        df.to_excel(writer, sheet_name="data", index=False)
-        generate_definition_sheet(form=form, writer=writer)
-    else:
-        blank_data_template(form=form, writer=writer)
 
 
-def job_generate_data_download(job_id, **kwargs):
-    job = Jobs.objects.get(pk=job_id)
-    file_path = "./tmp/{0}".format(job.result)
-    if os.path.exists(file_path):
-        os.remove(file_path)
-    administration_ids = False
+def get_download_context(job: Jobs, form: Forms, administration=None):
     administration_name = "All Administration Level"
-    if kwargs.get("administration"):
-        administration = Administration.objects.get(
-            pk=kwargs.get("administration")
-        )
-        if administration.path:
-            filter_path = "{0}{1}.".format(
-                administration.path, administration.id
-            )
-        else:
-            filter_path = f"{administration.id}."
-        administration_ids = list(
-            Administration.objects.filter(
-                path__startswith=filter_path
-            ).values_list("id", flat=True)
-        )
-        administration_ids.append(administration.id)
-
-        administration_name = list(
-            Administration.objects.filter(
-                path__startswith=filter_path
+    if administration:
+        administration_name = ",".join(
+            administration.descendants.exclude(
+                pk=administration.id
             ).values_list("name", flat=True)
         )
-    form = Forms.objects.get(pk=job.info.get("form_id"))
-    download_type = kwargs.get("download_type")
-    writer = pd.ExcelWriter(file_path, engine="xlsxwriter")
+    return [
+        {"context": "Form Name", "value": form.name},
+        {
+            "context": "Download Date",
+            "value": update_date_time_format(job.created),
+        },
+        {"context": "Administration", "value": administration_name},
+    ]
 
-    generate_data_sheet(
-        writer=writer,
+
+def get_download_shards(form: Forms, administration=None, download_type=None):
+    """
+    Child administrations to render in parallel, empty when the export
+    is small enough for a single task
+    """
+    if administration:
+        children = administration.parent_administration.all()
+        administration_ids = administration.descendants.values("id")
+    else:
+        children = Administration.objects.filter(
+            parent__parent__isnull=True, parent__isnull=False
+        )
+        administration_ids = None
+    children = list(children.order_by("id").values_list("id", flat=True))
+    if len(children) < 2:
+        return []
+    total = get_export_queryset(
         form=form,
         administration_ids=administration_ids,
         download_type=download_type,
+    ).count()
+    if total < DATA_EXPORT_SHARD_ROWS:
+        return []
+    return children
+
+
+def get_unsharded_ids(administration=None):
+    # datapoints above the shard level, rendered by the merge step
+    if administration:
+        return [administration.id]
+    return Administration.objects.filter(parent__isnull=True).values("id")
+
+
+def write_job_download(job: Jobs, form: Forms, administration, batches):
+    file_path = "./tmp/{0}".format(job.result)
+    if os.path.exists(file_path):
+        os.remove(file_path)
+    write_data_export(
+        file_path=file_path,
+        form=form,
+        file_format=job.info.get("format") or DataDownloadFormats.xlsx,
         use_label=job.info.get("use_label"),
+        context=get_download_context(job, form, administration),
+        batches=batches,
     )
+    return upload(file=file_path, folder="download")
 
-    context = [
-        {"context": "Form Name", "value": form.name},
-        {
-            "context": "Download Date",
-            "value": update_date_time_format(job.created),
-        },
-        {
-            "context": "Administration",
-            "value": ",".join(administration_name)
-            if isinstance(administration_name, list)
-            else administration_name,
+
+def get_job_download_args(job: Jobs):
+    form = Forms.objects.get(pk=job.info.get("form_id"))
+    administration = None
+    if job.info.get("administration"):
+        administration = Administration.objects.get(
+            pk=job.info.get("administration")
+        )
+    download_type = job.info.get("download_type") or DataDownloadTypes.all
+    return form, administration, download_type
+
+
+def set_job_cache_info(job: Jobs, rendered: int, total: int):
+    job.info = {
+        **job.info,
+        "cache": {
+            "hit": rendered < total,
+            "rendered": rendered,
+            "reused": total - rendered,
         },
-    ]
+    }
 
-    context = (
-        pd.DataFrame(context).groupby(["context", "value"], sort=False).first()
-    )
-    context.to_excel(writer, sheet_name="context", startrow=0, header=False)
-    workbook = writer.book
-    worksheet = writer.sheets["context"]
-    f = workbook.add_format(
-        {
-            "align": "left",
-            "bold": False,
-            "border": 0,
+
+def job_generate_data_download(job_id, **kwargs):
+    job = Jobs.objects.get(pk=job_id)
+    form, administration, download_type = get_job_download_args(job)
+    shards = get_download_shards(form, administration, download_type)
+    if shards:
+        # the shard tasks render the subtrees, the last finished one
+        # starts the merge which uploads the file
+        job.info = {
+            **job.info,
+            "shards": {
+                str(shard): {"status": JobStatus.FieldStr[JobStatus.pending]}
+                for shard in shards
+            },
         }
+        job.save()
+        for shard in shards:
+            async_task(
+                "api.v1.v1_jobs.job.job_generate_data_shard",
+                job.id,
+                shard,
+                hook="api.v1.v1_jobs.job.job_generate_data_shard_result",
+            )
+        return None
+    export_cache, rendered = refresh_export_cache(
+        form=form, administration=administration, download_type=download_type
     )
-    worksheet.set_column("A:A", 20, f)
-    worksheet.set_column("B:B", 30, f)
-    merge_format = workbook.add_format(
-        {
-            "bold": True,
-            "border": 1,
-            "align": "center",
-            "valign": "vcenter",
-            "fg_color": "#45add9",
-            "color": "#ffffff",
-        }
+    set_job_cache_info(job, rendered, export_cache.rows.count())
+    job.save()
+    return write_job_download(
+        job, form, administration, iter_cached_batches(export_cache)
     )
-    worksheet.merge_range("A1:B1", "Context", merge_format)
-    writer.save()
-    url = upload(file=file_path, folder="download")
-    return url
 
 
 def job_generate_data_download_result(task):
     job = Jobs.objects.get(task_id=task.id)
+    if task.success and job.info.get("shards"):
+        # done once the merge task finished, the shard hooks may be
+        # updating the info meanwhile
+        Jobs.objects.filter(pk=job.pk).update(attempt=F("attempt") + 1)
+        return
     job.attempt = job.attempt + 1
     if task.success:
         job.status = JobStatus.done
@@ -206,6 +197,83 @@ def job_generate_data_download_result(task):
     job.save()
 
 
+def job_generate_data_shard(job_id, administration_id):
+    job = Jobs.objects.get(pk=job_id)
+    form, _, download_type = get_job_download_args(job)
+    export_cache, rendered = refresh_export_cache(
+        form=form,
+        administration=Administration.objects.get(pk=administration_id),
+        download_type=download_type,
+    )
+    return {"rendered": rendered, "total": export_cache.rows.count()}
+
+
+def job_generate_data_shard_result(task):
+    job_id, administration_id = task.args[:2]
+    with transaction.atomic():
+        job = Jobs.objects.select_for_update().get(pk=job_id)
+        shard = {"status": JobStatus.FieldStr[JobStatus.failed]}
+        if task.success:
+            shard = {
+                "status": JobStatus.FieldStr[JobStatus.done],
+                **task.result,
+            }
+        job.info["shards"][str(administration_id)] = shard
+        statuses = [s["status"] for s in job.info["shards"].values()]
+        if JobStatus.FieldStr[JobStatus.failed] in statuses:
+            job.status = JobStatus.failed
+        elif all(
+            status == JobStatus.FieldStr[JobStatus.done]
+            for status in statuses
+        ):
+            async_task(
+                "api.v1.v1_jobs.job.job_merge_data_download",
+                job.id,
+                hook="api.v1.v1_jobs.job.job_merge_data_download_result",
+            )
+        job.save()
+
+
+def job_merge_data_download(job_id):
+    job = Jobs.objects.get(pk=job_id)
+    form, administration, download_type = get_job_download_args(job)
+    shards = job.info.get("shards")
+    sources = [
+        iter_cached_batches(export_cache)
+        for export_cache in DataExportCache.objects.filter(
+            form=form,
+            administration_id__in=[int(shard) for shard in shards],
+            download_type=download_type,
+        )
+    ]
+    sources.append(
+        iter_export_batches(
+            form=form,
+            administration_ids=get_unsharded_ids(administration),
+            download_type=download_type,
+        )
+    )
+    set_job_cache_info(
+        job,
+        sum(shard["rendered"] for shard in shards.values()),
+        sum(shard["total"] for shard in shards.values()),
+    )
+    job.save()
+    return write_job_download(
+        job, form, administration, iter_merged_batches(sources)
+    )
+
+
+def job_merge_data_download_result(task):
+    job = Jobs.objects.get(pk=task.args[0])
+    if task.success:
+        job.status = JobStatus.done
+        job.available = timezone.now()
+    else:
+        job.status = JobStatus.failed
+    job.save()
+
+
 def seed_data_job(job_id):
     try:
         job = Jobs.objects.get(pk=job_id)
@@ -385,7 +453,7 @@ def handle_administrations_bulk_upload(filename, user_id, upload_time):
         )
         return
     seed_administration_data(file_path)
-    generate_sqlite(Administration)
+    generate_sqlite(Administration, reset=True)
     send_email(context=email_context, type=EmailTypes.administration_upload)
 
 
@@ -452,4 +520,4 @@ def handle_entities_bulk_upload(filename, user_id, upload_time):
     if len(errors):
         handle_entities_error_upload(errors, email_context, user, upload_time)
         return
-    generate_sqlite(EntityData)
+    generate_sqlite(EntityData, reset=True)
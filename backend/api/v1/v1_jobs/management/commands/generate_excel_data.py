@@ -1,9 +1,8 @@
 import os
-import pandas as pd
 from django.core.management.base import BaseCommand
 
 from api.v1.v1_forms.models import Forms
-from api.v1.v1_jobs.job import generate_data_sheet
+from api.v1.v1_jobs.export_data import write_data_workbook
 from utils.storage import upload
 
 CRONJOB_RESULT_DIR = "cronjob_results"
@@ -32,15 +31,13 @@ class Command(BaseCommand):
         form = Forms.objects.get(pk=form_id)
         form_name = form.name.replace(" ", "_").lower()
         process_file = f"process-{form_name}.xlsx"
-        writer = pd.ExcelWriter(process_file, engine="xlsxwriter")
-        generate_data_sheet(
-            writer=writer,
+        write_data_workbook(
+            file_path=process_file,
             form=form,
             administration_ids=None,
             download_type=download_type,
             use_label=use_label,
         )
-        writer.save()
 
         out_file = "-".join(
             list(
@@ -5,7 +5,11 @@ from django.utils import timezone
 from django_q.tasks import async_task
 
 from api.v1.v1_forms.models import Forms
-from api.v1.v1_jobs.constants import JobTypes, JobStatus
+from api.v1.v1_jobs.constants import (
+    JobTypes,
+    JobStatus,
+    DataDownloadFormats,
+)
 from api.v1.v1_jobs.models import Jobs
 
 
@@ -22,6 +26,13 @@ class Command(BaseCommand):
         parser.add_argument(
             "-l", "--use_label", nargs="?", default=0, type=int
         )
+        parser.add_argument(
+            "-f",
+            "--format",
+            nargs="?",
+            default=DataDownloadFormats.xlsx,
+            type=str,
+        )
 
     def handle(self, *args, **options):
         administration = options.get("administration")
@@ -30,17 +41,22 @@ class Command(BaseCommand):
         download_type = "all"
         if arg_type:
             download_type = arg_type
+        file_format = options.get("format") or DataDownloadFormats.xlsx
         info = {
             "form_id": options.get("form")[0],
             "administration": administration if administration > 0 else None,
             "download_type": download_type,
             "use_label": True if use_label else False,
+            "format": file_format,
         }
         form = Forms.objects.get(pk=options.get("form")[0])
         form_name = form.name.replace(" ", "_").lower()
         today = timezone.datetime.today().strftime("%y%m%d")
-        out_file = "download-{0}-{1}-{2}.xlsx".format(
-            form_name, today, uuid.uuid4()
+        out_file = "download-{0}-{1}-{2}.{3}".format(
+            form_name,
+            today,
+            uuid.uuid4(),
+            DataDownloadFormats.Extension[file_format],
         )
         job = Jobs.objects.create(
             type=JobTypes.download,
@@ -5,6 +5,7 @@ from django.core.management import BaseCommand
 from django.db.models import Max, F
 
 from api.v1.v1_forms.constants import QuestionTypes
+from api.v1.v1_data.functions import touch_form_data
 from api.v1.v1_data.models import (
     Answers,
     AnswerHistory,
@@ -112,6 +113,7 @@ class Command(BaseCommand):
                 update_column=update_column,
             )
             if datapoint_ids:
+                touch_form_data(datapoint_ids)
                 # handle form data
                 update_json_file(
                     datapoint_ids=datapoint_ids,
@@ -0,0 +1,46 @@
+# Generated by Django 4.0.4 on 2026-10-18 10:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('v1_profile', '0004_administrationclosure'),
+        ('v1_data', '0004_datasnapshot'),
+        ('v1_forms', '0003_remove_formapprovalassignment_administration_and_more'),
+        ('v1_jobs', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataExportCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('download_type', models.CharField(max_length=10)),
+                ('signature', models.CharField(default=None, max_length=64, null=True)),
+                ('watermark', models.DateTimeField(default=None, null=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('administration', models.ForeignKey(default=None, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='administration_export_cache', to='v1_profile.administration')),
+                ('form', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='form_export_cache', to='v1_forms.forms')),
+            ],
+            options={
+                'db_table': 'data_export_cache',
+                'unique_together': {('form', 'administration', 'download_type')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DataExportRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('values', models.JSONField()),
+                ('cache', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rows', to='v1_jobs.dataexportcache')),
+                ('data', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_rows', to='v1_data.formdata')),
+            ],
+            options={
+                'db_table': 'data_export_row',
+                'unique_together': {('cache', 'data')},
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.0.4 on 2026-10-18 11:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('v1_jobs', '0003_data_export_cache'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='dataexportcache',
+            name='watermark',
+        ),
+        migrations.AddField(
+            model_name='dataexportcache',
+            name='horizon',
+            field=models.BigIntegerField(default=None, null=True),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.0.4 on 2026-10-18 17:10
+
+from django.db import migrations, models
+
+
+def delete_duplicate_national_caches(apps, schema_editor):
+    DataExportCache = apps.get_model("v1_jobs", "DataExportCache")
+    kept = set()
+    for pk, form_id, download_type in (
+        DataExportCache.objects.filter(administration__isnull=True)
+        .order_by("id")
+        .values_list("id", "form_id", "download_type")
+    ):
+        if (form_id, download_type) in kept:
+            DataExportCache.objects.filter(pk=pk).delete()
+        kept.add((form_id, download_type))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('v1_jobs', '0004_export_cache_horizon'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='dataexportcache',
+            unique_together=set(),
+        ),
+        migrations.RunPython(
+            delete_duplicate_national_caches, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='dataexportcache',
+            constraint=models.UniqueConstraint(condition=models.Q(('administration__isnull', False)), fields=('form', 'administration', 'download_type'), name='data_export_cache_administration'),
+        ),
+        migrations.AddConstraint(
+            model_name='dataexportcache',
+            constraint=models.UniqueConstraint(condition=models.Q(('administration__isnull', True)), fields=('form', 'download_type'), name='data_export_cache_national'),
+        ),
+    ]
@@ -1,7 +1,10 @@
 from django.db import models
 
 # Create your models here.
+from api.v1.v1_data.models import FormData
+from api.v1.v1_forms.models import Forms
 from api.v1.v1_jobs.constants import JobTypes, JobStatus
+from api.v1.v1_profile.models import Administration
 from api.v1.v1_users.models import SystemUser
 
 
@@ -27,3 +30,60 @@ class Jobs(models.Model):
 
     class Meta:
         db_table = "jobs"
+
+
+class DataExportCache(models.Model):
+    form = models.ForeignKey(
+        to=Forms, on_delete=models.CASCADE, related_name="form_export_cache"
+    )
+    administration = models.ForeignKey(
+        to=Administration,
+        on_delete=models.CASCADE,
+        related_name="administration_export_cache",
+        null=True,
+        default=None,
+    )
+    download_type = models.CharField(max_length=10)
+    # questions and administration names the rows were rendered with
+    signature = models.CharField(max_length=64, default=None, null=True)
+    # oldest transaction in progress at the last refresh, rows written
+    # from there on are rendered again
+    horizon = models.BigIntegerField(default=None, null=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.form.name} - {self.download_type}"
+
+    class Meta:
+        db_table = "data_export_cache"
+        # NULLs are distinct in a unique index, the national export of a
+        # form gets a constraint of its own
+        constraints = [
+            models.UniqueConstraint(
+                fields=["form", "administration", "download_type"],
+                condition=models.Q(administration__isnull=False),
+                name="data_export_cache_administration",
+            ),
+            models.UniqueConstraint(
+                fields=["form", "download_type"],
+                condition=models.Q(administration__isnull=True),
+                name="data_export_cache_national",
+            ),
+        ]
+
+
+class DataExportRow(models.Model):
+    cache = models.ForeignKey(
+        to=DataExportCache, on_delete=models.CASCADE, related_name="rows"
+    )
+    data = models.ForeignKey(
+        to=FormData, on_delete=models.CASCADE, related_name="export_rows"
+    )
+    values = models.JSONField()
+
+    def __str__(self):
+        return f"{self.cache_id} - {self.data_id}"
+
+    class Meta:
+        unique_together = ("cache", "data")
+        db_table = "data_export_row"
@@ -10,6 +10,8 @@ from api.v1.v1_data.models import (
     FormData,
     AnswerHistory,
 )
+from api.v1.v1_data.pivot import refresh_answer_pivot
+from api.v1.v1_data.rollup import refresh_data_rollup
 from api.v1.v1_forms.models import Forms
 from api.v1.v1_forms.constants import QuestionTypes
 from api.v1.v1_forms.models import Questions
@@ -24,6 +26,7 @@ from api.v1.v1_profile.models import (
 from api.v1.v1_users.models import SystemUser
 from api.v1.v1_approval.models import DataBatch
 from utils.email_helper import send_email, EmailTypes
+from utils.geohash import get_geohash
 from uuid import uuid4
 
 
@@ -210,16 +213,7 @@ def collect_answers(user: SystemUser, dp: dict, qs: dict, data_id):
 
 
 def get_decendants(administration: Administration):
-    path = f"{administration.id}."
-    if administration.path:
-        path = "{0}{1}.".format(administration.path, administration.id)
-    descendants = list(
-        Administration.objects.filter(path__startswith=path).values_list(
-            "id", flat=True
-        )
-    )
-    descendants.append(administration.id)
-    return descendants
+    return administration.descendants.values_list("id", flat=True)
 
 
 def save_data(
@@ -253,7 +247,9 @@ def save_data(
         ).first()
         user_adm = user_role.administration if user_role else user_adm
     user_decendants = get_decendants(administration=user_adm)
-    if administration not in user_decendants:
+    if not isinstance(administration, int) or not user_decendants.filter(
+        pk=administration
+    ).exists():
         return None
     if is_super_admin:
         try:
@@ -263,6 +259,7 @@ def save_data(
                 form_id=form_id,
                 administration_id=administration,
                 geo=geo,
+                geohash=get_geohash(geo),
                 updated_by=user,
                 updated=timezone.now(),
                 uuid=temp.get("uuid"),
@@ -367,6 +364,8 @@ def seed_excel_data(job: Jobs, test: bool = False):
             records.append(data)
         if answer_count == 0 and data:
             data.delete()
+    refresh_data_rollup(records)
+    refresh_answer_pivot(records)
     if len(records) == 0:
         form = Forms.objects.filter(pk=int(form_id)).first()
         if not test:
@@ -4,7 +4,12 @@ from rest_framework import serializers
 from drf_spectacular.utils import extend_schema_field
 from drf_spectacular.types import OpenApiTypes
 from api.v1.v1_forms.models import Forms
-from api.v1.v1_jobs.constants import JobTypes, JobStatus, DataDownloadTypes
+from api.v1.v1_jobs.constants import (
+    JobTypes,
+    JobStatus,
+    DataDownloadTypes,
+    DataDownloadFormats,
+)
 from api.v1.v1_jobs.models import Jobs
 from api.v1.v1_profile.models import Administration, AdministrationAttribute
 from utils.custom_serializer_fields import (
@@ -25,6 +30,14 @@ class DownloadDataRequestSerializer(serializers.Serializer):
         ]
     )
     use_label = serializers.BooleanField(required=False)
+    file_format = serializers.ChoiceField(
+        choices=[
+            DataDownloadFormats.FieldStr[d]
+            for d in DataDownloadFormats.FieldStr
+        ],
+        required=False,
+        default=DataDownloadFormats.xlsx,
+    )
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
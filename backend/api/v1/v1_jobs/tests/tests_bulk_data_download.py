@@ -5,8 +5,9 @@ from django.test import TestCase
 from django.test.utils import override_settings
 from api.v1.v1_forms.models import Questions, Forms
 from api.v1.v1_data.models import FormData
-from api.v1.v1_jobs.job import download_data, generate_definition_sheet
+from api.v1.v1_jobs.job import download_data
 from api.v1.v1_profile.management.commands import administration_seeder
+from utils.export_form import generate_definition_sheet
 
 
 @override_settings(USE_TZ=False)
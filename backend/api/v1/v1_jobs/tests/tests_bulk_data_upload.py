@@ -1,5 +1,6 @@
 from django.core.management import call_command
 from django.test import TestCase, override_settings
+from django.db import connection
 from django.db.models import Count
 from api.v1.v1_jobs.functions import ValidationText
 from api.v1.v1_jobs.validate_upload import validate
@@ -7,6 +8,7 @@ from api.v1.v1_jobs.models import Jobs, JobTypes, JobStatus
 from api.v1.v1_jobs.seed_data import seed_excel_data
 from api.v1.v1_forms.models import Forms
 from api.v1.v1_data.models import FormData
+from api.v1.v1_data.pivot import get_pivot_table
 from api.v1.v1_users.models import SystemUser
 from api.v1.v1_profile.models import Administration
 from api.v1.v1_profile.tests.mixins import ProfileTestHelperMixin
@@ -136,6 +138,7 @@ class BulkUploadDataTestCase(TestCase, ProfileTestHelperMixin):
         )
         data.save()
         add_fake_answers(data)
+        call_command("build_answer_pivot", form.id, "--test")
 
         upload_file = "{0}/test-success-update-registration.xlsx".format(
             self.test_folder
@@ -167,6 +170,22 @@ class BulkUploadDataTestCase(TestCase, ProfileTestHelperMixin):
             history_count__gt=0
         ).first()
         self.assertTrue(updated_dp)
+        # the pivot table of the form has the uploaded answers
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT data_id, updated FROM {get_pivot_table(form.id)}"
+            )
+            rows = dict(cursor.fetchall())
+        self.assertEqual(
+            set(rows),
+            set(
+                FormData.objects.filter(
+                    form=form, is_pending=False
+                ).values_list("id", flat=True)
+            ),
+        )
+        updated_dp.refresh_from_db()
+        self.assertEqual(rows[updated_dp.id], updated_dp.updated)
 
     def test_upload_new_monitoring_data(self):
         form = Forms.objects.get(pk=1)
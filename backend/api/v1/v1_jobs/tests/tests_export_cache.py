@@ -0,0 +1,184 @@
+from django.core.management import call_command
+from datetime import timedelta
+from unittest import mock
+from django.db import IntegrityError, connection, transaction
+from django.test import TransactionTestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+from api.v1.v1_data.models import Answers, FormData
+from api.v1.v1_forms.constants import QuestionTypes
+from api.v1.v1_forms.models import Forms, Questions, QuestionOptions
+from api.v1.v1_jobs.export_cache import (
+    refresh_export_cache,
+    iter_cached_batches,
+)
+from api.v1.v1_jobs.export_data import iter_export_rows
+from api.v1.v1_jobs.job import job_generate_data_download
+from api.v1.v1_jobs.models import DataExportCache, Jobs
+from api.v1.v1_profile.tests.mixins import ProfileTestHelperMixin
+
+
+def get_test_horizon():
+    # the transactions of the other test processes would hold the real
+    # horizon back, every row written so far is committed here
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT txid_current()")
+        return cursor.fetchone()[0]
+
+
+# rows are only told apart by the transaction that wrote them, so each
+# write has to be committed on its own
+@override_settings(USE_TZ=False)
+@mock.patch(
+    "api.v1.v1_jobs.export_cache.get_sync_horizon", get_test_horizon
+)
+class ExportCacheTestCase(TransactionTestCase, ProfileTestHelperMixin):
+    def setUp(self):
+        call_command("administration_seeder", "--test")
+        call_command("form_seeder", "--test")
+        self.user = self.create_user("test@akvo.org", self.IS_SUPER_ADMIN)
+        call_command("fake_data_seeder", "-r", 2, "-t", True)
+        self.form = Forms.objects.get(pk=1)
+        data = self.form.form_form_data.first()
+        # a few more datapoints to tell rendered and reused rows apart
+        for i in range(2):
+            FormData.objects.create(
+                name=f"{data.name} {i}",
+                form=self.form,
+                administration=data.administration,
+                geo=data.geo,
+                created_by=data.created_by,
+            )
+        self.total = self.form.form_form_data.count()
+
+    def get_cached_rows(self, export_cache):
+        return [
+            row
+            for batch in iter_cached_batches(export_cache, batch_size=1)
+            for row in batch
+        ]
+
+    def test_only_changed_rows_are_rendered(self):
+        export_cache, rendered = refresh_export_cache(form=self.form)
+        self.assertEqual(rendered, self.total)
+        self.assertEqual(
+            self.get_cached_rows(export_cache),
+            list(iter_export_rows(form=self.form)),
+        )
+
+        export_cache, rendered = refresh_export_cache(form=self.form)
+        self.assertEqual(rendered, 0)
+        self.assertEqual(export_cache.rows.count(), self.total)
+
+        data = self.form.form_form_data.order_by("id").first()
+        data.name = "Updated datapoint"
+        data.updated = timezone.now()
+        data.save()
+        removed = self.form.form_form_data.order_by("id").last()
+        removed.delete()
+        export_cache, rendered = refresh_export_cache(form=self.form)
+        self.assertEqual(rendered, 1)
+        rows = self.get_cached_rows(export_cache)
+        self.assertEqual(rows, list(iter_export_rows(form=self.form)))
+        self.assertEqual(rows[0]["datapoint_name"], "Updated datapoint")
+
+    def test_late_commit_is_rendered(self):
+        refresh_export_cache(form=self.form)
+        # stamped before the refresh, committed after it
+        data = self.form.form_form_data.order_by("id").first()
+        data.name = "Late datapoint"
+        data.updated = timezone.now() - timedelta(hours=1)
+        data.save()
+        export_cache, rendered = refresh_export_cache(form=self.form)
+        self.assertEqual(rendered, 1)
+        self.assertEqual(
+            self.get_cached_rows(export_cache)[0]["datapoint_name"],
+            "Late datapoint",
+        )
+
+    def test_question_change_renders_all_rows(self):
+        refresh_export_cache(form=self.form)
+        question = Questions.objects.filter(form=self.form).first()
+        question.name = f"{question.name}_renamed"
+        question.save()
+        export_cache, rendered = refresh_export_cache(form=self.form)
+        self.assertEqual(rendered, self.total)
+        self.assertIn(
+            question.name, self.get_cached_rows(export_cache)[0].keys()
+        )
+
+    def test_one_national_cache_per_download_type(self):
+        export_cache, _ = refresh_export_cache(form=self.form)
+        self.assertIsNone(export_cache.administration)
+        # what a concurrent first download would insert
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            DataExportCache.objects.create(
+                form=self.form, download_type=export_cache.download_type
+            )
+        refresh_export_cache(form=self.form)
+        self.assertEqual(
+            DataExportCache.objects.filter(
+                form=self.form, administration__isnull=True
+            ).count(),
+            1,
+        )
+
+    def test_job_records_cache_hit(self):
+        results = []
+        for _ in range(2):
+            job_id = call_command(
+                "job_download", self.form.id, self.user.id, "-t", "all"
+            )
+            job = Jobs.objects.get(pk=job_id)
+            job_generate_data_download(job_id=job.id, **job.info)
+            job.refresh_from_db()
+            results.append(job.info.get("cache"))
+        self.assertEqual(
+            results,
+            [
+                {"hit": False, "rendered": self.total, "reused": 0},
+                {"hit": True, "rendered": 0, "reused": self.total},
+            ],
+        )
+
+
+@override_settings(USE_TZ=False)
+class ExportCacheHorizonTestCase(TransactionTestCase, ProfileTestHelperMixin):
+    """
+    Driven by the real horizon, the transactions of other test
+    processes only make a refresh render more rows than needed
+    """
+
+    def setUp(self):
+        call_command("administration_seeder", "--test")
+        call_command("form_seeder", "--test")
+        self.create_user("test@akvo.org", self.IS_SUPER_ADMIN)
+        call_command("fake_data_seeder", "-r", 2, "-t", True)
+        self.form = Forms.objects.get(pk=1)
+
+    def test_remapped_answers_are_rendered(self):
+        answer = Answers.objects.filter(
+            data__form=self.form,
+            question__type=QuestionTypes.option,
+            options__isnull=False,
+        ).first()
+        option = QuestionOptions.objects.get(
+            question=answer.question, value=answer.options[0]
+        )
+        self.assertNotEqual(option.label, option.value)
+        # answers stored with the option labels, as remapped below
+        Answers.objects.filter(pk=answer.pk).update(options=[option.label])
+        refresh_export_cache(form=self.form)
+        call_command("remap_option_answers")
+        answer.refresh_from_db()
+        self.assertEqual(answer.options, [option.value])
+        export_cache, rendered = refresh_export_cache(form=self.form)
+        self.assertGreaterEqual(rendered, 1)
+        self.assertEqual(
+            [
+                row
+                for batch in iter_cached_batches(export_cache)
+                for row in batch
+            ],
+            list(iter_export_rows(form=self.form)),
+        )
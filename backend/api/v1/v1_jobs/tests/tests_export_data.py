@@ -0,0 +1,171 @@
+import os
+import pandas as pd
+from django.core.management import call_command
+from django.test import TestCase
+from django.test.utils import override_settings
+from api.v1.v1_data.models import FormData, Answers
+from api.v1.v1_forms.models import Forms
+from api.v1.v1_forms.constants import QuestionTypes
+from api.v1.v1_jobs.export_data import (
+    iter_export_rows,
+    write_data_workbook,
+    write_data_csv,
+    write_data_parquet,
+    get_option_labels,
+    translate_option_labels,
+)
+from api.v1.v1_profile.tests.mixins import ProfileTestHelperMixin
+from utils.export_form import get_question_names, meta_columns
+
+
+@override_settings(USE_TZ=False)
+class ExportDataTestCase(TestCase, ProfileTestHelperMixin):
+    def setUp(self):
+        call_command("administration_seeder", "--test")
+        call_command("form_seeder", "--test")
+        self.create_user("test@akvo.org", self.IS_SUPER_ADMIN)
+        call_command("fake_data_seeder", "-r", 2, "-t", True)
+        self.form = Forms.objects.get(pk=1)
+        self.file_path = "./tmp/test-export-data.xlsx"
+
+    def tearDown(self):
+        if os.path.exists(self.file_path):
+            os.remove(self.file_path)
+
+    def test_rows_match_data_frame(self):
+        rows = list(iter_export_rows(form=self.form, batch_size=1))
+        data = self.form.form_form_data.order_by("id").all()
+        self.assertEqual(len(rows), data.count())
+        for row, form_data in zip(rows, data):
+            expected = form_data.to_data_frame
+            expected.pop("uuid")
+            self.assertEqual(row, expected)
+
+    def test_queries_do_not_grow_with_rows(self):
+        form = self.form
+        data = form.form_form_data.first()
+        answers = list(data.data_answer.all())
+        for i in range(3):
+            copy = FormData.objects.create(
+                name=f"{data.name} {i}",
+                form=form,
+                administration=data.administration,
+                geo=data.geo,
+                created_by=data.created_by,
+            )
+            for answer in answers:
+                answer.pk = None
+                answer.data = copy
+            Answers.objects.bulk_create(answers)
+        total = form.form_form_data.count()
+        questions = get_question_names(form=form)
+        # warm up the administration tree
+        list(iter_export_rows(form=form, questions=questions))
+        # one data and one answer query per batch, plus the empty batch
+        with self.assertNumQueries(3):
+            rows = list(iter_export_rows(form=form, questions=questions))
+        self.assertEqual(len(rows), total)
+        with self.assertNumQueries(total * 2 + 1):
+            list(
+                iter_export_rows(
+                    form=form, questions=questions, batch_size=1
+                )
+            )
+
+    def test_write_data_workbook(self):
+        context = [{"context": "Form Name", "value": self.form.name}]
+        total = write_data_workbook(
+            file_path=self.file_path, form=self.form, context=context
+        )
+        self.assertEqual(total, self.form.form_form_data.count())
+        xlsx = pd.ExcelFile(self.file_path)
+        self.assertEqual(
+            xlsx.sheet_names, ["data", "questions", "options", "context"]
+        )
+        df = pd.read_excel(xlsx, sheet_name="data")
+        questions = get_question_names(form=self.form)
+        self.assertEqual(
+            list(df.columns), meta_columns + [q[1] for q in questions]
+        )
+        self.assertEqual(
+            list(df["id"]),
+            list(
+                FormData.objects.filter(form=self.form)
+                .order_by("id")
+                .values_list("id", flat=True)
+            ),
+        )
+        df = pd.read_excel(xlsx, sheet_name="context", header=None)
+        self.assertEqual(list(df.iloc[1]), ["Form Name", self.form.name])
+
+    def test_write_blank_workbook(self):
+        FormData.objects.filter(form=self.form).delete()
+        total = write_data_workbook(file_path=self.file_path, form=self.form)
+        self.assertEqual(total, 0)
+        df = pd.read_excel(self.file_path, sheet_name="data")
+        self.assertEqual(df.shape[0], 0)
+        self.assertIn("datapoint_name", list(df.columns))
+
+    def test_translate_option_labels(self):
+        labels = {"a": "Label A", "b": "Label B"}
+        values = pd.Series(["a", "a|b", "b|x", "x", None, ""])
+        self.assertEqual(
+            list(translate_option_labels(values, labels)),
+            ["Label A", "Label A|Label B", "Label B", "", None, ""],
+        )
+        empty = pd.Series([None, None])
+        self.assertEqual(
+            list(translate_option_labels(empty, labels)), [None, None]
+        )
+
+    def test_write_data_workbook_with_labels(self):
+        questions = [
+            q
+            for q in get_question_names(form=self.form)
+            if q[2] in [QuestionTypes.option, QuestionTypes.multiple_option]
+        ]
+        self.assertTrue(questions)
+        labels = get_option_labels([q[0] for q in questions])
+        rows = list(iter_export_rows(form=self.form))
+        # one query for the labels of every option question
+        with self.assertNumQueries(1):
+            get_option_labels([q[0] for q in questions])
+        write_data_workbook(
+            file_path=self.file_path, form=self.form, use_label=True
+        )
+        df = pd.read_excel(self.file_path, sheet_name="data")
+        df = df.astype(object).where(df.notna(), None)
+        for i, row in enumerate(rows):
+            for qid, name, qtype in questions:
+                if not row.get(name):
+                    continue
+                expected = [
+                    labels[qid][v]
+                    for v in row[name].split("|")
+                    if v in labels[qid]
+                ]
+                self.assertEqual(df[name][i], "|".join(expected))
+
+    def test_write_data_csv(self):
+        file_path = "./tmp/test-export-data.csv.gz"
+        total = write_data_csv(file_path=file_path, form=self.form)
+        df = pd.read_csv(file_path, compression="gzip")
+        os.remove(file_path)
+        self.assertEqual(total, df.shape[0])
+        self.assertEqual(total, self.form.form_form_data.count())
+        questions = get_question_names(form=self.form)
+        self.assertEqual(
+            list(df.columns), meta_columns + [q[1] for q in questions]
+        )
+
+    def test_write_data_parquet(self):
+        file_path = "./tmp/test-export-data.parquet"
+        total = write_data_parquet(file_path=file_path, form=self.form)
+        df = pd.read_parquet(file_path)
+        os.remove(file_path)
+        self.assertEqual(total, df.shape[0])
+        for qid, name, qtype in get_question_names(form=self.form):
+            if qtype == QuestionTypes.number:
+                self.assertEqual(df[name].dtype.kind, "f")
+            if qtype == QuestionTypes.date:
+                self.assertEqual(df[name].dtype.kind, "M")
@@ -0,0 +1,115 @@
+import os
+from types import SimpleNamespace
+from unittest import mock
+import pandas as pd
+from django.core.management import call_command
+from django.test import TestCase
+from django.test.utils import override_settings
+from django_q.models import OrmQ
+from api.v1.v1_forms.models import Forms
+from api.v1.v1_jobs.constants import JobStatus
+from api.v1.v1_jobs.job import (
+    job_generate_data_download,
+    job_generate_data_download_result,
+    job_generate_data_shard,
+    job_generate_data_shard_result,
+    job_merge_data_download,
+    job_merge_data_download_result,
+)
+from api.v1.v1_jobs.models import Jobs
+from api.v1.v1_profile.models import Administration
+from api.v1.v1_profile.tests.mixins import ProfileTestHelperMixin
+
+
+@override_settings(USE_TZ=False)
+class ExportShardsTestCase(TestCase, ProfileTestHelperMixin):
+    def setUp(self):
+        call_command("administration_seeder", "--test")
+        call_command("form_seeder", "--test")
+        self.user = self.create_user("test@akvo.org", self.IS_SUPER_ADMIN)
+        call_command("fake_data_seeder", "-r", 4, "-t", True)
+        self.form = Forms.objects.get(pk=1)
+
+    def create_job(self, *args):
+        job_id = call_command(
+            "job_download", self.form.id, self.user.id, "-f", "csv", *args
+        )
+        return Jobs.objects.get(pk=job_id)
+
+    def test_small_export_is_not_sharded(self):
+        job = self.create_job()
+        url = job_generate_data_download(job_id=job.id, **job.info)
+        self.assertTrue(url.endswith(".csv.gz"))
+        job.refresh_from_db()
+        self.assertIsNone(job.info.get("shards"))
+
+    @mock.patch("api.v1.v1_jobs.job.DATA_EXPORT_SHARD_ROWS", 0)
+    def test_sharded_export(self):
+        job = self.create_job()
+        result = job_generate_data_download(job_id=job.id, **job.info)
+        self.assertIsNone(result)
+        job.refresh_from_db()
+        shards = [int(shard) for shard in job.info["shards"]]
+        self.assertEqual(
+            sorted(shards),
+            list(
+                Administration.objects.filter(
+                    parent__parent__isnull=True, parent__isnull=False
+                ).values_list("id", flat=True).order_by("id")
+            ),
+        )
+        job_generate_data_download_result(
+            SimpleNamespace(id=job.task_id, success=True, result=None)
+        )
+        job.refresh_from_db()
+        self.assertEqual(job.status, JobStatus.on_progress)
+
+        queued = OrmQ.objects.count()
+        for shard in shards:
+            result = job_generate_data_shard(job.id, shard)
+            job_generate_data_shard_result(
+                SimpleNamespace(
+                    args=(job.id, shard), success=True, result=result
+                )
+            )
+        job.refresh_from_db()
+        self.assertEqual(
+            {s["status"] for s in job.info["shards"].values()}, {"done"}
+        )
+        # the last shard starts the merge
+        self.assertEqual(OrmQ.objects.count(), queued + 1)
+
+        url = job_merge_data_download(job.id)
+        self.assertTrue(url.endswith(".csv.gz"))
+        job_merge_data_download_result(
+            SimpleNamespace(args=(job.id,), success=True)
+        )
+        job.refresh_from_db()
+        self.assertEqual(job.status, JobStatus.done)
+        total = self.form.form_form_data.count()
+        self.assertEqual(job.info["cache"]["rendered"], total)
+
+        file_path = f"./tmp/{job.result}"
+        df = pd.read_csv(file_path, compression="gzip")
+        os.remove(file_path)
+        self.assertEqual(
+            list(df["id"]),
+            list(
+                self.form.form_form_data.order_by("id").values_list(
+                    "id", flat=True
+                )
+            ),
+        )
+
+    @mock.patch("api.v1.v1_jobs.job.DATA_EXPORT_SHARD_ROWS", 0)
+    def test_failed_shard_fails_the_job(self):
+        job = self.create_job()
+        job_generate_data_download(job_id=job.id, **job.info)
+        job.refresh_from_db()
+        shard = list(job.info["shards"])[0]
+        job_generate_data_shard_result(
+            SimpleNamespace(args=(job.id, shard), success=False, result="")
+        )
+        job.refresh_from_db()
+        self.assertEqual(job.status, JobStatus.failed)
+        self.assertEqual(job.info["shards"][shard]["status"], "failed")
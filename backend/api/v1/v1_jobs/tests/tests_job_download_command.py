@@ -68,3 +68,40 @@ class JobDownloadUnitTestCase(TestCase):
 
         url = job_generate_data_download(job_id=job.id, **job.info)
         self.assertTrue("download-test_form" in url)
+
+    def test_download_csv_data(self):
+        form = Forms.objects.get(pk=1)
+        admin = SystemUser.objects.first()
+        result = call_command(
+            "job_download",
+            form.id,
+            admin.id,
+            "-t",
+            "all",
+            "-f",
+            "csv",
+        )
+        job = Jobs.objects.get(pk=result)
+        self.assertEqual(job.info.get("format"), "csv")
+        self.assertTrue(job.result.endswith(".csv.gz"))
+
+        url = job_generate_data_download(job_id=job.id, **job.info)
+        self.assertTrue(url.endswith(".csv.gz"))
+
+    def test_download_generate_invalid_format(self):
+        user = {"email": "admin@akvo.org", "password": "Test105*"}
+        token = self.client.post(
+            "/api/v1/login", user, content_type="application/json"
+        ).json().get("token")
+        response = self.client.get(
+            "/api/v1/download/generate?form_id=1&type=all&file_format=pdf",
+            HTTP_AUTHORIZATION=f"Bearer {token}",
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(
+            "/api/v1/download/generate?form_id=1&type=all"
+            "&file_format=parquet",
+            HTTP_AUTHORIZATION=f"Bearer {token}",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["file_url"].endswith(".parquet"))
@@ -30,7 +30,12 @@ from rest_framework.response import Response
 from rest_framework.fields import ChoiceField
 
 from api.v1.v1_forms.models import Forms
-from api.v1.v1_jobs.constants import JobStatus, JobTypes, DataDownloadTypes
+from api.v1.v1_jobs.constants import (
+    JobStatus,
+    JobTypes,
+    DataDownloadTypes,
+    DataDownloadFormats,
+)
 from api.v1.v1_jobs.models import Jobs
 from api.v1.v1_jobs.serializers import (
     DownloadDataRequestSerializer,
@@ -69,6 +74,13 @@ from utils.custom_serializer_fields import validate_serializers_message
             type=OpenApiTypes.BOOL,
             default=False,
         ),
+        OpenApiParameter(
+            name="file_format",
+            required=False,
+            type=OpenApiTypes.STR,
+            enum=DataDownloadFormats.FieldStr.values(),
+            default=DataDownloadFormats.xlsx,
+        ),
     ],
     responses={
         (200, "application/json"): inline_serializer(
@@ -102,6 +114,8 @@ def download_generate(request, version):
         serializer.validated_data.get("type"),
         "-l",
         1 if serializer.validated_data.get("use_label") else 0,
+        "-f",
+        serializer.validated_data.get("file_format"),
     )
     job = Jobs.objects.get(pk=result)
     data = {
@@ -157,11 +171,13 @@ def download_file(request, version, file_name):
     filepath = storage.download(url)
     filename = job.result
     zip_file = open(filepath, "rb")
-    response = HttpResponse(
-        FileWrapper(zip_file),
-        content_type="application/vnd.openxmlformats-officedocument"
-        ".spreadsheetml.sheet",
-    )
+    content_type = "application/vnd.openxmlformats-officedocument"
+    content_type += ".spreadsheetml.sheet"
+    if filename.endswith(".csv.gz"):
+        content_type = "application/gzip"
+    if filename.endswith(".parquet"):
+        content_type = "application/vnd.apache.parquet"
+    response = HttpResponse(FileWrapper(zip_file), content_type=content_type)
     response["Content-Disposition"] = 'attachment; filename="%s"' % filename
     return response
 
@@ -0,0 +1,118 @@
+import json
+import struct
+import zlib
+import msgpack
+from api.v1.v1_data.functions import prefetch_data_json
+from api.v1.v1_data.models import FormData
+from api.v1.v1_mobile.functions import (
+    SYNC_MAX_PAGE_SIZE,
+    encode_sync_cursor,
+    get_datapoint_changes,
+    get_sync_state,
+)
+from api.v1.v1_mobile.models import MobileAssignment
+from utils import storage
+
+BUNDLE_CONTENT_TYPE = "application/x-msgpack"
+
+
+def pack_record(record: dict) -> bytes:
+    """
+    msgpack record prefixed with its length as a 4 bytes big endian
+    integer
+    """
+    body = msgpack.packb(record, use_bin_type=True)
+    return struct.pack(">I", len(body)) + body
+
+
+def get_published_json(rows: list) -> dict:
+    """
+    Datapoint JSON of the rows by id, read from the published files.
+    Publishing is queued, a file older than the last write of its
+    datapoint is stale and the JSON is built from the database instead.
+    """
+    published = {}
+    missing = []
+    for row in rows:
+        if row["deleted"]:
+            continue
+        url = f"datapoints/{row['uuid']}.json"
+        last_write = row["updated"] or row["created"]
+        if (
+            row["published"]
+            and row["published"] >= last_write
+            and storage.check(url)
+        ):
+            published[row["id"]] = json.loads(storage.read(url))
+        else:
+            missing.append(row["id"])
+    if missing:
+        queryset = FormData.objects.filter(pk__in=missing)
+        for data in prefetch_data_json(queryset):
+            published[data.id] = data.to_json
+    return published
+
+
+class DatapointBundle:
+    """
+    Changed datapoints of an assignment as one gzip compressed stream of
+    length prefixed msgpack records, read page by page from the change
+    feed so that a first sync of many datapoints is a single download.
+    Only the registration datapoints are sent, the monitoring ones are
+    not published on their own.
+    """
+
+    def __init__(self, assignment: MobileAssignment, cursor: str = None):
+        self.assignment = assignment
+        state, self.reset = get_sync_state(assignment, cursor)
+        self.cursor = encode_sync_cursor(
+            state["since"], state["horizon"], state["after"], state["scope"]
+        )
+        # where the next round starts once the whole bundle is read
+        self.next_cursor = encode_sync_cursor(
+            state["horizon"], scope=state["scope"]
+        )
+        self.form_ids = set(
+            assignment.forms.filter(parent__isnull=True).values_list(
+                "id", flat=True
+            )
+        )
+
+    def records(self):
+        cursor, has_more = self.cursor, True
+        while has_more:
+            rows, cursor, has_more, _ = get_datapoint_changes(
+                self.assignment, cursor, SYNC_MAX_PAGE_SIZE
+            )
+            rows = [r for r in rows if r["form_id"] in self.form_ids]
+            published = get_published_json(rows)
+            for row in rows:
+                if row["deleted"]:
+                    yield {
+                        "id": row["id"],
+                        "uuid": str(row["uuid"]),
+                        "deleted": True,
+                    }
+                    continue
+                yield {
+                    "id": row["id"],
+                    "uuid": str(row["uuid"]),
+                    "form_id": row["form_id"],
+                    "name": row["name"],
+                    "administration_id": row["administration_id"],
+                    "last_updated": (
+                        row["updated"] or row["created"]
+                    ).isoformat(),
+                    "hash": row["hash"],
+                    "version": row["version"],
+                    "deleted": False,
+                    "data": published.get(row["id"]),
+                }
+
+    def stream(self):
+        compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+        for record in self.records():
+            chunk = compressor.compress(pack_record(record))
+            if chunk:
+                yield chunk
+        yield compressor.flush()
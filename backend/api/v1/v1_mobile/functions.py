@@ -0,0 +1,243 @@
+import hashlib
+import json
+from django.core import signing
+from django.db.models import Exists, OuterRef, Q, Subquery
+from api.v1.v1_data.functions import get_sync_horizon
+from api.v1.v1_data.models import (
+    FormData,
+    DataAdministrationMove,
+    DataSnapshot,
+)
+from api.v1.v1_mobile.models import MobileAssignment, MobileSubmission
+from api.v1.v1_profile.constants import DataAccessTypes
+from api.v1.v1_profile.models import AdministrationClosure
+
+SYNC_CURSOR_SALT = "mobile-datapoint-sync"
+SYNC_PAGE_SIZE = 100
+SYNC_MAX_PAGE_SIZE = 1000
+
+
+def get_submit_administration(assignment: MobileAssignment):
+    """
+    Administration of the submissions of an assignment without an
+    administration answer
+    """
+    administration = assignment.administrations.order_by(
+        "level__level"
+    ).first()
+    user_role = assignment.user.user_user_role.filter(
+        role__role_role_access__data_access=DataAccessTypes.submit
+    ).select_related("administration").first()
+    if user_role:
+        # If user has a role with data access, use that administration
+        administration = user_role.administration
+    return administration
+
+
+def get_submission_answers(qna: dict) -> list:
+    """
+    Answers of a mobile submission, the keys of repeated questions
+    carry the repeat index like "1-2"
+    """
+    answers = []
+    for q_key in list(qna):
+        index = 0
+        if "-" in str(q_key):
+            [base_q_id, q_index] = str(q_key).split("-")
+            index = q_index
+        else:
+            base_q_id = str(q_key)
+        answers.append(
+            {
+                "question": base_q_id,
+                "value": qna[q_key],
+                "index": index,
+            }
+        )
+    return answers
+
+
+def get_submission_key(submission: dict) -> str:
+    """
+    Idempotency key of a submission within its assignment. Clients send
+    a submissionId generated once per submission, older ones are keyed
+    on the datapoint uuid, form and submission time. The rest of the
+    payload is left out, the files of a retry are uploaded again under
+    new names. None when a submission can not be told apart from
+    another one.
+    """
+    if submission.get("submissionId"):
+        value = f"id:{submission['submissionId']}"
+    elif submission.get("uuid") and submission.get("submittedAt"):
+        # monitoring submissions share the uuid of their parent
+        value = "submission:" + json.dumps(
+            [
+                str(submission["uuid"]),
+                submission.get("formId"),
+                str(submission["submittedAt"]),
+            ],
+            default=str,
+        )
+    else:
+        return None
+    return hashlib.sha256(value.encode()).hexdigest()
+
+
+def get_stored_submissions(assignment: MobileAssignment, keys: list) -> dict:
+    """
+    Datapoint ids of the submission keys already stored for an assignment
+    """
+    if not keys:
+        return {}
+    return dict(
+        MobileSubmission.objects.filter(
+            assignment=assignment, key__in=set(keys)
+        ).values_list("key", "data_id")
+    )
+
+
+def get_sync_scope(assignment: MobileAssignment) -> str:
+    """
+    Fingerprint of the administrations and forms an assignment syncs,
+    it changes when they are edited or when the administration tree
+    below them is moved around
+    """
+    administration_ids = sorted(
+        set(
+            AdministrationClosure.objects.filter(
+                ancestor__in=assignment.administrations.all()
+            ).values_list("descendant_id", flat=True)
+        )
+    )
+    form_ids = sorted(assignment.forms.values_list("id", flat=True))
+    value = json.dumps([administration_ids, form_ids])
+    return hashlib.sha256(value.encode()).hexdigest()
+
+
+def encode_sync_cursor(
+    since: int, horizon: int = None, after=None, scope: str = None
+) -> str:
+    return signing.dumps(
+        {"since": since, "horizon": horizon, "after": after, "scope": scope},
+        salt=SYNC_CURSOR_SALT,
+    )
+
+
+def decode_sync_cursor(value: str) -> dict:
+    """
+    Empty cursors start a full sync, tampered ones raise BadSignature
+    """
+    if not value:
+        return {"since": 0, "horizon": None, "after": None, "scope": None}
+    return signing.loads(value, salt=SYNC_CURSOR_SALT)
+
+
+def get_sync_state(assignment: MobileAssignment, cursor: str):
+    """
+    State of a sync cursor of an assignment. A cursor taken before the
+    scope of the assignment changed can not tell the device which of
+    its datapoints are out of scope, the sync then starts over and the
+    device has to reset its datapoints.
+
+    Returns the state and whether the device has to reset.
+    """
+    state = decode_sync_cursor(cursor)
+    scope = get_sync_scope(assignment)
+    reset = bool(state["since"] or state["after"]) and (
+        state.get("scope") != scope
+    )
+    if reset:
+        state = decode_sync_cursor(None)
+    state["scope"] = scope
+    if state["horizon"] is None:
+        state["horizon"] = get_sync_horizon()
+    return state, reset
+
+
+def get_datapoint_changes(
+    assignment: MobileAssignment, cursor: str, page_size: int = SYNC_PAGE_SIZE
+):
+    """
+    One page of the datapoints of an assignment written since the
+    cursor. Soft deleted datapoints come back as tombstones, and so do
+    the ones moved away from the administrations of the assignment
+    since the cursor; datapoints outside of them the device never held
+    are left out.
+
+    A round reads every row whose transaction id is at least `since`,
+    in (sync_txid, id) order so that a page resumes after the previous
+    one. Once the round is over the next one starts from the horizon
+    taken when it began; rows that committed late are sent again
+    rather than missed.
+
+    Returns the rows, the next cursor, whether more pages follow and
+    whether the device has to reset its datapoints first.
+    """
+    state, reset = get_sync_state(assignment, cursor)
+    since = state["since"]
+    horizon = state["horizon"]
+    scope = state["scope"]
+    descendants = AdministrationClosure.objects.filter(
+        ancestor__in=assignment.administrations.all()
+    )
+    queryset = FormData.objects_with_deleted.annotate(
+        in_scope=Exists(
+            descendants.filter(descendant_id=OuterRef("administration_id"))
+        )
+    ).filter(
+        Q(is_pending=False) | Q(deleted_at__isnull=False),
+        form_id__in=assignment.forms.values("id"),
+        sync_txid__gte=since,
+    )
+    if since:
+        moved_away = DataAdministrationMove.objects.filter(
+            data_id=OuterRef("id"),
+            txid__gte=since,
+            administration_id__in=descendants.values("descendant_id"),
+        )
+        queryset = queryset.filter(Q(in_scope=True) | Exists(moved_away))
+    else:
+        # a device syncing for the first time has nothing to remove
+        queryset = queryset.filter(in_scope=True)
+    if state["after"]:
+        after_txid, after_id = state["after"]
+        queryset = queryset.filter(
+            Q(sync_txid__gt=after_txid)
+            | Q(sync_txid=after_txid, id__gt=after_id)
+        )
+    snapshots = DataSnapshot.objects.filter(uuid=OuterRef("uuid"))
+    rows = list(
+        queryset.annotate(
+            hash=Subquery(snapshots.values("hash")[:1]),
+            version=Subquery(snapshots.values("version")[:1]),
+            published=Subquery(snapshots.values("updated")[:1]),
+        )
+        .values(
+            "uuid",
+            "id",
+            "form_id",
+            "name",
+            "administration_id",
+            "created",
+            "updated",
+            "hash",
+            "version",
+            "published",
+            "deleted_at",
+            "in_scope",
+            "sync_txid",
+        )
+        .order_by("sync_txid", "id")[: page_size + 1]
+    )
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    for row in rows:
+        row["deleted"] = row["deleted_at"] is not None or not row["in_scope"]
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_sync_cursor(
+            since, horizon, [last["sync_txid"], last["id"]], scope
+        )
+    else:
+        next_cursor = encode_sync_cursor(horizon, scope=scope)
+    return rows, next_cursor, has_more, reset
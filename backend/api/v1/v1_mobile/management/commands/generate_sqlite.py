@@ -10,19 +10,22 @@ class Command(BaseCommand):
         parser.add_argument(
             "-t", "--test", nargs="?", const=False, default=False, type=bool
         )
+        # the master data was seeded, devices download the whole files
+        parser.add_argument("-r", "--reset", action="store_true")
 
     def handle(self, *args, **options):
         test = options.get("test", False)
-        file = generate_sqlite(Administration, test=test)
+        reset = options.get("reset", False)
+        file = generate_sqlite(Administration, test=test, reset=reset)
         if not test:
             self.log_generated(file, Administration)
-        file = generate_sqlite(Organisation, test=test)
+        file = generate_sqlite(Organisation, test=test, reset=reset)
         if not test:
             self.log_generated(file, Organisation)
-        file = generate_sqlite(Entity, test=test)
+        file = generate_sqlite(Entity, test=test, reset=reset)
         if not test:
             self.log_generated(file, Entity)
-        file = generate_sqlite(EntityData, test=test)
+        file = generate_sqlite(EntityData, test=test, reset=reset)
         if not test:
             self.log_generated(file, EntityData)
 
@@ -0,0 +1,33 @@
+# Generated by Django 4.0.4 on 2026-10-18 10:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('v1_data', '0007_data_sync_txid'),
+        ('v1_mobile', '0003_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MobileSubmission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.CharField(max_length=255)),
+                ('payload_hash', models.CharField(max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('assignment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mobile_submissions', to='v1_mobile.mobileassignment')),
+                ('data', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mobile_submissions', to='v1_data.formdata')),
+            ],
+            options={
+                'db_table': 'mobile_submissions',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='mobilesubmission',
+            constraint=models.UniqueConstraint(fields=('uuid', 'payload_hash'), name='mobile_submission_key'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.0.4 on 2026-10-18 11:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('v1_mobile', '0004_mobile_submissions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MasterDataChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(max_length=100)),
+                ('record_id', models.BigIntegerField(default=None, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'master_data_changes',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='masterdatachange',
+            index=models.Index(fields=['table', 'id'], name='master_data_change_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.0.4 on 2026-10-18 14:20
+
+from django.db import migrations, models
+
+
+def set_submission_keys(apps, schema_editor):
+    # the payload hash of the stored submissions covers their uuid, it
+    # stays unique within an assignment
+    MobileSubmission = apps.get_model("v1_mobile", "MobileSubmission")
+    MobileSubmission.objects.update(key=models.F("payload_hash"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('v1_mobile', '0005_master_data_changes'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='mobilesubmission',
+            name='mobile_submission_key',
+        ),
+        migrations.AddField(
+            model_name='mobilesubmission',
+            name='key',
+            field=models.CharField(default='', max_length=64),
+            preserve_default=False,
+        ),
+        migrations.RunPython(
+            set_submission_keys, migrations.RunPython.noop
+        ),
+        migrations.RemoveField(
+            model_name='mobilesubmission',
+            name='payload_hash',
+        ),
+        migrations.AlterField(
+            model_name='mobilesubmission',
+            name='uuid',
+            field=models.CharField(default=None, max_length=255, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='mobilesubmission',
+            constraint=models.UniqueConstraint(
+                fields=('assignment', 'key'), name='mobile_submission_key'
+            ),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.0.4 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('v1_mobile', '0006_mobile_submission_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MasterDataBuild',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(max_length=100, unique=True)),
+                ('version', models.BigIntegerField(default=0)),
+                ('checksum', models.CharField(max_length=64)),
+                ('built_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'master_data_builds',
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.0.4 on 2026-10-18 18:05
+
+from django.db import migrations, models
+
+TXID_TRIGGER = """
+CREATE OR REPLACE FUNCTION master_data_change_set_txid() RETURNS trigger AS $$
+BEGIN
+    NEW.txid := txid_current();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER master_data_change_txid
+BEFORE INSERT ON master_data_changes
+FOR EACH ROW EXECUTE PROCEDURE master_data_change_set_txid();
+
+UPDATE master_data_changes SET txid = txid_current();
+UPDATE master_data_builds SET version = 0;
+"""
+
+DROP_TXID_TRIGGER = """
+DROP TRIGGER IF EXISTS master_data_change_txid ON master_data_changes;
+DROP FUNCTION IF EXISTS master_data_change_set_txid();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('v1_mobile', '0007_master_data_builds'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='masterdatachange',
+            name='txid',
+            field=models.BigIntegerField(default=None, null=True),
+        ),
+        migrations.RemoveIndex(
+            model_name='masterdatachange',
+            name='master_data_change_idx',
+        ),
+        migrations.AddIndex(
+            model_name='masterdatachange',
+            index=models.Index(fields=['table', 'txid'], name='master_data_change_txid_idx'),
+        ),
+        migrations.RunSQL(TXID_TRIGGER, DROP_TXID_TRIGGER),
+    ]
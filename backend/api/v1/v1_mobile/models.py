@@ -1,7 +1,10 @@
 from django.db import models
-from api.v1.v1_users.models import SystemUser
-from api.v1.v1_profile.models import Administration
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from api.v1.v1_users.models import SystemUser, Organisation
+from api.v1.v1_profile.models import Administration, Entity, EntityData
 from api.v1.v1_forms.models import Forms
+from api.v1.v1_data.models import FormData
 from utils.custom_helper import generate_random_string, CustomPasscode
 
 
@@ -59,3 +62,101 @@ class MobileApk(models.Model):
         db_table = "mobile_apks"
         verbose_name = "Mobile Apk"
         verbose_name_plural = "Mobile Apks"
+
+
+class MobileSubmission(models.Model):
+    """
+    Datapoint stored for a mobile submission, keyed within the
+    assignment on the id the client gave the submission so that a
+    retried submission is not stored twice
+    """
+
+    assignment = models.ForeignKey(
+        MobileAssignment,
+        on_delete=models.CASCADE,
+        related_name="mobile_submissions",
+    )
+    key = models.CharField(max_length=64)
+    uuid = models.CharField(max_length=255, null=True, default=None)
+    data = models.ForeignKey(
+        FormData,
+        on_delete=models.CASCADE,
+        related_name="mobile_submissions",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.key}"
+
+    class Meta:
+        db_table = "mobile_submissions"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["assignment", "key"],
+                name="mobile_submission_key",
+            )
+        ]
+
+
+class MasterDataChange(models.Model):
+    """
+    Rows of a master data SQLite file changed since it was built. A
+    file is versioned on the transaction horizon it was read at, the
+    changes from that transaction id on are sent to bring it up to
+    date. A change without a record id means the whole table was
+    rebuilt.
+    """
+
+    table = models.CharField(max_length=100)
+    record_id = models.BigIntegerField(null=True, default=None)
+    # id of the transaction that logged the change, set by a trigger
+    txid = models.BigIntegerField(null=True, default=None)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.table} v{self.txid}"
+
+    class Meta:
+        db_table = "master_data_changes"
+        indexes = [
+            models.Index(
+                fields=["table", "txid"], name="master_data_change_txid_idx"
+            ),
+        ]
+
+
+class MasterDataBuild(models.Model):
+    """
+    Version and checksum of the rows of the last built master data
+    file of a table, a rebuild with other rows and no change logged
+    since means some rows were changed without being logged
+    """
+
+    table = models.CharField(max_length=100, unique=True)
+    version = models.BigIntegerField(default=0)
+    checksum = models.CharField(max_length=64)
+    built_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.table} v{self.version}"
+
+    class Meta:
+        db_table = "master_data_builds"
+
+
+@receiver(post_save, sender=Administration)
+@receiver(post_delete, sender=Administration)
+@receiver(post_save, sender=Organisation)
+@receiver(post_delete, sender=Organisation)
+@receiver(post_save, sender=Entity)
+@receiver(post_delete, sender=Entity)
+@receiver(post_save, sender=EntityData)
+@receiver(post_delete, sender=EntityData)
+def log_master_data_change(sender, instance, raw=False, **_):
+    # every write of a master data row is a change of its file, whatever
+    # path it came through (api, admin site, shell)
+    if raw:
+        return
+    MasterDataChange.objects.create(
+        table=sender._meta.db_table, record_id=instance.pk
+    )
@@ -6,6 +6,8 @@ from api.v1.v1_forms.models import Forms
 from drf_spectacular.types import OpenApiTypes
 from django.db.models import Q
 from api.v1.v1_mobile.authentication import MobileAssignmentToken
+from api.v1.v1_mobile.functions import SYNC_MAX_PAGE_SIZE
+from api.v1.v1_mobile.sync import MAX_BATCH_SUBMISSIONS, SyncStatus
 from api.v1.v1_profile.models import Administration, Entity
 from utils.custom_serializer_fields import (
     CustomCharField,
@@ -25,6 +27,8 @@ class MobileDataPointDownloadListSerializer(serializers.Serializer):
     administration_id = serializers.IntegerField()
     url = serializers.SerializerMethodField()
     last_updated = serializers.SerializerMethodField()
+    hash = serializers.CharField(allow_null=True)
+    version = serializers.IntegerField(allow_null=True)
 
     @extend_schema_field(OpenApiTypes.URI)
     def get_url(self, obj):
@@ -42,9 +46,69 @@ class MobileDataPointDownloadListSerializer(serializers.Serializer):
             "administration_id",
             "url",
             "last_updated",
+            "hash",
+            "version",
         ]
 
 
+class MobileDataPointChangeSerializer(MobileDataPointDownloadListSerializer):
+    uuid = serializers.CharField()
+    deleted = serializers.SerializerMethodField()
+
+    @extend_schema_field(OpenApiTypes.BOOL)
+    def get_deleted(self, obj):
+        return obj["deleted"]
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if instance["deleted"]:
+            # a tombstone only tells the device which datapoint to remove
+            return {k: data[k] for k in ["id", "uuid", "deleted"]}
+        return data
+
+    class Meta:
+        fields = MobileDataPointDownloadListSerializer.Meta.fields + [
+            "uuid",
+            "deleted",
+        ]
+
+
+class MobileDataPointChangeRequestSerializer(serializers.Serializer):
+    cursor = serializers.CharField(required=False, allow_blank=True)
+    page_size = CustomIntegerField(
+        required=False, min_value=1, max_value=SYNC_MAX_PAGE_SIZE
+    )
+
+
+class SqlitePatchRequestSerializer(serializers.Serializer):
+    since = CustomIntegerField(min_value=0)
+
+
+class SqlitePatchSerializer(serializers.Serializer):
+    version = serializers.IntegerField()
+    full = serializers.BooleanField()
+    upserts = serializers.ListField(child=serializers.DictField())
+    deletes = serializers.ListField(child=serializers.IntegerField())
+
+
+class SyncBatchSerializer(serializers.Serializer):
+    submissions = CustomListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=MAX_BATCH_SUBMISSIONS,
+    )
+
+
+class SyncBatchResultSerializer(serializers.Serializer):
+    index = serializers.IntegerField()
+    uuid = serializers.CharField(allow_null=True)
+    status = serializers.ChoiceField(
+        choices=[SyncStatus.ok, SyncStatus.failed]
+    )
+    id = serializers.IntegerField(required=False)
+    message = serializers.CharField(required=False)
+
+
 class MobileFormSerializer(serializers.ModelSerializer):
     id = serializers.IntegerField()
     parentId = serializers.ReadOnlyField(source="parent_id")
@@ -223,6 +287,12 @@ class SyncDeviceFormDataSerializer(serializers.Serializer):
     submittedAt = CustomDateTimeField()
     geo = CustomListField(child=serializers.IntegerField())
     uuid = serializers.UUIDField(required=False, allow_null=True)
+    submissionId = serializers.CharField(
+        required=False,
+        max_length=255,
+        help_text="Generated once per submission, a retry with the same "
+        "id is answered with the datapoint stored the first time",
+    )
     answers = serializers.DictField()
 
     def __init__(self, **kwargs):
@@ -0,0 +1,345 @@
+import requests
+from django.db import IntegrityError, transaction
+from rest_framework.exceptions import ValidationError
+from api.v1.v1_data.functions import get_answer_fields, validate_answer_value
+from api.v1.v1_data.models import FormData, Answers
+from api.v1.v1_data.pivot import refresh_answer_pivot
+from api.v1.v1_data.rollup import refresh_data_rollup
+from api.v1.v1_data.tasks import queue_data_publish
+from api.v1.v1_forms.constants import QuestionTypes
+from api.v1.v1_forms.models import Forms, Questions
+from api.v1.v1_mobile.functions import (
+    get_stored_submissions,
+    get_submission_answers,
+    get_submission_key,
+    get_submit_administration,
+)
+from api.v1.v1_mobile.models import MobileAssignment, MobileSubmission
+from api.v1.v1_profile.constants import DataAccessTypes
+from api.v1.v1_profile.models import Administration, EntityData, UserRole
+from api.v1.v1_users.models import Organisation
+from api.v1.v1_visualization.functions import invalidate_formdata_stats
+from utils.geohash import get_geohash
+
+MAX_BATCH_SUBMISSIONS = 500
+
+
+class SyncStatus:
+    ok = "ok"
+    failed = "failed"
+
+
+def get_qna(submission: dict) -> dict:
+    answers = submission.get("answers")
+    return answers if isinstance(answers, dict) else {}
+
+
+def to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class BatchSync:
+    """
+    Validate and insert the queued submissions of a mobile assignment
+    together. Forms, questions, administrations, cascade names and
+    approvers are looked up once for the whole batch and the datapoints
+    and answers are written with bulk inserts. A retried submission is
+    not stored twice, see get_submission_key.
+    """
+
+    def __init__(self, assignment: MobileAssignment, submissions: list):
+        self.assignment = assignment
+        self.user = assignment.user
+        self.submissions = submissions
+        self.administration = get_submit_administration(assignment)
+        self.external_names = {}
+        self.approvals = {}
+
+    def load(self, submissions: list):
+        form_ids = {to_int(s.get("formId")) for s in submissions}
+        self.forms = Forms.objects.select_related("parent").in_bulk(
+            [pk for pk in form_ids if pk]
+        )
+        self.adm_questions = {}
+        for question in Questions.objects.filter(
+            form_id__in=list(self.forms), type=QuestionTypes.administration
+        ).order_by("id"):
+            self.adm_questions.setdefault(question.form_id, question.id)
+        question_ids = set()
+        for submission in submissions:
+            for key in get_qna(submission):
+                question_ids.add(to_int(str(key).split("-")[0]))
+        self.questions = Questions.objects.in_bulk(
+            [pk for pk in question_ids if pk]
+        )
+        adm_ids = {self.administration.id} if self.administration else set()
+        cascade_ids = set()
+        for submission in submissions:
+            answers = get_qna(submission)
+            adm_key = str(
+                self.adm_questions.get(to_int(submission.get("formId")))
+            )
+            if adm_key in answers:
+                adm_ids.add(to_int(answers[adm_key]))
+            for key, value in answers.items():
+                question = self.questions.get(to_int(str(key).split("-")[0]))
+                if question and question.type == QuestionTypes.cascade:
+                    cascade_ids.add(to_int(value))
+        self.administrations = Administration.objects.select_related(
+            "parent"
+        ).in_bulk([pk for pk in adm_ids if pk])
+        cascade_ids = [pk for pk in cascade_ids if pk]
+        self.organisations = dict(
+            Organisation.objects.filter(pk__in=cascade_ids).values_list(
+                "id", "name"
+            )
+        )
+        self.entities = dict(
+            EntityData.objects.filter(pk__in=cascade_ids).values_list(
+                "id", "name"
+            )
+        )
+        uuids = [
+            s.get("uuid")
+            for s in submissions
+            if s.get("uuid")
+            and self.forms.get(to_int(s.get("formId")))
+            and self.forms[to_int(s.get("formId"))].parent_id
+        ]
+        self.parents = {}
+        for parent in FormData.objects.filter(
+            uuid__in=uuids, form__parent__isnull=True
+        ).order_by("-id"):
+            self.parents[str(parent.uuid)] = parent
+
+    def get_cascade_name(self, question: Questions, value):
+        name = None
+        if question.api:
+            ep = question.api.get("endpoint")
+            if "organisation" in ep:
+                name = self.organisations.get(value)
+            if "entity-data" in ep:
+                name = self.entities.get(value)
+            if "entity-data" not in ep and "organisation" not in ep:
+                ep = f"{ep.split('?')[0]}?id={value}"
+                if ep not in self.external_names:
+                    self.external_names[ep] = requests.get(ep).json()[0].get(
+                        "name"
+                    )
+                name = self.external_names[ep]
+        if question.extra and question.extra.get("type") == "entity":
+            name = self.entities.get(value)
+        return name
+
+    def get_answer_columns(self, question: Questions, value):
+        if question.type == QuestionTypes.cascade:
+            return self.get_cascade_name(question, value), None, None
+        if question.type == QuestionTypes.autofield:
+            return value, None, None
+        return get_answer_fields(question, value)
+
+    def has_approval(self, form: Forms, administration: Administration):
+        """
+        Same check as FormData.has_approval, once per form and
+        administration of the batch
+        """
+        key = (form.id, administration.id)
+        if key not in self.approvals:
+            administrations = [administration.id]
+            if administration.parent_id:
+                administrations += [
+                    int(p) for p in (administration.path or "").split(".")
+                    if p
+                ]
+            forms = [form.id]
+            if form.parent_id:
+                forms.append(form.parent_id)
+            self.approvals[key] = UserRole.objects.filter(
+                administration_id__in=administrations,
+                user__user_form__form_id__in=forms,
+                role__role_role_access__data_access=DataAccessTypes.approve,
+            ).exists()
+        return self.approvals[key]
+
+    def build(self, submission: dict):
+        """
+        Unsaved datapoint and answers of a submission, raises
+        ValidationError when it can not be stored
+        """
+        form = self.forms.get(to_int(submission.get("formId")))
+        if not form:
+            raise ValidationError("Form is not found.")
+        qna = get_qna(submission)
+        if not qna:
+            raise ValidationError("Answers is required.")
+        if not submission.get("name"):
+            raise ValidationError("name is required.")
+        adm_id = self.administration.id if self.administration else None
+        adm_key = str(self.adm_questions.get(form.id))
+        if adm_key in qna:
+            adm_id = to_int(qna[adm_key])
+        administration = self.administrations.get(adm_id)
+        if not administration:
+            raise ValidationError(
+                f'Invalid pk "{adm_id}" - object does not exist.'
+            )
+        geo = submission.get("geo")
+        if geo is not None and not isinstance(geo, list):
+            raise ValidationError("geo must be a list.")
+        duration = submission.get("duration")
+        if duration is not None and to_int(duration) is None:
+            raise ValidationError("duration must be a number.")
+        data = FormData(
+            name=submission["name"],
+            form=form,
+            administration=administration,
+            geo=geo,
+            submitter=self.assignment.name,
+            duration=to_int(duration) or 0,
+            created_by=self.user,
+        )
+        if submission.get("uuid"):
+            data.uuid = submission["uuid"]
+        if submission.get("uuid") and form.parent_id:
+            parent = self.parents.get(str(submission["uuid"]))
+            if parent:
+                data.parent = parent
+                data.geo = parent.geo
+                data.administration = parent.administration
+        data.geohash = get_geohash(data.geo)
+        if not self.user.is_superuser and self.has_approval(
+            form, data.administration
+        ):
+            data.is_pending = True
+        answers = []
+        for answer in get_submission_answers(qna):
+            question = self.questions.get(to_int(answer["question"]))
+            if not question:
+                raise ValidationError(
+                    f'Invalid pk "{answer["question"]}" - '
+                    "object does not exist."
+                )
+            if answer["value"] is None:
+                raise ValidationError(
+                    "Value is required for Question:{0}".format(question.id)
+                )
+            value = validate_answer_value(question, answer["value"])
+            name, value, options = self.get_answer_columns(question, value)
+            answers.append(
+                Answers(
+                    question=question,
+                    name=name,
+                    value=value,
+                    options=options,
+                    created_by=self.user,
+                    index=to_int(answer["index"]) or 0,
+                )
+            )
+        return data, answers
+
+    def run(self, retry: bool = False) -> list:
+        """
+        Store every valid submission, returns one result per submission
+        in the order they were sent. Submissions that were stored before
+        get the result of the first time without being validated again.
+        """
+        keys = [get_submission_key(s) for s in self.submissions]
+        stored = get_stored_submissions(
+            self.assignment, [k for k in keys if k]
+        )
+        results = []
+        pending = []
+        first = {}
+        repeated = []
+        for index, submission in enumerate(self.submissions):
+            result = {"index": index, "uuid": submission.get("uuid")}
+            key = keys[index]
+            results.append(result)
+            if key in stored:
+                result.update({"status": SyncStatus.ok, "id": stored[key]})
+                continue
+            if key in first:
+                # sent twice in the same batch
+                repeated.append((result, first[key]))
+                continue
+            if key:
+                first[key] = result
+            pending.append((result, submission, key))
+        if pending:
+            self.load([submission for _, submission, _ in pending])
+        valid = []
+        for result, submission, key in pending:
+            try:
+                data, answers = self.build(submission)
+            except ValidationError as e:
+                detail = e.detail
+                if isinstance(detail, list):
+                    detail = detail[0]
+                result.update(
+                    {"status": SyncStatus.failed, "message": str(detail)}
+                )
+            else:
+                valid.append((result, data, answers, key))
+        if valid:
+            try:
+                data_list = self.save(valid)
+            except IntegrityError:
+                # a concurrent retry stored some of these submissions
+                # first, they are found as stored on the second run
+                if retry:
+                    raise
+                return self.run(retry=True)
+            self.publish(data_list)
+        for result, original in repeated:
+            result.update(
+                {k: v for k, v in original.items() if k != "index"}
+            )
+        return results
+
+    def save(self, valid: list) -> list:
+        with transaction.atomic():
+            data_list = FormData.objects.bulk_create(
+                [d for _, d, _, _ in valid]
+            )
+            answers = []
+            submissions = []
+            for data, (result, _, data_answers, key) in zip(
+                data_list, valid
+            ):
+                for answer in data_answers:
+                    answer.data = data
+                answers += data_answers
+                if key:
+                    submissions.append(
+                        MobileSubmission(
+                            assignment=self.assignment,
+                            key=key,
+                            uuid=data.uuid,
+                            data=data,
+                        )
+                    )
+                result.update(
+                    {
+                        "status": SyncStatus.ok,
+                        "id": data.id,
+                        "uuid": str(data.uuid),
+                    }
+                )
+            Answers.objects.bulk_create(answers, batch_size=1000)
+            MobileSubmission.objects.bulk_create(submissions)
+        return data_list
+
+    def publish(self, data_list: list):
+        refresh_answer_pivot(data_list)
+        refresh_data_rollup(data_list)
+        if self.user.is_superuser:
+            # Only save to file if the data is not pending
+            # and does not have a parent
+            queue_data_publish(
+                [d for d in data_list if not d.parent_id and not d.is_pending]
+            )
+        for parent_id in {d.parent_id for d in data_list if d.parent_id}:
+            invalidate_formdata_stats(parent_id)
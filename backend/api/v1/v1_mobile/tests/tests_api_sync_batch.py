@@ -0,0 +1,334 @@
+import gzip
+import json
+import uuid
+from unittest import mock
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from api.v1.v1_data.models import FormData, Answers
+from api.v1.v1_forms.constants import QuestionTypes
+from api.v1.v1_forms.models import Forms
+from api.v1.v1_mobile.functions import get_stored_submissions
+from api.v1.v1_mobile.models import MobileAssignment, MobileSubmission
+from api.v1.v1_mobile.tests.mixins import AssignmentTokenTestHelperMixin
+from api.v1.v1_profile.models import Administration
+from api.v1.v1_profile.tests.mixins import ProfileTestHelperMixin
+
+
+class MobileAssignmentApiSyncBatchTest(
+    TestCase, AssignmentTokenTestHelperMixin, ProfileTestHelperMixin
+):
+    def setUp(self):
+        call_command("administration_seeder", "--test")
+        call_command("form_seeder", "--test")
+        call_command("default_roles_seeder", "--test", 1)
+        self.administration = Administration.objects.filter(
+            level__level=1
+        ).order_by("id").first()
+        self.form = Forms.objects.get(pk=1)
+        self.create_user(
+            email="approver.123@test.com",
+            administration=self.administration,
+            role_level=self.IS_APPROVER,
+            form=self.form,
+        )
+        self.user = self.create_user(
+            email="test@test.org",
+            administration=self.administration,
+            role_level=self.IS_ADMIN,
+            form=self.form,
+        )
+        self.passcode = "passcode1234"
+        assignment = MobileAssignment.objects.create_assignment(
+            user=self.user, name="test assignment", passcode=self.passcode
+        )
+        self.children = Administration.objects.filter(
+            parent=self.administration
+        ).all()
+        assignment.administrations.add(*self.children)
+        assignment.forms.add(self.form)
+        self.token = self.get_assignmen_token(self.passcode)
+        self.answers = {}
+        for question in self.form.form_questions.all():
+            if question.type in [
+                QuestionTypes.option,
+                QuestionTypes.multiple_option,
+            ]:
+                value = [question.options.first().value]
+            elif question.type in [QuestionTypes.number]:
+                value = 12
+            elif question.type == QuestionTypes.geo:
+                value = [-6.2, 106.8]
+            elif question.type == QuestionTypes.date:
+                value = "2021-01-01T00:00:00.000Z"
+            elif question.type in [
+                QuestionTypes.administration,
+                QuestionTypes.cascade,
+            ]:
+                value = self.children.first().id
+            else:
+                value = "testing"
+            self.answers[str(question.id)] = value
+
+    def get_submission(self, name):
+        return {
+            "formId": self.form.id,
+            "name": name,
+            "duration": 3000,
+            "geo": [-6.2, 106.8],
+            "answers": self.answers,
+        }
+
+    def post_batch(self, submissions, **extra):
+        return self.client.post(
+            "/api/v1/device/batch-sync",
+            json.dumps({"submissions": submissions}),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+            **extra,
+        )
+
+    def get_answers(self, data):
+        return sorted(
+            Answers.objects.filter(data=data).values_list(
+                "question_id", "name", "value", "options", "index"
+            ),
+            key=str,
+        )
+
+    def test_batch_sync(self):
+        invalid = self.get_submission("invalid")
+        invalid["answers"] = {
+            **self.answers,
+            str(
+                self.form.form_questions.filter(
+                    type=QuestionTypes.number
+                ).first().id
+            ): "twelve",
+        }
+        submissions = [self.get_submission(f"dp {i}") for i in range(20)]
+        submissions.insert(3, {**self.get_submission("empty"), "answers": {}})
+        submissions.insert(7, invalid)
+        response = self.post_batch(submissions)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.json()["results"]
+        self.assertEqual(len(results), 22)
+        self.assertEqual(
+            [r["index"] for r in results if r["status"] == "failed"], [3, 7]
+        )
+        self.assertEqual(results[3]["message"], "Answers is required.")
+        self.assertIn("Valid number value is required", results[7]["message"])
+
+        data = FormData.objects.filter(created_by=self.user)
+        self.assertEqual(data.count(), 20)
+        # the approver of the administration puts the data in review
+        self.assertFalse(data.filter(is_pending=False).exists())
+        stored = data.get(pk=results[0]["id"])
+        self.assertEqual(stored.name, "dp 0")
+        self.assertEqual(stored.submitter, "test assignment")
+        self.assertEqual(stored.geohash[:3], "qqg")
+        self.assertEqual(
+            Answers.objects.filter(data__in=data).count(),
+            20 * len(self.answers),
+        )
+
+        # stored the same way as one submission at a time
+        response = self.client.post(
+            "/api/v1/device/sync",
+            self.get_submission("single"),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        single = FormData.objects.get(name="single")
+        self.assertEqual(single.is_pending, stored.is_pending)
+        self.assertEqual(single.administration_id, stored.administration_id)
+        self.assertEqual(self.get_answers(single), self.get_answers(stored))
+
+    def test_batch_sync_queries_do_not_grow(self):
+        counts = []
+        for size in [2, 10]:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.post_batch(
+                    [self.get_submission(f"dp {i}") for i in range(size)]
+                )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_gzip_batch_sync(self):
+        body = gzip.compress(
+            json.dumps(
+                {"submissions": [self.get_submission("compressed")]}
+            ).encode("utf-8")
+        )
+        response = self.client.post(
+            "/api/v1/device/batch-sync",
+            body,
+            content_type="application/json",
+            HTTP_CONTENT_ENCODING="gzip",
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["results"][0]["status"], "ok")
+        self.assertTrue(FormData.objects.filter(name="compressed").exists())
+
+        response = self.client.post(
+            "/api/v1/device/batch-sync",
+            b"not gzip",
+            content_type="application/json",
+            HTTP_CONTENT_ENCODING="gzip",
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.post_batch([])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def post_sync(self, submission, token=None):
+        return self.client.post(
+            "/api/v1/device/sync",
+            submission,
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Bearer {token or self.token}",
+        )
+
+    def test_retried_submissions_are_stored_once(self):
+        submission = {
+            **self.get_submission("retried"),
+            "uuid": str(uuid.uuid4()),
+            "submittedAt": "2024-05-01T08:00:00.000Z",
+        }
+        response = self.post_sync(submission)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = FormData.objects.get(name="retried")
+        self.assertEqual(response.json(), {"message": "ok", "id": data.id})
+        # the retry gets the original result
+        response = self.post_sync(submission)
+        self.assertEqual(response.json(), {"message": "ok", "id": data.id})
+        self.assertEqual(
+            MobileSubmission.objects.get(uuid=submission["uuid"]).data, data
+        )
+
+        # the batch of a device that never got the response
+        other = {
+            **self.get_submission("other"),
+            "uuid": str(uuid.uuid4()),
+            "submittedAt": "2024-05-01T09:00:00.000Z",
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post_batch([submission])
+        self.assertEqual(
+            response.json()["results"],
+            [
+                {
+                    "index": 0,
+                    "uuid": submission["uuid"],
+                    "status": "ok",
+                    "id": data.id,
+                }
+            ],
+        )
+        stored_queries = len(queries)
+        response = self.post_batch([other, submission, other])
+        results = response.json()["results"]
+        self.assertEqual(results[1]["id"], data.id)
+        self.assertEqual(results[0]["id"], results[2]["id"])
+        self.assertEqual(FormData.objects.filter(name="other").count(), 1)
+        self.assertEqual(FormData.objects.filter(name="retried").count(), 1)
+        with CaptureQueriesContext(connection) as queries:
+            self.post_batch([other, submission])
+        self.assertEqual(len(queries), stored_queries)
+
+    def test_retried_media_submission_is_stored_once(self):
+        submission = {
+            **self.get_submission("media"),
+            "uuid": str(uuid.uuid4()),
+            "submittedAt": "2024-05-01T08:00:00.000Z",
+        }
+        response = self.post_sync(submission)
+        data_id = response.json()["id"]
+        # the files of a retry are uploaded again under new names
+        answers = dict(submission["answers"])
+        question_id = list(answers)[0]
+        answers[question_id] = f"/images/photo-{uuid.uuid4()}.jpg"
+        response = self.post_sync({**submission, "answers": answers})
+        self.assertEqual(response.json(), {"message": "ok", "id": data_id})
+        self.assertEqual(FormData.objects.filter(name="media").count(), 1)
+
+    def test_repeated_visits_are_not_dropped(self):
+        # monitoring visits share the uuid of their datapoint
+        visit = {
+            **self.get_submission("visit"),
+            "uuid": str(uuid.uuid4()),
+            "submittedAt": "2024-05-01T08:00:00.000Z",
+        }
+        self.post_sync(visit)
+        self.post_sync({**visit, "submittedAt": "2024-06-01T08:00:00.000Z"})
+        self.assertEqual(FormData.objects.filter(name="visit").count(), 2)
+
+        # the same visit from another assignment
+        passcode = "passcode5678"
+        assignment = MobileAssignment.objects.create_assignment(
+            user=self.user, name="other assignment", passcode=passcode
+        )
+        assignment.administrations.add(*self.children)
+        assignment.forms.add(self.form)
+        response = self.post_sync(
+            visit, token=self.get_assignmen_token(passcode)
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(FormData.objects.filter(name="visit").count(), 3)
+
+        # without a submission time they can not be told apart
+        untimed = {**self.get_submission("untimed"), "uuid": visit["uuid"]}
+        self.post_sync(untimed)
+        self.post_sync(untimed)
+        self.assertEqual(FormData.objects.filter(name="untimed").count(), 2)
+
+    def test_retries_are_keyed_on_submission_id(self):
+        submission = {
+            **self.get_submission("identified"),
+            "submissionId": str(uuid.uuid4()),
+        }
+        response = self.post_batch([submission])
+        data_id = response.json()["results"][0]["id"]
+        # the retry is the same submission even when it was sent again
+        # with another duration
+        response = self.post_sync({**submission, "duration": 10})
+        self.assertEqual(response.json(), {"message": "ok", "id": data_id})
+        response = self.post_sync(
+            {**submission, "submissionId": str(uuid.uuid4())}
+        )
+        self.assertNotEqual(response.json()["id"], data_id)
+        self.assertEqual(
+            FormData.objects.filter(name="identified").count(), 2
+        )
+
+    def test_concurrent_retry_is_stored_once(self):
+        submission = {
+            **self.get_submission("racing"),
+            "submissionId": str(uuid.uuid4()),
+        }
+        response = self.post_batch([submission])
+        data_id = response.json()["results"][0]["id"]
+        calls = []
+
+        def stored_after_check(assignment, keys):
+            # the retry looked before the first submission was stored
+            calls.append(keys)
+            if len(calls) > 1:
+                return get_stored_submissions(assignment, keys)
+            return {}
+
+        with mock.patch(
+            "api.v1.v1_mobile.sync.get_stored_submissions",
+            side_effect=stored_after_check,
+        ):
+            response = self.post_batch([submission])
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["results"][0]["id"], data_id)
+        self.assertEqual(FormData.objects.filter(name="racing").count(), 1)
@@ -0,0 +1,141 @@
+import gzip
+import json
+import struct
+import tempfile
+from unittest import mock
+import msgpack
+from django.core.management import call_command
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework import status
+from api.v1.v1_data.functions import publish_data_json
+from api.v1.v1_data.models import FormData
+from api.v1.v1_forms.models import Forms
+from api.v1.v1_mobile.models import MobileAssignment
+from api.v1.v1_profile.models import Administration
+from api.v1.v1_profile.tests.mixins import ProfileTestHelperMixin
+
+
+def read_bundle(content: bytes) -> list:
+    body = gzip.decompress(content)
+    records = []
+    offset = 0
+    while offset < len(body):
+        (size,) = struct.unpack(">I", body[offset:offset + 4])
+        offset += 4
+        records.append(msgpack.unpackb(body[offset:offset + size]))
+        offset += size
+    return records
+
+
+@override_settings(USE_TZ=False)
+class MobileDataPointBundleTestCase(TestCase, ProfileTestHelperMixin):
+    def setUp(self):
+        call_command("administration_seeder", "--test")
+        call_command("form_seeder", "--test")
+        call_command("default_roles_seeder", "--test", 1)
+        administration = Administration.objects.filter(
+            parent__isnull=True
+        ).first()
+        forms = Forms.objects.filter(parent__isnull=True).all()
+        self.user = self.create_user(
+            email="test@test.org",
+            role_level=self.IS_ADMIN,
+            administration=administration,
+        )
+        self.passcode = "passcode1234"
+        assignment = MobileAssignment.objects.create_assignment(
+            user=self.user, name="test", passcode=self.passcode
+        )
+        children = administration.parent_administration.all()
+        assignment.administrations.add(*children)
+        assignment.forms.add(*forms)
+        self.data = [
+            FormData.objects.create(
+                name=f"Datapoint {ix}",
+                form=forms[0],
+                administration=children.first(),
+                created_by=self.user,
+            )
+            for ix in range(3)
+        ]
+        response = self.client.post(
+            "/api/v1/device/auth",
+            {"code": self.passcode},
+            content_type="application/json",
+        )
+        self.token = response.data["syncToken"]
+        self.storage = tempfile.TemporaryDirectory()
+        patcher = mock.patch("utils.storage.STORAGE_PATH", self.storage.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.storage.cleanup)
+
+    def get_bundle(self, cursor=""):
+        return self.client.get(
+            "/api/v1/device/datapoint-bundle",
+            {"cursor": cursor},
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+        )
+
+    def test_datapoint_bundle(self):
+        published, unpublished, deleted = self.data
+        publish_data_json([published.id])
+        # the published file is streamed as it is
+        with open(
+            f"{self.storage.name}/datapoints/{published.uuid}.json", "w"
+        ) as f:
+            json.dump({"id": published.id, "from": "file"}, f)
+        deleted.delete()
+
+        response = self.get_bundle()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-msgpack")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertTrue(response["X-Sync-Cursor"])
+        self.assertEqual(response["X-Sync-Reset"], "0")
+        content = b"".join(response.streaming_content)
+        records = {r["id"]: r for r in read_bundle(content)}
+        self.assertEqual(set(records), {d.id for d in self.data})
+        self.assertEqual(
+            records[published.id]["data"],
+            {"id": published.id, "from": "file"},
+        )
+        self.assertEqual(records[published.id]["version"], 1)
+        self.assertEqual(records[unpublished.id]["data"], unpublished.to_json)
+        self.assertIsNone(records[unpublished.id]["hash"])
+        self.assertEqual(
+            records[unpublished.id]["uuid"], str(unpublished.uuid)
+        )
+        self.assertEqual(
+            records[deleted.id],
+            {"id": deleted.id, "uuid": str(deleted.uuid), "deleted": True},
+        )
+        self.assertFalse(records[published.id]["deleted"])
+
+    def test_stale_published_file_is_not_streamed(self):
+        edited = self.data[0]
+        publish_data_json([edited.id])
+        with open(
+            f"{self.storage.name}/datapoints/{edited.uuid}.json", "w"
+        ) as f:
+            json.dump({"id": edited.id, "from": "file"}, f)
+        # edited while the new file is still queued for publishing
+        edited.name = "Edited datapoint"
+        edited.updated = timezone.now()
+        edited.save()
+
+        response = self.get_bundle()
+        content = b"".join(response.streaming_content)
+        records = {r["id"]: r for r in read_bundle(content)}
+        self.assertEqual(records[edited.id]["data"], edited.to_json)
+        self.assertEqual(
+            records[edited.id]["data"]["datapoint_name"], "Edited datapoint"
+        )
+
+    def test_datapoint_bundle_invalid_cursor(self):
+        response = self.get_bundle("invalid")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get("/api/v1/device/datapoint-bundle")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
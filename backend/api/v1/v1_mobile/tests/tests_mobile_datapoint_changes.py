@@ -0,0 +1,198 @@
+import tempfile
+from unittest import mock
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase
+from rest_framework import status
+from api.v1.v1_data.models import FormData
+from api.v1.v1_forms.models import Forms
+from api.v1.v1_mobile.functions import get_sync_horizon
+from api.v1.v1_mobile.models import MobileAssignment
+from api.v1.v1_profile.models import Administration
+from api.v1.v1_profile.tests.mixins import ProfileTestHelperMixin
+
+
+def get_test_horizon():
+    # the transactions of the other test processes would hold the real
+    # horizon back, every row written so far is committed here
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT txid_current()")
+        return cursor.fetchone()[0]
+
+
+# rows are only told apart by the transaction that wrote them, so each
+# write has to be committed on its own
+class MobileDataPointChangesTestCase(
+    TransactionTestCase, ProfileTestHelperMixin
+):
+    def setUp(self):
+        call_command("administration_seeder", "--test")
+        call_command("form_seeder", "--test")
+        call_command("default_roles_seeder", "--test", 1)
+        administration = Administration.objects.filter(
+            parent__isnull=True
+        ).first()
+        forms = Forms.objects.filter(parent__isnull=True).all()
+        self.user = self.create_user(
+            email="test@test.org",
+            role_level=self.IS_ADMIN,
+            administration=administration,
+        )
+        self.passcode = "passcode1234"
+        assignment = MobileAssignment.objects.create_assignment(
+            user=self.user, name="test", passcode=self.passcode
+        )
+        children = administration.parent_administration.all()
+        assignment.administrations.add(*children)
+        assignment.forms.add(*forms)
+        self.assignment = assignment
+        self.administration = administration
+        self.data = [
+            FormData.objects.create(
+                name=f"Datapoint {ix}",
+                form=forms[0],
+                administration=children.first(),
+                created_by=self.user,
+            )
+            for ix in range(3)
+        ]
+        response = self.client.post(
+            "/api/v1/device/auth",
+            {"code": self.passcode},
+            content_type="application/json",
+        )
+        self.token = response.data["syncToken"]
+
+    def get_changes(self, cursor="", page_size=100):
+        return self.client.get(
+            "/api/v1/device/datapoint-changes",
+            {"cursor": cursor, "page_size": page_size},
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+        )
+
+    def sync(self, cursor="", page_size=100, reset=False):
+        rows = []
+        while True:
+            response = self.get_changes(cursor, page_size)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            data = response.json()
+            # only the first page of a sync asks the device to reset
+            self.assertEqual(data["reset"], reset and not rows)
+            rows += data["data"]
+            cursor = data["cursor"]
+            if not data["has_more"]:
+                return rows, cursor
+
+    def test_sync_horizon(self):
+        self.assertLessEqual(get_sync_horizon(), get_test_horizon())
+
+    @mock.patch(
+        "api.v1.v1_mobile.functions.get_sync_horizon", get_test_horizon
+    )
+    def test_delta_sync(self):
+        response = self.get_changes(page_size=2)
+        data = response.json()
+        self.assertEqual(len(data["data"]), 2)
+        self.assertTrue(data["has_more"])
+        self.assertFalse(data["data"][0]["deleted"])
+        rows, cursor = self.sync(data["cursor"], page_size=2)
+        self.assertEqual(
+            [r["id"] for r in data["data"] + rows],
+            [d.id for d in self.data],
+        )
+
+        rows, cursor = self.sync(cursor)
+        self.assertEqual(rows, [])
+
+        updated, deleted, _ = self.data
+        updated.name = "Updated datapoint"
+        updated.save()
+        deleted.delete()
+        FormData.objects.create(
+            name="Pending datapoint",
+            form=updated.form,
+            administration=updated.administration,
+            created_by=self.user,
+            is_pending=True,
+        )
+        rows, cursor = self.sync(cursor)
+        self.assertEqual(
+            [(r["id"], r["name"], r["deleted"]) for r in rows[:1]],
+            [(updated.id, "Updated datapoint", False)],
+        )
+        self.assertEqual(
+            rows[1:],
+            [{"id": deleted.id, "uuid": str(deleted.uuid), "deleted": True}],
+        )
+        rows, _ = self.sync(cursor)
+        self.assertEqual(rows, [])
+
+    @mock.patch(
+        "api.v1.v1_mobile.functions.get_sync_horizon", get_test_horizon
+    )
+    def test_moved_datapoint_is_removed(self):
+        _, cursor = self.sync()
+        moved, _, _ = self.data
+        # the root administration is not part of the assignment
+        outside = FormData.objects.create(
+            name="Outside datapoint",
+            form=moved.form,
+            administration=self.administration,
+            created_by=self.user,
+        )
+        moved.administration = self.administration
+        moved.save()
+        rows, cursor = self.sync(cursor)
+        self.assertEqual(
+            rows,
+            [{"id": moved.id, "uuid": str(moved.uuid), "deleted": True}],
+        )
+        # written again out of the assignment, the device holds neither
+        moved.name = "Moved datapoint"
+        moved.save()
+        outside.delete()
+        rows, _ = self.sync(cursor)
+        self.assertEqual(rows, [])
+
+    @mock.patch(
+        "api.v1.v1_mobile.functions.get_sync_horizon", get_test_horizon
+    )
+    def test_published_datapoint_is_sent_again(self):
+        rows, cursor = self.sync()
+        self.assertEqual([r["hash"] for r in rows], [None] * 3)
+        published = self.data[0]
+        # the queued publisher writes the snapshot after the round
+        with tempfile.TemporaryDirectory() as storage_path:
+            with mock.patch("utils.storage.STORAGE_PATH", storage_path):
+                published.publish_json()
+        rows, cursor = self.sync(cursor)
+        self.assertEqual([r["id"] for r in rows], [published.id])
+        self.assertIsNotNone(rows[0]["hash"])
+        self.assertEqual(rows[0]["version"], 1)
+        rows, _ = self.sync(cursor)
+        self.assertEqual(rows, [])
+
+    @mock.patch(
+        "api.v1.v1_mobile.functions.get_sync_horizon", get_test_horizon
+    )
+    def test_scope_change_resets_the_device(self):
+        rows, cursor = self.sync()
+        self.assertEqual(len(rows), 3)
+        administration = self.data[0].administration
+        self.assignment.administrations.remove(administration)
+        rows, cursor = self.sync(cursor, reset=True)
+        self.assertEqual(rows, [])
+
+        self.assignment.administrations.add(administration)
+        rows, cursor = self.sync(cursor, page_size=2, reset=True)
+        self.assertEqual(
+            [r["id"] for r in rows], [d.id for d in self.data]
+        )
+        rows, _ = self.sync(cursor)
+        self.assertEqual(rows, [])
+
+    def test_invalid_cursor(self):
+        response = self.get_changes("not-a-cursor")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.get_changes(page_size=0)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
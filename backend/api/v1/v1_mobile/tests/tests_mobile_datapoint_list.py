@@ -92,6 +92,8 @@ class MobileDataPointDownloadListTestCase(TestCase, ProfileTestHelperMixin):
                 "administration_id",
                 "url",
                 "last_updated",
+                "hash",
+                "version",
             ],
         )
 
@@ -11,6 +11,9 @@ from api.v1.v1_profile.management.commands.administration_seeder import (
 from api.v1.v1_profile.constants import DEFAULT_ADMINISTRATION_LEVELS
 from api.v1.v1_users.models import Organisation
 from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from api.v1.v1_profile.tree import administration_tree
 from utils.custom_generator import generate_sqlite, update_sqlite
 from unittest.mock import patch
 
@@ -46,6 +49,43 @@ class SQLiteGenerationTest(TestCase):
         conn.close()
         os.remove(file_name)
 
+    def test_generate_sqlite_administration(self):
+        with CaptureQueriesContext(connection) as queries:
+            file_name = generate_sqlite(Administration)
+        # the file version, the rows, at most one load of the tree with
+        # its version and the checksum of the last build
+        self.assertLessEqual(len(queries), 6)
+        conn = sqlite3.connect(file_name)
+        columns = {
+            c[1]: c[2]
+            for c in conn.execute("PRAGMA table_info(nodes)").fetchall()
+        }
+        self.assertEqual(columns["id"], "INTEGER")
+        self.assertEqual(columns["parent"], "INTEGER")
+        self.assertEqual(columns["full_path_name"], "TEXT")
+        indexes = {
+            i[1] for i in conn.execute("PRAGMA index_list(nodes)").fetchall()
+        }
+        self.assertEqual(indexes, {"nodes_parent", "nodes_name"})
+        child = self.administration.filter(level__level=2).first()
+        row = conn.execute(
+            "SELECT parent, full_path_name FROM nodes WHERE id = ?",
+            [child.id],
+        ).fetchone()
+        self.assertEqual(
+            row,
+            (child.parent_id, administration_tree.get_full_name(child.id)),
+        )
+        root = self.administration.filter(parent__isnull=True).first()
+        self.assertEqual(
+            conn.execute(
+                "SELECT parent FROM nodes WHERE id = ?", [root.id]
+            ).fetchone(),
+            (0,),
+        )
+        conn.close()
+        os.remove(file_name)
+
     def test_sqlite_generation_command(self):
         call_command("generate_sqlite", "--test", True)
         output_1 = f"{MASTER_DATA}/test_administrator.sqlite"
@@ -0,0 +1,226 @@
+import sqlite3
+import tempfile
+from unittest import mock
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from api.v1.v1_mobile.models import MasterDataChange
+from api.v1.v1_profile.models import Administration, Entity
+from api.v1.v1_users.models import Organisation
+from utils.custom_generator import (
+    delete_sqlite,
+    generate_sqlite,
+    get_sqlite_patch,
+    update_sqlite,
+)
+
+
+def get_test_horizon():
+    # the transactions of the other test processes would hold the real
+    # horizon back, every change logged so far is committed here
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT txid_current()")
+        return cursor.fetchone()[0]
+
+
+@override_settings(USE_TZ=False, TEST_ENV=True)
+class SQLitePatchTest(TransactionTestCase):
+    def setUp(self):
+        call_command("administration_seeder", "--test")
+        call_command("organisation_seeder", "--test")
+        self.master_data = tempfile.TemporaryDirectory()
+        patcher = mock.patch(
+            "utils.custom_generator.MASTER_DATA", self.master_data.name
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.master_data.cleanup)
+        patcher = mock.patch(
+            "utils.custom_generator.get_sync_horizon", get_test_horizon
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_file_version(self, file_name):
+        conn = sqlite3.connect(file_name)
+        (version,) = conn.execute("PRAGMA user_version").fetchone()
+        conn.close()
+        return version
+
+    def test_sqlite_patch(self):
+        file_name = generate_sqlite(Organisation, reset=True)
+        version = self.get_file_version(file_name)
+        self.assertGreater(version, 0)
+        patch = get_sqlite_patch(Organisation, version)
+        self.assertGreater(patch["version"], version)
+        self.assertEqual(
+            patch,
+            {
+                "version": patch["version"],
+                "full": False,
+                "upserts": [],
+                "deletes": [],
+            },
+        )
+
+        org = Organisation.objects.create(name="SQLite Company")
+        update_sqlite(
+            model=Organisation, data={"id": org.id, "name": org.name}
+        )
+        edited = Organisation.objects.exclude(pk=org.id).first()
+        edited.name = "Edited Company"
+        edited.save()
+        update_sqlite(
+            model=Organisation, data={"name": edited.name}, id=edited.id
+        )
+        middle = get_sqlite_patch(Organisation, version)["version"]
+        deleted = Organisation.objects.exclude(
+            pk__in=[org.id, edited.id]
+        ).first()
+        deleted_id = deleted.id
+        deleted.delete()
+        delete_sqlite(model=Organisation, id=deleted_id)
+
+        patch = get_sqlite_patch(Organisation, version)
+        self.assertFalse(patch["full"])
+        self.assertGreater(patch["version"], middle)
+        # the file keeps its version, the rows written to it are resent
+        self.assertEqual(self.get_file_version(file_name), version)
+        self.assertEqual(
+            {n["id"]: n["name"] for n in patch["upserts"]},
+            {org.id: "SQLite Company", edited.id: "Edited Company"},
+        )
+        self.assertEqual(patch["upserts"][0]["parent"], 0)
+        self.assertEqual(patch["deletes"], [deleted_id])
+        conn = sqlite3.connect(file_name)
+        self.assertIsNone(
+            conn.execute(
+                "SELECT id FROM nodes WHERE id = ?", [deleted_id]
+            ).fetchone()
+        )
+        conn.close()
+
+        # only the changes after the version of the device
+        patch = get_sqlite_patch(Organisation, middle)
+        self.assertEqual(patch["upserts"], [])
+        self.assertEqual(patch["deletes"], [deleted_id])
+
+        # a rebuilt file or an unknown version is downloaded again
+        self.assertTrue(get_sqlite_patch(Organisation, 0)["full"])
+        self.assertTrue(
+            get_sqlite_patch(Organisation, patch["version"] + 100)["full"]
+        )
+        latest = generate_sqlite(Organisation, reset=True)
+        self.assertTrue(get_sqlite_patch(Organisation, version)["full"])
+        patch = get_sqlite_patch(
+            Organisation, self.get_file_version(latest)
+        )
+        self.assertFalse(patch["full"])
+        self.assertEqual(patch["upserts"], [])
+
+    def test_saved_rows_are_patched(self):
+        file_name = generate_sqlite(Organisation, reset=True)
+        version = self.get_file_version(file_name)
+        # saved outside of the api, e.g. from the admin site
+        org = Organisation.objects.create(name="Admin Company")
+        patch = get_sqlite_patch(Organisation, version)
+        self.assertFalse(patch["full"])
+        self.assertEqual([n["id"] for n in patch["upserts"]], [org.id])
+
+        entity = Entity.objects.create(name="School")
+        patch = get_sqlite_patch(Entity, 0)
+        self.assertTrue(patch["full"])
+        generate_sqlite(Entity)
+        entity.name = "Health Facility"
+        entity.save()
+        patch = get_sqlite_patch(Entity, patch["version"])
+        self.assertEqual(
+            [(n["id"], n["name"]) for n in patch["upserts"]],
+            [(entity.id, "Health Facility")],
+        )
+
+    def test_unlogged_rows_are_rebuilt(self):
+        file_name = generate_sqlite(Organisation, reset=True)
+        version = self.get_file_version(file_name)
+        # the same rows are not a rebuild
+        generate_sqlite(Organisation)
+        self.assertFalse(get_sqlite_patch(Organisation, version)["full"])
+        Organisation.objects.filter(
+            pk=Organisation.objects.first().id
+        ).update(name="Bulk Edited")
+        file_name = generate_sqlite(Organisation)
+        latest = self.get_file_version(file_name)
+        self.assertGreater(latest, version)
+        self.assertTrue(get_sqlite_patch(Organisation, version)["full"])
+        # the rebuilt file already holds the unlogged rows
+        self.assertFalse(get_sqlite_patch(Organisation, latest)["full"])
+
+    def test_late_commits_are_patched(self):
+        file_name = generate_sqlite(Organisation, reset=True)
+        version = self.get_file_version(file_name)
+        # a transaction that started before the patch is still running
+        running = get_test_horizon()
+        with mock.patch(
+            "utils.custom_generator.get_sync_horizon", return_value=running
+        ):
+            patch = get_sqlite_patch(Organisation, version)
+        self.assertEqual(patch["version"], running)
+        self.assertEqual(patch["upserts"], [])
+        # and commits its change after the patch was read
+        org = Organisation.objects.create(name="Late Company")
+        MasterDataChange.objects.filter(record_id=org.id).update(
+            txid=running
+        )
+        patch = get_sqlite_patch(Organisation, patch["version"])
+        self.assertEqual([n["id"] for n in patch["upserts"]], [org.id])
+
+    def test_administration_patch_has_descendants(self):
+        file_name = generate_sqlite(Administration, reset=True)
+        version = self.get_file_version(file_name)
+        province = Administration.objects.filter(level__level=1).first()
+        province.name = "Renamed"
+        province.save()
+        update_sqlite(
+            model=Administration, data={"name": province.name},
+            id=province.id,
+        )
+        patch = get_sqlite_patch(Administration, version)
+        nodes = {n["id"]: n for n in patch["upserts"]}
+        self.assertEqual(
+            set(nodes),
+            set(
+                province.closure_descendants.values_list(
+                    "descendant_id", flat=True
+                )
+            ),
+        )
+        self.assertEqual(nodes[province.id]["name"], "Renamed")
+        child = province.parent_administration.first()
+        self.assertIn("Renamed", nodes[child.id]["full_path_name"])
+
+    def test_sqlite_patch_endpoint(self):
+        file_name = generate_sqlite(Organisation, reset=True)
+        version = self.get_file_version(file_name)
+        org = Organisation.objects.first()
+        org.name = "Edited"
+        org.save()
+        update_sqlite(model=Organisation, data={"name": "Edited"}, id=org.id)
+        response = self.client.get(
+            "/api/v1/device/sqlite-patch/test_organisation.sqlite",
+            {"since": version},
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertGreater(data["version"], version)
+        self.assertFalse(data["full"])
+        self.assertEqual([n["id"] for n in data["upserts"]], [org.id])
+        self.assertEqual(data["deletes"], [])
+
+        response = self.client.get(
+            "/api/v1/device/sqlite-patch/test_organisation.sqlite"
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(
+            "/api/v1/device/sqlite-patch/unknown.sqlite", {"since": 1}
+        )
+        self.assertEqual(response.status_code, 404)
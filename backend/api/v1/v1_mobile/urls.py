@@ -3,11 +3,15 @@ from .views import (
     get_mobile_forms,
     get_mobile_form_details,
     sync_pending_form_data,
+    sync_pending_form_data_batch,
     upload_image_form_device,
     download_sqlite_file,
     upload_apk_file,
     download_apk_file,
     get_datapoint_download_list,
+    get_datapoint_changes_list,
+    get_datapoint_bundle,
+    download_sqlite_patch,
     MobileAssignmentViewSet,
     check_apk_version,
     UploadAttachmentsView,
@@ -29,11 +33,19 @@ urlpatterns = [
         r"^(?P<version>(v1))/device/form/(?P<form_id>[0-9]+)",
         get_mobile_form_details,
     ),
+    re_path(
+        r"^(?P<version>(v1))/device/batch-sync",
+        sync_pending_form_data_batch,
+    ),
     re_path(
         r"^(?P<version>(v1))/device/sync",
         sync_pending_form_data,
         name="device-sync"
     ),
+    re_path(
+        r"^(?P<version>(v1))/device/sqlite-patch/(?P<file_name>.*)$",
+        download_sqlite_patch,
+    ),
     re_path(
         r"^(?P<version>(v1))/device/sqlite/(?P<file_name>.*)$",
         download_sqlite_file,
@@ -45,6 +57,14 @@ urlpatterns = [
         r"^(?P<version>(v1))/device/datapoint-list",
         get_datapoint_download_list,
     ),
+    re_path(
+        r"^(?P<version>(v1))/device/datapoint-bundle",
+        get_datapoint_bundle,
+    ),
+    re_path(
+        r"^(?P<version>(v1))/device/datapoint-changes",
+        get_datapoint_changes_list,
+    ),
     re_path(
         r"^(?P<version>(v1))/device/apk/version/(?P<current_version>[^/]+)",
         check_apk_version,
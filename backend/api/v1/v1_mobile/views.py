@@ -16,9 +16,11 @@ from mis.settings import (
     APK_SHORT_NAME,
     WEBDOMAIN,
 )
-from django.http import HttpResponse
+from django.core.signing import BadSignature
+from django.http import HttpResponse, StreamingHttpResponse
 from django.utils import timezone
-from django.db.models import Q
+from django.db import IntegrityError, transaction
+from django.db.models import OuterRef, Q, Subquery
 
 from rest_framework import status, serializers
 from rest_framework.response import Response
@@ -32,6 +34,7 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import MultiPartParser
 from rest_framework.views import APIView
 
+from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import (
     OpenApiParameter,
     extend_schema,
@@ -44,22 +47,38 @@ from .serializers import (
     MobileApkSerializer,
     MobileAssignmentSerializer,
     MobileDataPointDownloadListSerializer,
+    MobileDataPointChangeSerializer,
+    MobileDataPointChangeRequestSerializer,
     SyncDeviceFormDataSerializer,
+    SyncBatchSerializer,
+    SyncBatchResultSerializer,
+    SqlitePatchRequestSerializer,
+    SqlitePatchSerializer,
 )
-from .models import MobileAssignment, MobileApk
+from .bundle import BUNDLE_CONTENT_TYPE, DatapointBundle
+from .sync import BatchSync
+from .functions import (
+    SYNC_PAGE_SIZE,
+    get_datapoint_changes,
+    get_stored_submissions,
+    get_submission_answers,
+    get_submission_key,
+    get_submit_administration,
+)
+from .models import MobileAssignment, MobileApk, MobileSubmission
 from api.v1.v1_forms.models import Forms, Questions, QuestionTypes
-from api.v1.v1_data.models import FormData
+from api.v1.v1_data.models import FormData, DataSnapshot
 from api.v1.v1_forms.serializers import WebFormDetailSerializer
 from api.v1.v1_data.serializers import SubmitPendingFormSerializer
 from api.v1.v1_files.serializers import (
     UploadImagesSerializer,
     AttachmentsSerializer,
 )
-from api.v1.v1_profile.constants import DataAccessTypes
-from api.v1.v1_profile.models import Administration
+from api.v1.v1_profile.models import Administration, AdministrationClosure
 from api.v1.v1_files.functions import handle_upload
+from utils.custom_generator import SQLITE_MODELS, get_sqlite_patch
 from utils.custom_helper import CustomPasscode
-from utils.default_serializers import DefaultResponseSerializer
+from utils.custom_parsers import GzipJSONParser
 from utils.custom_serializer_fields import (
     validate_serializers_message,
 )
@@ -120,33 +139,38 @@ def get_mobile_form_details(request: Request, version, form_id):
 
 @extend_schema(
     request=SyncDeviceFormDataSerializer,
-    responses={200: DefaultResponseSerializer},
+    responses={
+        (200, "application/json"): inline_serializer(
+            "SyncDeviceFormDataResponse",
+            fields={
+                "message": serializers.CharField(),
+                "id": serializers.IntegerField(),
+            },
+        )
+    },
     tags=["Mobile Device Form"],
     summary="Submit pending form data",
 )
 @api_view(["POST"])
 @permission_classes([IsMobileAssignment])
 def sync_pending_form_data(request, version):
-    form = get_object_or_404(Forms, pk=request.data.get("formId"))
     assignment = cast(MobileAssignmentToken, request.auth).assignment
+    key = get_submission_key(request.data)
+    stored = get_stored_submissions(assignment, [key] if key else [])
+    if key in stored:
+        # retry of a submission that is already stored
+        return Response(
+            {"message": "ok", "id": stored[key]}, status=status.HTTP_200_OK
+        )
+    form = get_object_or_404(Forms, pk=request.data.get("formId"))
     user = assignment.user
-    administration = assignment.administrations.order_by(
-        "level__level"
-    ).first()
-    if user.user_user_role.exists():
-        user_role = user.user_user_role.filter(
-            role__role_role_access__data_access=DataAccessTypes.submit
-        ).first()
-        if user_role:
-            # If user has a role with data access, use that administration
-            administration = user_role.administration
+    administration = get_submit_administration(assignment)
 
     if not request.data.get("answers"):
         return Response(
             {"message": "Answers is required."},
             status=status.HTTP_400_BAD_REQUEST,
         )
-    answers = []
     qna = request.data.get("answers")
     adm_id = administration.id
     adm_qs = Questions.objects.filter(
@@ -156,23 +180,7 @@ def sync_pending_form_data(request, version):
     if adm_key and adm_key in qna:
         adm_id = qna[adm_key]
     # Handle repeat question values with indexes
-    for q_key in list(qna):
-        """
-        Extract the base question ID from the key
-        Keys can be like "1" or "1-1" or "1-2"
-        where the base question ID is "1"
-        """
-        index = 0
-        if '-' in str(q_key):
-            [base_q_id, q_index] = str(q_key).split('-')
-            index = q_index
-        else:
-            base_q_id = str(q_key)
-        answers.append({
-            "question": base_q_id,
-            "value": qna[q_key],
-            "index": index,
-        })
+    answers = get_submission_answers(qna)
     payload = {
         "administration": adm_id,
         "name": request.data.get("name"),
@@ -197,8 +205,59 @@ def sync_pending_form_data(request, version):
             },
             status=status.HTTP_400_BAD_REQUEST,
         )
-    serializer.save()
-    return Response({"message": "ok"}, status=status.HTTP_200_OK)
+    try:
+        with transaction.atomic():
+            data = serializer.save()
+            if key:
+                MobileSubmission.objects.create(
+                    assignment=assignment,
+                    key=key,
+                    uuid=data.uuid,
+                    data=data,
+                )
+    except IntegrityError:
+        # a concurrent retry of the same submission was stored first
+        stored = get_stored_submissions(assignment, [key] if key else [])
+        if key not in stored:
+            raise
+        return Response(
+            {"message": "ok", "id": stored[key]}, status=status.HTTP_200_OK
+        )
+    return Response(
+        {"message": "ok", "id": data.id}, status=status.HTTP_200_OK
+    )
+
+
+@extend_schema(
+    request=SyncBatchSerializer,
+    responses={
+        (200, "application/json"): inline_serializer(
+            "SyncBatchResponse",
+            fields={"results": SyncBatchResultSerializer(many=True)},
+        )
+    },
+    tags=["Mobile Device Form"],
+    summary="Submit several pending form data at once",
+    description="The body may be sent gzip compressed with the "
+    "Content-Encoding: gzip header. Every submission gets a result, "
+    "the valid ones are stored even when others fail.",
+)
+@api_view(["POST"])
+@permission_classes([IsMobileAssignment])
+@parser_classes([GzipJSONParser])
+def sync_pending_form_data_batch(request, version):
+    serializer = SyncBatchSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(
+            {"message": validate_serializers_message(serializer.errors)},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    assignment = cast(MobileAssignmentToken, request.auth).assignment
+    results = BatchSync(
+        assignment=assignment,
+        submissions=serializer.validated_data["submissions"],
+    ).run()
+    return Response({"results": results}, status=status.HTTP_200_OK)
 
 
 @extend_schema(tags=["Mobile Device Form"], summary="Get SQLITE File")
@@ -226,6 +285,44 @@ def download_sqlite_file(request, version, file_name):
     return response
 
 
+@extend_schema(
+    parameters=[
+        OpenApiParameter(
+            name="since",
+            required=True,
+            type=int,
+            location=OpenApiParameter.QUERY,
+            description="Version of the SQLite file on the device, "
+            "read from its user_version",
+        ),
+    ],
+    responses={200: SqlitePatchSerializer},
+    tags=["Mobile Device Form"],
+    summary="Get the changes of a SQLITE File since a version",
+    description="When full is true the file has to be downloaded again.",
+)
+@api_view(["GET"])
+def download_sqlite_patch(request, version, file_name):
+    table = file_name
+    if table.startswith("test_"):
+        table = table[len("test_"):]
+    model = SQLITE_MODELS.get(table.replace(".sqlite", ""))
+    if not model:
+        return Response(
+            {"message": "File not found."}, status=status.HTTP_404_NOT_FOUND
+        )
+    serializer = SqlitePatchRequestSerializer(data=request.query_params)
+    if not serializer.is_valid():
+        return Response(
+            {"message": validate_serializers_message(serializer.errors)},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    patch = get_sqlite_patch(model, serializer.validated_data["since"])
+    return Response(
+        SqlitePatchSerializer(patch).data, status=status.HTTP_200_OK
+    )
+
+
 @extend_schema(
     tags=["Mobile Device Form"],
     summary="Upload Images from Device",
@@ -481,25 +578,16 @@ class MobileAssignmentViewSet(ModelViewSet):
 def get_datapoint_download_list(request, version):
     assignment = cast(MobileAssignmentToken, request.auth).assignment
     forms = assignment.forms.values("id")
-    administrations = [
-        {"id": a.id, "path": a.path}
-        for a in assignment.administrations.all()
-    ]
     paginator = Pagination()
 
-    # Start with base query for administration IDs
-    admin_id_query = Q(
-        administration_id__in=[a["id"] for a in administrations],
-        form_id__in=forms,
-    )
-    # Build path query by combining conditions for all administration paths
-    path_query = Q()
-    for admin in administrations:
-        adm_path = admin["path"] if admin["path"] else admin["id"]
-        path_query |= Q(administration__path__startswith=adm_path)
-    # Combine both queries with the form filter
+    # Semi-join on the closure table so overlapping assigned
+    # administrations don't produce duplicated datapoints
+    descendants = AdministrationClosure.objects.filter(
+        ancestor__in=assignment.administrations.all()
+    ).values("descendant_id")
     queryset = FormData.objects.filter(
-        admin_id_query | (path_query & Q(form_id__in=forms))
+        administration_id__in=descendants,
+        form_id__in=forms,
     )
     if assignment.last_synced_at:
         queryset = queryset.filter(
@@ -508,7 +596,12 @@ def get_datapoint_download_list(request, version):
         )
 
     queryset = queryset.filter(is_pending=False)
-    queryset = queryset.values(
+    # content hash of the published JSON, lets devices skip unchanged
+    snapshots = DataSnapshot.objects.filter(uuid=OuterRef("uuid"))
+    queryset = queryset.annotate(
+        hash=Subquery(snapshots.values("hash")[:1]),
+        version=Subquery(snapshots.values("version")[:1]),
+    ).values(
         "uuid",
         "id",
         "form_id",
@@ -516,6 +609,8 @@ def get_datapoint_download_list(request, version):
         "administration_id",
         "created",
         "updated",
+        "hash",
+        "version",
     ).order_by("-created")
 
     instance = paginator.paginate_queryset(queryset, request)
@@ -528,3 +623,119 @@ def get_datapoint_download_list(request, version):
         assignment.last_synced_at = timezone.now()
         assignment.save()
     return response
+
+
+@extend_schema(
+    parameters=[
+        OpenApiParameter(
+            name="cursor",
+            required=False,
+            type=str,
+            location=OpenApiParameter.QUERY,
+            description="Cursor returned by the previous call, "
+            "empty for a full sync",
+        ),
+        OpenApiParameter(
+            name="page_size",
+            required=False,
+            type=int,
+            location=OpenApiParameter.QUERY,
+        ),
+    ],
+    responses={
+        (200, "application/json"): inline_serializer(
+            "MobileDeviceDatapointChangesResponse",
+            fields={
+                "data": MobileDataPointChangeSerializer(many=True),
+                "cursor": serializers.CharField(),
+                "has_more": serializers.BooleanField(),
+                "reset": serializers.BooleanField(),
+            },
+        )
+    },
+    tags=["Mobile Device Form"],
+    summary="GET Datapoints changed since a sync cursor",
+)
+@api_view(["GET"])
+@permission_classes([IsMobileAssignment])
+def get_datapoint_changes_list(request, version):
+    serializer = MobileDataPointChangeRequestSerializer(
+        data=request.query_params
+    )
+    if not serializer.is_valid():
+        return Response(
+            {"message": validate_serializers_message(serializer.errors)},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    assignment = cast(MobileAssignmentToken, request.auth).assignment
+    try:
+        rows, cursor, has_more, reset = get_datapoint_changes(
+            assignment=assignment,
+            cursor=serializer.validated_data.get("cursor"),
+            page_size=serializer.validated_data.get(
+                "page_size", SYNC_PAGE_SIZE
+            ),
+        )
+    except BadSignature:
+        return Response(
+            {"message": "Invalid sync cursor"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    return Response(
+        {
+            "data": MobileDataPointChangeSerializer(rows, many=True).data,
+            "cursor": cursor,
+            "has_more": has_more,
+            "reset": reset,
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
+@extend_schema(
+    parameters=[
+        OpenApiParameter(
+            name="cursor",
+            required=False,
+            type=str,
+            location=OpenApiParameter.QUERY,
+            description="Cursor of the previous sync, empty for a full sync",
+        ),
+    ],
+    responses={(200, BUNDLE_CONTENT_TYPE): OpenApiTypes.BINARY},
+    tags=["Mobile Device Form"],
+    summary="GET Datapoints changed since a sync cursor as one bundle",
+    description="Gzip compressed stream of msgpack records, each one "
+    "prefixed with its length as a 4 bytes big endian integer. The "
+    "cursor of the next sync is sent in the X-Sync-Cursor header, "
+    "X-Sync-Reset is 1 when the device has to drop its datapoints first.",
+)
+@api_view(["GET"])
+@permission_classes([IsMobileAssignment])
+def get_datapoint_bundle(request, version):
+    serializer = MobileDataPointChangeRequestSerializer(
+        data=request.query_params
+    )
+    if not serializer.is_valid():
+        return Response(
+            {"message": validate_serializers_message(serializer.errors)},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    assignment = cast(MobileAssignmentToken, request.auth).assignment
+    try:
+        bundle = DatapointBundle(
+            assignment=assignment,
+            cursor=serializer.validated_data.get("cursor"),
+        )
+    except BadSignature:
+        return Response(
+            {"message": "Invalid sync cursor"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    response = StreamingHttpResponse(
+        bundle.stream(), content_type=BUNDLE_CONTENT_TYPE
+    )
+    response["Content-Encoding"] = "gzip"
+    response["X-Sync-Cursor"] = bundle.next_cursor
+    response["X-Sync-Reset"] = "1" if bundle.reset else "0"
+    return response
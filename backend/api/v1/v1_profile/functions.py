@@ -1,5 +1,11 @@
+from django.db import transaction
 from rest_framework.generics import get_object_or_404
-from api.v1.v1_profile.models import Administration, Levels
+from api.v1.v1_profile.models import (
+    Administration,
+    AdministrationClosure,
+    Levels,
+)
+from api.v1.v1_profile.tree import administration_tree
 
 
 def get_administration_ids_by_path(administration_id):
@@ -20,3 +26,29 @@ def get_administration_ids_by_path(administration_id):
 def get_max_administration_level():
     max_level = Levels.objects.order_by("-level").first()
     return max_level.level if max_level else 0
+
+
+def rebuild_administration_closure(queryset=None, batch_size=1000):
+    """
+    Recreate the closure rows of the given administrations from their
+    current path. Used after bulk re-pathing, which bypasses the
+    model signals, and to backfill the whole table when no queryset
+    is given.
+    """
+    if queryset is None:
+        queryset = Administration.objects.all()
+    administrations = list(queryset.values_list("id", "path"))
+    with transaction.atomic():
+        AdministrationClosure.objects.filter(
+            descendant_id__in=[a[0] for a in administrations]
+        ).delete()
+        rows = []
+        for administration_id, path in administrations:
+            rows.extend(
+                AdministrationClosure.from_path(administration_id, path)
+            )
+        AdministrationClosure.objects.bulk_create(
+            rows, batch_size=batch_size
+        )
+    administration_tree.invalidate()
+    return len(administrations)
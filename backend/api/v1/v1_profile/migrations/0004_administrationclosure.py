@@ -0,0 +1,51 @@
+# Generated by Django 4.0.4 on 2026-10-18 08:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_closure(apps, schema_editor):
+    Administration = apps.get_model("v1_profile", "Administration")
+    AdministrationClosure = apps.get_model(
+        "v1_profile", "AdministrationClosure"
+    )
+    rows = []
+    for adm_id, path in Administration.objects.values_list("id", "path"):
+        ancestor_ids = [
+            int(p) for p in (path or "").split(".")
+            if p and int(p) != adm_id
+        ]
+        for ix, ancestor_id in enumerate(ancestor_ids):
+            rows.append(AdministrationClosure(
+                ancestor_id=ancestor_id,
+                descendant_id=adm_id,
+                depth=len(ancestor_ids) - ix,
+            ))
+        rows.append(AdministrationClosure(
+            ancestor_id=adm_id, descendant_id=adm_id, depth=0
+        ))
+    AdministrationClosure.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('v1_profile', '0003_role_roleaccess_userrole_delete_access'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdministrationClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.IntegerField(default=0)),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='closure_descendants', to='v1_profile.administration')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='closure_ancestors', to='v1_profile.administration')),
+            ],
+            options={
+                'db_table': 'administration_closure',
+                'unique_together': {('ancestor', 'descendant')},
+            },
+        ),
+        migrations.RunPython(backfill_closure, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.0.4 on 2026-10-18 11:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('v1_profile', '0004_administrationclosure'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdministrationTreeVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'administration_tree_version',
+            },
+        ),
+    ]
@@ -1,8 +1,9 @@
 from django.db import models
 from django.contrib.postgres.fields import ArrayField
-from django.db.models.signals import pre_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from api.v1.v1_profile.constants import DataAccessTypes
+from api.v1.v1_profile.tree import administration_tree
 from api.v1.v1_users.models import SystemUser
 
 
@@ -46,31 +47,43 @@ class Administration(models.Model):
             return administrations
         return None
 
+    @property
+    def descendants(self):
+        # Subtree of this administration (itself included),
+        # resolved through the closure table instead of a path scan
+        return Administration.objects.filter(
+            closure_ancestors__ancestor=self
+        )
+
+    @property
+    def ancestor_names(self):
+        # served from the in-memory tree, no query per call
+        if not self.path:
+            return []
+        return administration_tree.get_path_names(self.id)[:-1]
+
     @property
     def full_name(self):
-        if self.path:
-            names = " - ".join([a.name for a in self.ancestors])
-            return "{} - {}".format(names, self.name)
-        return self.name
+        return " - ".join(self.ancestor_names + [self.name])
 
     @property
     def full_path_name(self):
-        if self.path:
-            names = "|".join([a.name for a in self.ancestors])
-            return "{}|{}".format(names, self.name)
-        return self.name
+        return "|".join(self.ancestor_names + [self.name])
 
     @property
     def administration_column(self):
-        if self.path:
-            names = "|".join([a.name for a in self.ancestors])
-            return "{}|{}".format(names, self.name)
-        return self.name
+        return self.full_path_name
 
     class Meta:
         db_table = "administrator"
 
 
+@receiver(post_save, sender=Administration)
+@receiver(post_delete, sender=Administration)
+def invalidate_administration_tree(sender, **_):
+    administration_tree.invalidate()
+
+
 @receiver(pre_save, sender=Administration)
 def set_administration_path(sender, instance: Administration, **_):
     if not instance.parent:
@@ -81,6 +94,88 @@ def set_administration_path(sender, instance: Administration, **_):
     instance.path = f"{parent.path or ''}{parent.id}."
 
 
+class AdministrationClosure(models.Model):
+    ancestor = models.ForeignKey(
+        to=Administration,
+        on_delete=models.CASCADE,
+        related_name="closure_descendants",
+    )
+    descendant = models.ForeignKey(
+        to=Administration,
+        on_delete=models.CASCADE,
+        related_name="closure_ancestors",
+    )
+    depth = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.ancestor_id} > {self.descendant_id} ({self.depth})"
+
+    @staticmethod
+    def from_path(administration_id: int, path: str = None):
+        """
+        Build the closure rows of an administration from its path,
+        including the self reference (depth 0)
+        """
+        ancestor_ids = [
+            int(p) for p in (path or "").split(".")
+            if p and int(p) != administration_id
+        ]
+        rows = [
+            AdministrationClosure(
+                ancestor_id=ancestor_id,
+                descendant_id=administration_id,
+                depth=len(ancestor_ids) - ix,
+            )
+            for ix, ancestor_id in enumerate(ancestor_ids)
+        ]
+        rows.append(
+            AdministrationClosure(
+                ancestor_id=administration_id,
+                descendant_id=administration_id,
+                depth=0,
+            )
+        )
+        return rows
+
+    class Meta:
+        unique_together = ("ancestor", "descendant")
+        db_table = "administration_closure"
+
+
+@receiver(post_save, sender=Administration)
+def set_administration_closure(
+    sender, instance: Administration, created: bool, **_
+):
+    rows = AdministrationClosure.from_path(instance.id, instance.path)
+    if not created:
+        current = set(
+            AdministrationClosure.objects.filter(
+                descendant_id=instance.id
+            ).values_list("ancestor_id", "depth")
+        )
+        if current == set((r.ancestor_id, r.depth) for r in rows):
+            return
+        AdministrationClosure.objects.filter(
+            descendant_id=instance.id
+        ).delete()
+    AdministrationClosure.objects.bulk_create(rows)
+
+
+class AdministrationTreeVersion(models.Model):
+    """
+    Version of the administration hierarchy shared by every process, the
+    in-memory trees reload when it moves
+    """
+
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"v{self.version}"
+
+    class Meta:
+        db_table = "administration_tree_version"
+
+
 class AdministrationAttribute(models.Model):
     class Type(models.TextChoices):
         VALUE = "value", "Value"
@@ -17,6 +17,7 @@ from utils.custom_serializer_fields import (
     CustomPrimaryKeyRelatedField,
     CustomListField,
 )
+from api.v1.v1_profile.functions import rebuild_administration_closure
 from utils.custom_generator import update_sqlite
 from utils.custom_generator import (
     administration_csv_add,
@@ -220,7 +221,12 @@ class AdministrationSerializer(serializers.ModelSerializer):
 
         adm_parent = validated_data.get("parent")
         if (adm_parent and str(adm_parent.id) not in instance.path):
-            old_path = instance.path
+            # Collect the subtree before re-pathing, the closure rows
+            # inside the moved subtree are still valid at this point
+            subtree = list(
+                instance.descendants.values_list("id", flat=True)
+            )
+            old_path = "{0}{1}.".format(instance.path, instance.id)
             new_path = "{0}{1}.".format(
                 adm_parent.path,
                 adm_parent.id
@@ -228,6 +234,7 @@ class AdministrationSerializer(serializers.ModelSerializer):
             instance.path = new_path
             instance.save()
 
+            new_path = "{0}{1}.".format(new_path, instance.id)
             old_path_length = len(old_path)
             Administration.objects.filter(
                 path__startswith=old_path
@@ -241,6 +248,9 @@ class AdministrationSerializer(serializers.ModelSerializer):
                     )
                 )
             )
+            rebuild_administration_closure(
+                Administration.objects.filter(id__in=subtree)
+            )
         for it in attributes:
             attribute = it.pop("attribute")
             data = dict(attribute=attribute)
@@ -0,0 +1,72 @@
+import typing
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import TestCase
+from django.test.utils import override_settings
+from api.v1.v1_profile.functions import rebuild_administration_closure
+from api.v1.v1_profile.models import Administration, AdministrationClosure
+from api.v1.v1_profile.tests.mixins import ProfileTestHelperMixin
+
+
+@override_settings(USE_TZ=False, TEST_ENV=True)
+class AdministrationClosureTestCase(TestCase, ProfileTestHelperMixin):
+
+    def setUp(self):
+        super().setUp()
+        call_command("administration_seeder", "--test")
+        self.user = self.create_user("test@akvo.org", self.IS_SUPER_ADMIN)
+        self.token = self.get_auth_token(self.user.email)
+
+    def assert_closure_match_path(self):
+        for adm in Administration.objects.all():
+            ancestor_ids = [int(p) for p in (adm.path or "").split(".") if p]
+            closure_ids = list(
+                AdministrationClosure.objects.filter(
+                    descendant=adm,
+                    depth__gt=0,
+                ).order_by("-depth").values_list("ancestor_id", flat=True)
+            )
+            self.assertEqual(closure_ids, ancestor_ids)
+            self.assertTrue(
+                AdministrationClosure.objects.filter(
+                    ancestor=adm, descendant=adm, depth=0
+                ).exists()
+            )
+
+    def test_closure_created_on_save(self):
+        self.assert_closure_match_path()
+        root = Administration.objects.filter(parent__isnull=True).first()
+        self.assertEqual(
+            root.descendants.count(), Administration.objects.count()
+        )
+        village = Administration.objects.filter(level__level=4).first()
+        self.assertEqual(list(village.descendants), [village])
+
+    def test_closure_updated_on_move(self):
+        target = Administration.objects.get(name="Kramat Jati")
+        village = target.parent_administration.first()
+        new_parent = Administration.objects.get(name="Sleman")
+        response = typing.cast(
+            HttpResponse,
+            self.client.put(
+                f"/api/v1/administrations/{target.id}",
+                {"parent": new_parent.id, "name": target.name},
+                content_type="application/json",
+                HTTP_AUTHORIZATION=f"Bearer {self.token}",
+            ),
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assert_closure_match_path()
+        self.assertTrue(
+            new_parent.descendants.filter(pk=village.id).exists()
+        )
+        old_parent = Administration.objects.get(name="East Jakarta")
+        self.assertFalse(
+            old_parent.descendants.filter(pk=village.id).exists()
+        )
+
+    def test_rebuild_closure(self):
+        AdministrationClosure.objects.all().delete()
+        total = rebuild_administration_closure()
+        self.assertEqual(total, Administration.objects.count())
+        self.assert_closure_match_path()
@@ -0,0 +1,102 @@
+from django.core.management import call_command
+from django.test import TestCase
+from django.test.utils import override_settings
+from api.v1.v1_profile.models import (
+    Administration,
+    AdministrationTreeVersion,
+    Levels,
+)
+from api.v1.v1_profile.tree import administration_tree
+
+
+@override_settings(USE_TZ=False, TEST_ENV=True)
+class AdministrationTreeTestCase(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        call_command("administration_seeder", "--test")
+        self.village = Administration.objects.filter(level__level=4).first()
+
+    def test_names_match_ancestors(self):
+        names = [a.name for a in self.village.ancestors] + [
+            self.village.name
+        ]
+        self.assertEqual(
+            self.village.full_name, " - ".join(names)
+        )
+        self.assertEqual(
+            self.village.full_path_name, "|".join(names)
+        )
+        self.assertEqual(
+            self.village.administration_column, "|".join(names)
+        )
+        root = Administration.objects.filter(parent__isnull=True).first()
+        self.assertEqual(root.full_name, root.name)
+
+    def test_names_without_queries(self):
+        # warm up the tree
+        self.village.full_name
+        ids = list(Administration.objects.values_list("id", flat=True))
+        with self.assertNumQueries(0):
+            for pk in ids:
+                self.assertTrue(administration_tree.get_full_path_name(pk))
+
+    def test_invalidated_on_rename(self):
+        parent = self.village.parent
+        self.assertIn(parent.name, self.village.full_name)
+        version = administration_tree.get_version()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            parent.name = "Renamed Parent"
+            parent.save()
+            # the shared version moves once the rename is committed
+            self.assertEqual(administration_tree.get_version(), version)
+        self.assertTrue(callbacks)
+        self.assertEqual(administration_tree.get_version(), version + 1)
+        village = Administration.objects.get(pk=self.village.id)
+        self.assertIn("Renamed Parent", village.full_name)
+
+    def test_reload_on_unknown_administration(self):
+        administration_tree.get_full_name(self.village.id)
+        # bulk_create skips the signals, like a write committed by
+        # another process that bumped the shared version
+        adm = Administration.objects.bulk_create([
+            Administration(
+                parent=self.village,
+                name="New Hamlet",
+                path=f"{self.village.path}{self.village.id}.",
+                level=Levels.objects.order_by("-level").first(),
+            )
+        ])[0]
+        AdministrationTreeVersion.objects.update_or_create(
+            pk=1, defaults={"version": administration_tree.get_version() + 1}
+        )
+        self.assertEqual(
+            administration_tree.get_full_name(adm.id),
+            f"{self.village.full_name} - New Hamlet",
+        )
+
+    def test_unknown_administration_is_not_reloaded(self):
+        administration_tree.get_full_name(self.village.id)
+        # a single version check for the first miss
+        with self.assertNumQueries(1):
+            for _ in range(10):
+                self.assertEqual(administration_tree.get_full_name(0), "")
+
+    def test_memoised_names_follow_the_version(self):
+        parent = self.village.parent
+        self.assertIn(parent.name, administration_tree.get_full_name(
+            self.village.id
+        ))
+        # renamed by another process, which bumped the shared version
+        Administration.objects.filter(pk=parent.id).update(
+            name="Renamed Elsewhere"
+        )
+        AdministrationTreeVersion.objects.update_or_create(
+            pk=1, defaults={"version": administration_tree.get_version() + 1}
+        )
+        # the next check is due
+        administration_tree._checked_at = 0
+        self.assertIn(
+            "Renamed Elsewhere",
+            administration_tree.get_full_name(self.village.id),
+        )
@@ -0,0 +1,134 @@
+import time
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import F
+
+# seconds between two checks of the shared version
+VERSION_CHECK_INTERVAL = 5
+
+
+class AdministrationTree:
+    """
+    In-memory copy of the administration hierarchy.
+
+    The whole table is loaded once per process and the ancestor chains
+    and joined names are memoised, so the naming helpers no longer run
+    a query per call. Writers bump a version stored in the database once
+    they commit; other processes, the workers included, notice it on
+    their next check and reload.
+    """
+
+    def __init__(self):
+        self._nodes = None
+        self._version = None
+        self._checked_at = 0
+        self._names = {}
+        self._misses = set()
+
+    def get_version(self) -> int:
+        TreeVersion = apps.get_model("v1_profile", "AdministrationTreeVersion")
+        return (
+            TreeVersion.objects.values_list("version", flat=True).first() or 0
+        )
+
+    def _load(self):
+        Administration = apps.get_model("v1_profile", "Administration")
+        # read before the rows, a write committed in between only makes
+        # the next check reload again
+        self._version = self.get_version()
+        self._checked_at = time.monotonic()
+        self._nodes = {
+            pk: (name, parent_id, path)
+            for pk, name, parent_id, path in (
+                Administration.objects.values_list(
+                    "id", "name", "parent_id", "path"
+                )
+            )
+        }
+        self._names = {}
+        self._misses = set()
+
+    def _check_version(self):
+        self._checked_at = time.monotonic()
+        if self.get_version() != self._version:
+            self._load()
+
+    def _ensure_loaded(self):
+        if self._nodes is None:
+            self._load()
+            return
+        if time.monotonic() - self._checked_at >= VERSION_CHECK_INTERVAL:
+            self._check_version()
+
+    def _node(self, administration_id):
+        self._ensure_loaded()
+        node = self._nodes.get(administration_id)
+        if node is None and administration_id not in self._misses:
+            # may have been created by another process since the last
+            # check, unknown ids are remembered until the next reload
+            self._check_version()
+            node = self._nodes.get(administration_id)
+            if node is None:
+                self._misses.add(administration_id)
+        return node
+
+    def _bump_version(self):
+        TreeVersion = apps.get_model("v1_profile", "AdministrationTreeVersion")
+        self._nodes = None
+        self._names = {}
+        if not TreeVersion.objects.filter(pk=1).update(
+            version=F("version") + 1
+        ):
+            TreeVersion.objects.get_or_create(pk=1, defaults={"version": 1})
+
+    def invalidate(self):
+        self._nodes = None
+        self._names = {}
+        # other processes must not reload before the change is visible
+        transaction.on_commit(self._bump_version)
+
+    def get_name(self, administration_id):
+        node = self._node(administration_id)
+        return node[0] if node else None
+
+    def get_parent_id(self, administration_id):
+        node = self._node(administration_id)
+        return node[1] if node else None
+
+    def get_ancestor_ids(self, administration_id):
+        node = self._node(administration_id)
+        if not node or not node[2]:
+            return []
+        return [
+            int(p) for p in node[2].split(".")
+            if p and int(p) != administration_id
+        ]
+
+    def get_path_names(self, administration_id):
+        """
+        Names from the root down to the administration itself
+        """
+        # a reload after a version bump drops the memoised names
+        self._ensure_loaded()
+        names = self._names.get(administration_id)
+        if names is None:
+            node = self._node(administration_id)
+            if not node:
+                return []
+            names = [
+                self._nodes[pk][0]
+                for pk in self.get_ancestor_ids(administration_id)
+                if pk in self._nodes
+            ] + [node[0]]
+            self._names[administration_id] = names
+        return names
+
+    def get_full_name(self, administration_id):
+        return " - ".join(self.get_path_names(administration_id))
+
+    def get_full_path_name(self, administration_id):
+        return "|".join(self.get_path_names(administration_id))
+
+
+administration_tree = AdministrationTree()
@@ -50,7 +50,10 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from utils.email_helper import send_email, EmailTypes
 from utils.custom_serializer_fields import validate_serializers_message
-from utils.custom_generator import administration_csv_delete
+from utils.custom_generator import (
+    administration_csv_delete,
+    delete_sqlite,
+)
 from utils.custom_permissions import IsSuperAdmin
 
 
@@ -129,9 +132,9 @@ class AdministrationViewSet(ModelViewSet):
 
         if parent_id:
             if Administration.objects.filter(id=parent_id).exists():
-                parent = Administration.objects.only('path').get(id=parent_id)
                 queryset = queryset.filter(
-                    path__startswith=f"{parent.path or ''}{parent.id}."
+                    closure_ancestors__ancestor_id=parent_id,
+                    closure_ancestors__depth__gt=0,
                 )
 
         if level_id:
@@ -169,9 +172,11 @@ class AdministrationViewSet(ModelViewSet):
 
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
+        instance_id = instance.pk
         try:
             administration_csv_delete(id=instance.pk)
             instance.delete()
+            delete_sqlite(model=Administration, id=instance_id)
         except ProtectedError:
             _, _, _, protected = get_deleted_objects(
                 [instance], cast(WSGIRequest, request), site
@@ -229,11 +234,9 @@ class EntityDataViewSet(ModelViewSet):
         if adm_id:
             try:
                 adm_root = Administration.objects.get(id=adm_id)
-                adms = Administration.objects.filter(
-                    Q(path__startswith=f"{adm_root.path or ''}{adm_root.id}.")
-                    | Q(id=adm_root.id)
+                queryset = queryset.filter(
+                    administration__closure_ancestors__ancestor=adm_root
                 )
-                queryset = queryset.filter(administration__in=adms)
             except Administration.DoesNotExist:
                 pass
         if entity_id:
@@ -267,6 +270,11 @@ class EntityDataViewSet(ModelViewSet):
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
+    def perform_destroy(self, instance):
+        instance_id = instance.pk
+        instance.delete()
+        delete_sqlite(model=EntityData, id=instance_id)
+
 
 @extend_schema(
     tags=["File"],
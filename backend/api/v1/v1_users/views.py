@@ -57,6 +57,7 @@ from api.v1.v1_users.serializers import (
     UpdateProfileSerializer,
 )
 from mis.settings import REST_FRAMEWORK, WEBDOMAIN
+from utils.custom_generator import delete_sqlite
 from utils.custom_permissions import IsSuperAdmin
 from utils.custom_serializer_fields import validate_serializers_message
 from utils.default_serializers import DefaultResponseSerializer
@@ -478,29 +479,18 @@ def list_users(request, version):
 
     if serializer.validated_data.get("administration"):
         filter_adm = serializer.validated_data.get("administration")
-        filter_descendants = list(
-                Administration.objects.filter(
-                    parent=filter_adm
-                ).values_list("id", flat=True)
-            )
+        filter_descendants = Administration.objects.filter(
+            parent=filter_adm
+        ).values("id")
         if serializer.validated_data.get("descendants"):
-            filter_path = "{0}{1}.".format(
-                filter_adm.path, filter_adm.id
-            ) if filter_adm.path else f"{filter_adm.id}."
-            filter_descendants = list(
-                Administration.objects.filter(
-                    path__startswith=filter_path
-                ).values_list("id", flat=True)
-            )
-            filter_descendants.append(filter_adm.id)
+            filter_descendants = filter_adm.descendants.values("id")
 
-        final_set = set(filter_descendants)
         # If the administration is not national level
-        # then filter by final_set administration IDs
+        # then filter by the descendant administration IDs
         if filter_adm.level.level:
-            filter_data["user_user_role__administration_id__in"] = list(
-                final_set
-            )
+            filter_data[
+                "user_user_role__administration_id__in"
+            ] = filter_descendants
     if serializer.validated_data.get("trained") is not None:
         trained = (
             True
@@ -770,7 +760,9 @@ class OrganisationEditDeleteView(APIView):
     )
     def delete(self, request, organisation_id, version):
         instance = get_object_or_404(Organisation, pk=organisation_id)
+        instance_id = instance.pk
         instance.delete()
+        delete_sqlite(model=Organisation, id=instance_id)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @extend_schema(
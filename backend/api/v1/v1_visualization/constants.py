@@ -0,0 +1,34 @@
+class StatsBuckets:
+    day = "day"
+    week = "week"
+    month = "month"
+
+    FieldStr = {
+        day: "day",
+        week: "week",
+        month: "month",
+    }
+
+
+class StatsAggregates:
+    last = "last"
+    mean = "mean"
+    min = "min"
+    max = "max"
+    count = "count"
+
+    FieldStr = {
+        last: "last",
+        mean: "mean",
+        min: "min",
+        max: "max",
+        count: "count",
+    }
+
+
+# percentiles of the number aggregates when none are requested
+DEFAULT_PERCENTILES = [25, 75]
+
+# the map clusters never use more cells than this to cover the bbox
+MAP_COVER_CELLS = 64
+MAX_MAP_ZOOM = 22
@@ -0,0 +1,479 @@
+import json
+import hashlib
+from datetime import datetime, timedelta
+from collections import Counter
+from uuid import uuid4
+import numpy as np
+from dateutil import parser as date_parser
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import (
+    Avg,
+    Count,
+    FloatField,
+    Min,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+)
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Cast, Substr
+from api.v1.v1_data.constants import DataRollupStatus
+from api.v1.v1_data.models import Answers, FormData, FormDataRollup
+from api.v1.v1_data.pivot import get_pivot_question_column, get_pivot_table
+from api.v1.v1_forms.constants import QuestionTypes
+from api.v1.v1_forms.models import Questions
+from api.v1.v1_profile.models import AdministrationClosure
+from api.v1.v1_profile.tree import administration_tree
+from api.v1.v1_visualization.constants import (
+    StatsBuckets,
+    StatsAggregates,
+    DEFAULT_PERCENTILES,
+    MAP_COVER_CELLS,
+)
+from utils.geohash import get_bbox_cells, get_cell_size
+
+STATS_CACHE_TIMEOUT = 300
+STATS_VERSION_KEY = "formdata-stats-version-{0}"
+
+
+def invalidate_formdata_stats(parent_id):
+    cache.set(STATS_VERSION_KEY.format(parent_id), uuid4().hex, timeout=None)
+
+
+def get_stats_cache_key(parent_id, params: dict) -> str:
+    version = cache.get(STATS_VERSION_KEY.format(parent_id))
+    content = json.dumps(params, sort_keys=True, default=str)
+    digest = hashlib.md5(content.encode("utf-8")).hexdigest()
+    return f"formdata-stats-{parent_id}-{version}-{digest}"
+
+
+def parse_stats_date(value, default: datetime) -> datetime:
+    if not value:
+        return default
+    try:
+        return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%fZ")
+    except ValueError:
+        pass
+    try:
+        return date_parser.parse(value)
+    except (ValueError, OverflowError):
+        return default
+
+
+def get_bucket_date(date, bucket=None):
+    if bucket == StatsBuckets.week:
+        return date - timedelta(days=date.weekday())
+    if bucket == StatsBuckets.month:
+        return date.replace(day=1)
+    return date
+
+
+def to_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def get_stats_points(parent_id, question_ids, question_date=None):
+    """
+    Dated answers of the monitoring data of a parent datapoint, values
+    and dates of every child come from a single query
+    """
+    # soft deleted monitoring data is left out, like FormData.objects does
+    answers = Answers.objects.filter(
+        data__parent_id=parent_id,
+        data__deleted_at__isnull=True,
+        question_id__in=question_ids,
+    )
+    fields = ["data_id", "question_id", "name", "value", "options"]
+    fields.append("data__created")
+    if question_date:
+        answers = answers.annotate(
+            date_name=Subquery(
+                Answers.objects.filter(
+                    data_id=OuterRef("data_id"), question_id=question_date
+                )
+                .order_by("id")
+                .values("name")[:1]
+            )
+        )
+        fields.append("date_name")
+    points = []
+    seen = set()
+    for row in answers.order_by("data_id", "question_id", "id").values_list(
+        *fields
+    ):
+        data_id, question_id, name, value, options, created = row[:6]
+        # the first stored answer of a datapoint is used, as before
+        if (data_id, question_id) in seen:
+            continue
+        seen.add((data_id, question_id))
+        date = created
+        if question_date:
+            date = parse_stats_date(row[6], created)
+        # parsed dates and created may differ in awareness
+        date = date.replace(tzinfo=None)
+        points.append(
+            {
+                "question": question_id,
+                "datetime": date,
+                "value": name or value or options,
+            }
+        )
+    return points
+
+
+def aggregate_stats_values(points: list, aggregate: str):
+    if aggregate == StatsAggregates.count:
+        return len(points)
+    if aggregate == StatsAggregates.last:
+        return max(points, key=lambda p: p["datetime"])["value"]
+    values = [to_number(p["value"]) for p in points]
+    values = [v for v in values if v is not None]
+    if not values:
+        return None
+    if aggregate == StatsAggregates.mean:
+        return sum(values) / len(values)
+    if aggregate == StatsAggregates.min:
+        return min(values)
+    return max(values)
+
+
+def get_formdata_stats(
+    parent_id,
+    question_ids: list,
+    question_date=None,
+    bucket: str = None,
+    aggregate: str = None,
+) -> list:
+    """
+    Monitoring values of a parent datapoint as a list of date and
+    value items. With a bucket or an aggregate the values of each
+    question are grouped per day, week or month and reduced with the
+    aggregate function (last by default).
+    """
+    points = get_stats_points(parent_id, question_ids, question_date)
+    with_question = len(question_ids) > 1
+    if not bucket and not aggregate:
+        return [
+            {
+                **({"question": p["question"]} if with_question else {}),
+                "date": p["datetime"].date(),
+                "value": p["value"],
+            }
+            for p in points
+        ]
+    groups = {}
+    for point in points:
+        date = get_bucket_date(point["datetime"].date(), bucket)
+        groups.setdefault((point["question"], date), []).append(point)
+    stats = []
+    for (question_id, date), items in sorted(groups.items()):
+        stats.append(
+            {
+                **({"question": question_id} if with_question else {}),
+                "date": date,
+                "value": aggregate_stats_values(
+                    items, aggregate or StatsAggregates.last
+                ),
+            }
+        )
+    return stats
+
+
+def get_aggregate_answers(
+    question: Questions, level: int, administration_id: int = None
+):
+    """
+    Answers of the approved datapoints of a question, with the id of
+    the administration of the given level the datapoint belongs to.
+    The grouping is resolved through the administration closure table
+    so all the groups come from a single query.
+    """
+    answers = Answers.objects.filter(
+        question=question,
+        data__is_pending=False,
+        data__deleted_at__isnull=True,
+        data__administration__closure_ancestors__ancestor__level__level=level,
+    )
+    if administration_id:
+        answers = answers.filter(
+            data__administration_id__in=AdministrationClosure.objects.filter(
+                ancestor_id=administration_id
+            ).values("descendant_id")
+        )
+    column = "value"
+    if question.type in [QuestionTypes.option, QuestionTypes.multiple_option]:
+        column = "options"
+    return answers.values_list(
+        "data__administration__closure_ancestors__ancestor_id", column
+    )
+
+
+def get_pivot_aggregate_answers(
+    question: Questions, level: int, administration_id: int = None
+):
+    """
+    Same rows as get_aggregate_answers read from the pivot table of the
+    form, one row per approved datapoint instead of a join of the
+    answers. None when the question is not in a pivot table.
+    """
+    column = get_pivot_question_column(question)
+    if not column:
+        return None
+    params = [level]
+    administration_filter = ""
+    if administration_id:
+        administration_filter = (
+            "AND p.administration_id IN (SELECT descendant_id FROM "
+            "administration_closure WHERE ancestor_id = %s)"
+        )
+        params.append(administration_id)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT c.ancestor_id, p.{column}
+            FROM {get_pivot_table(question.form_id)} p
+            JOIN administration_closure c
+                ON c.descendant_id = p.administration_id
+            JOIN administrator a ON a.id = c.ancestor_id
+            JOIN levels l ON l.id = a.level_id
+            WHERE l.level = %s
+                AND p.{column} IS NOT NULL
+                {administration_filter}
+            """,
+            params,
+        )
+        rows = cursor.fetchall()
+    if question.type in [QuestionTypes.option, QuestionTypes.multiple_option]:
+        # raw cursors return jsonb undecoded
+        rows = [(group, json.loads(options)) for group, options in rows]
+    return rows
+
+
+def get_number_aggregates(rows, percentiles: list) -> list:
+    """
+    Count, sum, mean, median and percentiles of the values of each
+    administration, computed with NumPy over the sorted values
+    """
+    rows = [(group, value) for group, value in rows if value is not None]
+    if not rows:
+        return []
+    groups = np.array([group for group, _ in rows])
+    values = np.array([value for _, value in rows], dtype=float)
+    order = np.argsort(groups, kind="stable")
+    groups = groups[order]
+    values = values[order]
+    group_ids, starts, counts = np.unique(
+        groups, return_index=True, return_counts=True
+    )
+    sums = np.add.reduceat(values, starts)
+    aggregates = []
+    for group_id, group_values, total, count in zip(
+        group_ids, np.split(values, starts[1:]), sums, counts
+    ):
+        aggregates.append(
+            {
+                "administration": int(group_id),
+                "count": int(count),
+                "sum": float(total),
+                "mean": float(total / count),
+                "median": float(np.median(group_values)),
+                "percentiles": {
+                    f"{p:g}": float(v)
+                    for p, v in zip(
+                        percentiles, np.percentile(group_values, percentiles)
+                    )
+                },
+            }
+        )
+    return aggregates
+
+
+def get_option_aggregates(rows, question: Questions) -> list:
+    """
+    Number of answers and of answers per option of each administration
+    """
+    counts = {}
+    totals = Counter()
+    for group_id, options in rows:
+        totals[group_id] += 1
+        counts.setdefault(group_id, Counter()).update(options or [])
+    options = question.options.order_by("order", "id").values_list(
+        "value", "label"
+    )
+    return [
+        {
+            "administration": group_id,
+            "count": totals[group_id],
+            "options": [
+                {
+                    "value": value,
+                    "label": label,
+                    "count": counts[group_id][value],
+                }
+                for value, label in options
+            ],
+        }
+        for group_id in sorted(totals)
+    ]
+
+
+def get_administration_aggregates(
+    question: Questions,
+    level: int,
+    administration_id: int = None,
+    percentiles: list = None,
+) -> list:
+    rows = get_pivot_aggregate_answers(
+        question=question, level=level, administration_id=administration_id
+    )
+    if rows is None:
+        rows = get_aggregate_answers(
+            question=question,
+            level=level,
+            administration_id=administration_id,
+        )
+    if question.type == QuestionTypes.number:
+        aggregates = get_number_aggregates(
+            rows, percentiles or DEFAULT_PERCENTILES
+        )
+    else:
+        aggregates = get_option_aggregates(rows, question)
+    for aggregate in aggregates:
+        aggregate["name"] = administration_tree.get_name(
+            aggregate["administration"]
+        )
+    return aggregates
+
+
+def get_cluster_precision(zoom: int) -> int:
+    """
+    Geohash precision of the clusters of a map zoom level, about two
+    zoom levels per geohash character
+    """
+    return min(12, max(1, zoom // 2 + 1))
+
+
+def get_cover_cells(south, west, north, east, precision: int) -> list:
+    """
+    Coarsest useful geohash cells covering the bbox, the prefixes the
+    indexed geohash lookup starts from
+    """
+    while precision > 1:
+        lat_size, lng_size = get_cell_size(precision)
+        estimate = ((north - south) / lat_size + 2) * (
+            (east - west) / lng_size + 2
+        )
+        if estimate <= MAP_COVER_CELLS:
+            break
+        precision -= 1
+    return get_bbox_cells(south, west, north, east, precision)
+
+
+def get_map_clusters(
+    form_id: int,
+    bbox: list,
+    zoom: int,
+    administration_id: int = None,
+) -> list:
+    """
+    Number of approved datapoints per geohash cell inside the bbox
+    (south, west, north, east), the cell size follows the zoom level.
+    The centroid of the points of a cell places its marker, cells of a
+    single datapoint also return its id.
+    """
+    south, west, north, east = bbox
+    precision = get_cluster_precision(zoom)
+    cover = Q()
+    for cell in get_cover_cells(south, west, north, east, precision):
+        cover |= Q(geohash__startswith=cell)
+    queryset = FormData.objects.filter(
+        cover, form_id=form_id, is_pending=False, geohash__isnull=False
+    )
+    if administration_id:
+        queryset = queryset.filter(
+            administration_id__in=AdministrationClosure.objects.filter(
+                ancestor_id=administration_id
+            ).values("descendant_id")
+        )
+    clusters = (
+        queryset.annotate(
+            point_lat=Cast(KeyTextTransform("0", "geo"), FloatField()),
+            point_lng=Cast(KeyTextTransform("1", "geo"), FloatField()),
+        )
+        .filter(
+            point_lat__gte=south,
+            point_lat__lte=north,
+            point_lng__gte=west,
+            point_lng__lte=east,
+        )
+        .annotate(cell=Substr("geohash", 1, precision))
+        .values("cell")
+        .annotate(
+            count=Count("id"),
+            lat=Avg("point_lat"),
+            lng=Avg("point_lng"),
+            first_id=Min("id"),
+        )
+        .order_by("cell")
+    )
+    return [
+        {
+            "cell": cluster["cell"],
+            "count": cluster["count"],
+            "lat": cluster["lat"],
+            "lng": cluster["lng"],
+            "id": cluster["first_id"] if cluster["count"] == 1 else None,
+        }
+        for cluster in clusters
+    ]
+
+
+def get_submission_summary(
+    form_id: int, level: int, administration_id: int = None
+) -> list:
+    """
+    Number of pending and approved datapoints per administration of
+    the given level and month, summed from the rollup cells rather
+    than counted from the data
+    """
+    cells = FormDataRollup.objects.filter(
+        form_id=form_id,
+        administration__closure_ancestors__ancestor__level__level=level,
+    )
+    if administration_id:
+        cells = cells.filter(
+            administration_id__in=AdministrationClosure.objects.filter(
+                ancestor_id=administration_id
+            ).values("descendant_id")
+        )
+    rows = (
+        cells.values(
+            "administration__closure_ancestors__ancestor_id",
+            "period",
+            "status",
+        )
+        .annotate(total=Sum("count"))
+        .order_by()
+    )
+    summary = {}
+    for row in rows:
+        group = row["administration__closure_ancestors__ancestor_id"]
+        item = summary.setdefault(
+            (group, row["period"]),
+            {
+                "administration": group,
+                "period": row["period"],
+                **{name: 0 for name in DataRollupStatus.FieldStr.values()},
+            },
+        )
+        item[DataRollupStatus.FieldStr[row["status"]]] = row["total"]
+    items = [summary[key] for key in sorted(summary)]
+    for item in items:
+        item["name"] = administration_tree.get_name(item["administration"])
+        item["total"] = item["pending"] + item["approved"]
+    return items
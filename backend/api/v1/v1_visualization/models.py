@@ -0,0 +1,12 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from api.v1.v1_data.models import FormData
+from api.v1.v1_visualization.functions import invalidate_formdata_stats
+
+
+@receiver(post_save, sender=FormData)
+@receiver(post_delete, sender=FormData)
+def invalidate_monitoring_stats(sender, instance, **kwargs):
+    # cached stats of the parent datapoint include this monitoring data
+    if instance.parent_id:
+        invalidate_formdata_stats(instance.parent_id)
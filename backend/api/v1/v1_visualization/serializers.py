@@ -1,6 +1,148 @@
 from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from api.v1.v1_forms.constants import QuestionTypes
+from api.v1.v1_forms.models import Forms, Questions
+from api.v1.v1_profile.models import Administration, Levels
+from api.v1.v1_visualization.constants import (
+    StatsBuckets,
+    StatsAggregates,
+    MAX_MAP_ZOOM,
+)
+from utils.custom_serializer_fields import (
+    CustomIntegerField,
+    CustomPrimaryKeyRelatedField,
+)
 
 
 class FormDataStatSerializer(serializers.Serializer):
+    question = serializers.IntegerField(required=False)
     date = serializers.DateField()
     value = serializers.FloatField()
+
+
+class FormDataStatRequestSerializer(serializers.Serializer):
+    parent_id = serializers.IntegerField()
+    question_id = serializers.CharField()
+    question_date = serializers.IntegerField(required=False)
+    bucket = serializers.ChoiceField(
+        choices=list(StatsBuckets.FieldStr), required=False
+    )
+    aggregate = serializers.ChoiceField(
+        choices=list(StatsAggregates.FieldStr), required=False
+    )
+
+    def validate_question_id(self, value):
+        try:
+            return [int(v) for v in value.split(",") if v.strip()]
+        except ValueError:
+            raise serializers.ValidationError(
+                "question_id must be a comma separated list of ids"
+            )
+
+
+class AdministrationAggregateRequestSerializer(serializers.Serializer):
+    question = CustomPrimaryKeyRelatedField(
+        queryset=Questions.objects.filter(
+            type__in=[
+                QuestionTypes.number,
+                QuestionTypes.option,
+                QuestionTypes.multiple_option,
+            ]
+        ).all()
+    )
+    level = CustomIntegerField()
+    administration = CustomPrimaryKeyRelatedField(
+        queryset=Administration.objects.all(), required=False
+    )
+    percentiles = serializers.CharField(required=False)
+
+    def validate_level(self, value):
+        if not Levels.objects.filter(level=value).exists():
+            raise ValidationError("level is not valid")
+        return value
+
+    def validate_percentiles(self, value):
+        try:
+            percentiles = [float(v) for v in value.split(",") if v.strip()]
+        except ValueError:
+            percentiles = None
+        if not percentiles or any(p < 0 or p > 100 for p in percentiles):
+            raise ValidationError(
+                "percentiles must be a comma separated list of numbers "
+                "between 0 and 100"
+            )
+        return percentiles
+
+
+class AggregateOptionSerializer(serializers.Serializer):
+    value = serializers.CharField()
+    label = serializers.CharField()
+    count = serializers.IntegerField()
+
+
+class AdministrationAggregateSerializer(serializers.Serializer):
+    administration = serializers.IntegerField()
+    name = serializers.CharField()
+    count = serializers.IntegerField()
+    sum = serializers.FloatField(required=False)
+    mean = serializers.FloatField(required=False)
+    median = serializers.FloatField(required=False)
+    percentiles = serializers.DictField(
+        child=serializers.FloatField(), required=False
+    )
+    options = AggregateOptionSerializer(many=True, required=False)
+
+
+class MapClusterRequestSerializer(serializers.Serializer):
+    form = CustomPrimaryKeyRelatedField(queryset=Forms.objects.all())
+    bbox = serializers.CharField()
+    zoom = CustomIntegerField(min_value=0, max_value=MAX_MAP_ZOOM)
+    administration = CustomPrimaryKeyRelatedField(
+        queryset=Administration.objects.all(), required=False
+    )
+
+    def validate_bbox(self, value):
+        try:
+            bbox = [float(v) for v in value.split(",")]
+        except ValueError:
+            bbox = []
+        if len(bbox) != 4:
+            raise ValidationError(
+                "bbox must be south,west,north,east coordinates"
+            )
+        south, west, north, east = bbox
+        if not (-90 <= south <= north <= 90):
+            raise ValidationError("bbox latitudes are not valid")
+        if not (-180 <= west <= east <= 180):
+            raise ValidationError("bbox longitudes are not valid")
+        return bbox
+
+
+class MapClusterSerializer(serializers.Serializer):
+    cell = serializers.CharField()
+    count = serializers.IntegerField()
+    lat = serializers.FloatField()
+    lng = serializers.FloatField()
+    id = serializers.IntegerField(allow_null=True)
+
+
+class SubmissionSummaryRequestSerializer(serializers.Serializer):
+    form = CustomPrimaryKeyRelatedField(queryset=Forms.objects.all())
+    level = CustomIntegerField()
+    administration = CustomPrimaryKeyRelatedField(
+        queryset=Administration.objects.all(), required=False
+    )
+
+    def validate_level(self, value):
+        if not Levels.objects.filter(level=value).exists():
+            raise ValidationError("level is not valid")
+        return value
+
+
+class SubmissionSummarySerializer(serializers.Serializer):
+    administration = serializers.IntegerField()
+    name = serializers.CharField()
+    period = serializers.DateField(format="%Y-%m")
+    pending = serializers.IntegerField()
+    approved = serializers.IntegerField()
+    total = serializers.IntegerField()
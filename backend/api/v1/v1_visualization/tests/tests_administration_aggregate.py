@@ -0,0 +1,190 @@
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test.utils import override_settings
+from rest_framework.test import APITestCase
+from api.v1.v1_data.models import FormData, Answers
+from api.v1.v1_forms.models import Forms, Questions
+from api.v1.v1_profile.models import Administration
+from api.v1.v1_users.models import SystemUser
+
+
+@override_settings(USE_TZ=False, TEST_ENV=True)
+class AdministrationAggregateAPITest(APITestCase):
+    def setUp(self):
+        call_command("administration_seeder", "--test")
+        call_command("form_seeder", "--test")
+        self.user = SystemUser.objects.create_user(
+            email="test@test.org",
+            password="test1234",
+            first_name="test",
+            last_name="testing",
+        )
+        self.form = Forms.objects.get(pk=1)
+        self.number = Questions.objects.get(pk=109)
+        self.option = Questions.objects.get(pk=102)
+        self.multiple = Questions.objects.get(pk=106)
+        self.provinces = Administration.objects.filter(
+            level__level=1
+        ).order_by("id")
+        values = {
+            self.provinces[0]: [1, 2, 3, 4],
+            self.provinces[1]: [10, 20],
+        }
+        self.options = list(
+            self.option.options.order_by("order", "id").values_list(
+                "value", flat=True
+            )
+        )
+        self.multiple_options = list(
+            self.multiple.options.order_by("order", "id").values_list(
+                "value", flat=True
+            )
+        )
+        for province, numbers in values.items():
+            district = province.parent_administration.first()
+            for ix, number in enumerate(numbers):
+                data = FormData.objects.create(
+                    name=f"{province.name} {ix}",
+                    form=self.form,
+                    administration=district,
+                    created_by=self.user,
+                )
+                Answers.objects.create(
+                    data=data,
+                    question=self.number,
+                    value=number,
+                    created_by=self.user,
+                )
+                Answers.objects.create(
+                    data=data,
+                    question=self.option,
+                    options=[self.options[ix % 2]],
+                    created_by=self.user,
+                )
+                Answers.objects.create(
+                    data=data,
+                    question=self.multiple,
+                    options=self.multiple_options[:2],
+                    created_by=self.user,
+                )
+        # pending data is left out
+        pending = FormData.objects.create(
+            name="pending",
+            form=self.form,
+            administration=district,
+            created_by=self.user,
+            is_pending=True,
+        )
+        Answers.objects.create(
+            data=pending,
+            question=self.number,
+            value=1000,
+            created_by=self.user,
+        )
+
+    def get_aggregate(self, params: str):
+        return self.client.get(
+            f"/api/v1/visualization/administration-aggregate?{params}"
+        )
+
+    def test_number_aggregate(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get_aggregate(
+                f"question={self.number.id}&level=1&percentiles=50,90"
+            )
+        self.assertEqual(response.status_code, 200)
+        # every administration comes from the same answer query
+        self.assertEqual(
+            len([q for q in queries if 'FROM "answer"' in q["sql"]]), 1
+        )
+        self.assertEqual(
+            response.json(),
+            [
+                {
+                    "administration": self.provinces[0].id,
+                    "name": self.provinces[0].name,
+                    "count": 4,
+                    "sum": 10.0,
+                    "mean": 2.5,
+                    "median": 2.5,
+                    "percentiles": {"50": 2.5, "90": 3.7},
+                },
+                {
+                    "administration": self.provinces[1].id,
+                    "name": self.provinces[1].name,
+                    "count": 2,
+                    "sum": 30.0,
+                    "mean": 15.0,
+                    "median": 15.0,
+                    "percentiles": {"50": 15.0, "90": 19.0},
+                },
+            ],
+        )
+
+    def test_number_aggregate_of_a_subtree(self):
+        response = self.get_aggregate(
+            f"question={self.number.id}&level=0"
+            f"&administration={self.provinces[1].id}"
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data), 1)
+        self.assertEqual(data[0]["count"], 2)
+        self.assertEqual(data[0]["percentiles"], {"25": 12.5, "75": 17.5})
+
+    def test_option_aggregate(self):
+        response = self.get_aggregate(f"question={self.option.id}&level=1")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(
+            [d["administration"] for d in data],
+            [p.id for p in self.provinces],
+        )
+        self.assertEqual(data[0]["count"], 4)
+        counts = {o["value"]: o["count"] for o in data[0]["options"]}
+        self.assertEqual(counts[self.options[0]], 2)
+        self.assertEqual(counts[self.options[1]], 2)
+        self.assertEqual(sum(counts.values()), 4)
+
+        response = self.get_aggregate(f"question={self.multiple.id}&level=0")
+        data = response.json()
+        self.assertEqual(len(data), 1)
+        self.assertEqual(data[0]["count"], 6)
+        counts = [o["count"] for o in data[0]["options"]]
+        self.assertEqual(counts[:2], [6, 6])
+        self.assertEqual(sum(counts[2:]), 0)
+
+    def test_invalid_aggregate_request(self):
+        text = Questions.objects.get(pk=101)
+        response = self.get_aggregate(f"question={text.id}&level=1")
+        self.assertEqual(response.status_code, 400)
+        response = self.get_aggregate(f"question={self.number.id}&level=99")
+        self.assertEqual(response.status_code, 400)
+        response = self.get_aggregate(
+            f"question={self.number.id}&level=1&percentiles=150"
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_aggregate_from_pivot_table(self):
+        params = [
+            f"question={self.number.id}&level=1&percentiles=50,90",
+            f"question={self.number.id}&level=0"
+            f"&administration={self.provinces[1].id}",
+            f"question={self.option.id}&level=1",
+            f"question={self.multiple.id}&level=0",
+        ]
+        expected = [self.get_aggregate(p).json() for p in params]
+        call_command("build_answer_pivot", self.form.id, "--test")
+        for param, aggregate in zip(params, expected):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.get_aggregate(param)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), aggregate)
+            # read from the pivot table instead of the answers
+            self.assertFalse(
+                [q for q in queries if 'FROM "answer"' in q["sql"]]
+            )
+            self.assertTrue(
+                [q for q in queries if "answer_pivot_" in q["sql"]]
+            )
@@ -118,3 +118,108 @@ class FormDataStatsAPITest(APITestCase):
         url = "/api/v1/visualization/formdata-stats/"
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def add_monitoring_data(self, created, value):
+        data = FormData.objects.create(
+            parent=self.reg_data,
+            administration=self.administration,
+            created_by=self.user,
+            form=self.monitoring,
+        )
+        FormData.objects.filter(id=data.id).update(
+            created=make_aware(created)
+        )
+        Answers.objects.create(
+            value=value,
+            data=data,
+            question=self.question,
+            created_by=self.user,
+        )
+        return data
+
+    def test_stats_bucket_and_aggregate(self):
+        self.add_monitoring_data(datetime(2023, 8, 15), 5)
+        self.add_monitoring_data(datetime(2023, 9, 2), 7)
+        url = (
+            f"/api/v1/visualization/formdata-stats/"
+            f"?parent_id={self.reg_data.id}"
+            f"&question_id={self.question.id}"
+            f"&bucket=month"
+        )
+        response = self.client.get(f"{url}&aggregate=mean")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json(),
+            [
+                {"date": "01-08-2023", "value": 3},
+                {"date": "01-09-2023", "value": 7},
+            ],
+        )
+        response = self.client.get(f"{url}&aggregate=count")
+        self.assertEqual(
+            [d["value"] for d in response.json()], [2, 1]
+        )
+        # last by default
+        response = self.client.get(url)
+        self.assertEqual([d["value"] for d in response.json()], [5, 7])
+
+        response = self.client.get(f"{url}&aggregate=median")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_stats_multiple_questions(self):
+        url = (
+            f"/api/v1/visualization/formdata-stats/"
+            f"?parent_id={self.reg_data.id}"
+            f"&question_id={self.question.id},{self.date_question.id}"
+            f"&bucket=week&aggregate=count"
+        )
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # 2023-08-01 is a Tuesday, the week starts on Monday
+        self.assertEqual(
+            response.json(),
+            [
+                {"question": self.question.id, "date": "31-07-2023",
+                 "value": 1},
+                {"question": self.date_question.id, "date": "31-07-2023",
+                 "value": 1},
+            ],
+        )
+
+    def test_stats_query_count_and_cache(self):
+        for day in range(2, 12):
+            self.add_monitoring_data(datetime(2023, 8, day), day)
+        url = (
+            f"/api/v1/visualization/formdata-stats/"
+            f"?parent_id={self.reg_data.id}"
+            f"&question_id={self.question.id}"
+            f"&question_date={self.date_question.id}"
+        )
+        # the stats query and the request user lookup
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(len(response.json()), 11)
+        # served from the cache
+        with self.assertNumQueries(1):
+            self.client.get(url)
+        # new monitoring data invalidates the cached stats
+        self.add_monitoring_data(datetime(2023, 8, 20), 20)
+        response = self.client.get(url)
+        self.assertEqual(len(response.json()), 12)
+
+    def test_stats_without_deleted_monitoring_data(self):
+        deleted = self.add_monitoring_data(datetime(2023, 8, 2), 5)
+        deleted.delete()
+        self.assertTrue(
+            FormData.objects_with_deleted.filter(pk=deleted.id).exists()
+        )
+        url = (
+            f"/api/v1/visualization/formdata-stats/"
+            f"?parent_id={self.reg_data.id}"
+            f"&question_id={self.question.id}"
+        )
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json(), [{"date": "01-08-2023", "value": 1}]
+        )
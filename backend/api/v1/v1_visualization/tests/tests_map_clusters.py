@@ -0,0 +1,112 @@
+from django.core.management import call_command
+from django.test.utils import override_settings
+from rest_framework.test import APITestCase
+from api.v1.v1_data.models import FormData
+from api.v1.v1_forms.models import Forms
+from api.v1.v1_profile.models import Administration
+from api.v1.v1_users.models import SystemUser
+from utils.geohash import encode, get_bbox_cells
+
+
+@override_settings(USE_TZ=False, TEST_ENV=True)
+class MapClustersAPITest(APITestCase):
+    def setUp(self):
+        call_command("administration_seeder", "--test")
+        call_command("form_seeder", "--test")
+        self.user = SystemUser.objects.create_user(
+            email="test@test.org",
+            password="test1234",
+            first_name="test",
+            last_name="testing",
+        )
+        self.form = Forms.objects.get(pk=1)
+        self.administration = Administration.objects.filter(
+            level__level=2
+        ).first()
+        points = [
+            ([-6.20, 106.81], False),
+            ([-6.21, 106.82], False),
+            ([-6.22, 106.83], False),
+            ([-7.80, 110.36], False),
+            ([10.0, 10.0], False),
+            ([-6.20, 106.81], True),
+        ]
+        self.data = []
+        for ix, (geo, is_pending) in enumerate(points):
+            self.data.append(
+                FormData.objects.create(
+                    name=f"Point {ix}",
+                    form=self.form,
+                    administration=self.administration,
+                    geo=geo,
+                    created_by=self.user,
+                    is_pending=is_pending,
+                )
+            )
+
+    def get_clusters(self, params: str):
+        return self.client.get(
+            f"/api/v1/visualization/map-clusters?form={self.form.id}&{params}"
+        )
+
+    def test_geohash_is_kept_on_save(self):
+        self.assertEqual(encode(57.64911, 10.40744, 11), "u4pruydqqvj")
+        data = self.data[0]
+        self.assertEqual(data.geohash, encode(-6.20, 106.81))
+        data.geo = [-7.80, 110.36]
+        data.save()
+        data.refresh_from_db()
+        self.assertEqual(data.geohash, encode(-7.80, 110.36))
+        data.geo = ["not", "a point"]
+        data.save()
+        data.refresh_from_db()
+        self.assertIsNone(data.geohash)
+
+    def test_bbox_cells(self):
+        cells = get_bbox_cells(-8, 106, -6, 108, 3)
+        self.assertIn(encode(-7, 107, 3), cells)
+        self.assertIn(encode(-8, 106, 3), cells)
+        self.assertIn(encode(-6, 108, 3), cells)
+
+    def test_clusters_inside_the_bbox(self):
+        response = self.get_clusters("bbox=-9,105,-5,112&zoom=4")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(
+            [(d["cell"], d["count"]) for d in data],
+            sorted(
+                [
+                    (encode(-6.20, 106.81, 3), 3),
+                    (encode(-7.80, 110.36, 3), 1),
+                ]
+            ),
+        )
+        jakarta = [d for d in data if d["count"] == 3][0]
+        self.assertAlmostEqual(jakarta["lat"], -6.21)
+        self.assertAlmostEqual(jakarta["lng"], 106.82)
+        self.assertIsNone(jakarta["id"])
+        yogyakarta = [d for d in data if d["count"] == 1][0]
+        self.assertEqual(yogyakarta["id"], self.data[3].id)
+
+        # the world in the cells of the first geohash character
+        response = self.get_clusters("bbox=-90,-180,90,180&zoom=0")
+        self.assertEqual(
+            [(d["cell"], d["count"]) for d in response.json()],
+            [("q", 4), ("s", 1)],
+        )
+
+        # closer zoom levels split the cells
+        response = self.get_clusters("bbox=-6.3,106.7,-6.1,106.9&zoom=16")
+        self.assertEqual(
+            [d["count"] for d in response.json()], [1, 1, 1]
+        )
+
+    def test_invalid_clusters_request(self):
+        for params in [
+            "bbox=-9,105,-5&zoom=4",
+            "bbox=-5,105,-9,112&zoom=4",
+            "bbox=-9,105,-5,200&zoom=4",
+            "bbox=-9,105,-5,112&zoom=40",
+        ]:
+            response = self.get_clusters(params)
+            self.assertEqual(response.status_code, 400)
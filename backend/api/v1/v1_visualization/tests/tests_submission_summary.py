@@ -0,0 +1,111 @@
+from datetime import datetime
+from django.core.management import call_command
+from django.test.utils import override_settings
+from rest_framework.test import APITestCase
+from api.v1.v1_data.models import FormData
+from api.v1.v1_forms.models import Forms
+from api.v1.v1_profile.models import Administration
+from api.v1.v1_users.models import SystemUser
+
+
+@override_settings(USE_TZ=False, TEST_ENV=True)
+class SubmissionSummaryAPITest(APITestCase):
+    def setUp(self):
+        call_command("administration_seeder", "--test")
+        call_command("form_seeder", "--test")
+        user_payload = {"email": "admin@akvo.org", "password": "Test105*"}
+        user_response = self.client.post(
+            "/api/v1/login", user_payload, format="json"
+        )
+        self.token = user_response.json().get("token")
+        self.user = SystemUser.objects.get(email="admin@akvo.org")
+        self.form = Forms.objects.get(pk=1)
+        self.provinces = Administration.objects.filter(
+            level__level=1
+        ).order_by("id")
+        # (month, pending) of the datapoints of each province
+        datapoints = {
+            self.provinces[0]: [(5, False), (5, False), (5, True), (6, False)],
+            self.provinces[1]: [(6, True)],
+        }
+        self.data = []
+        for province, rows in datapoints.items():
+            district = province.parent_administration.first()
+            for month, is_pending in rows:
+                data = FormData.objects.create(
+                    name=f"{province.name} {month}",
+                    form=self.form,
+                    administration=district,
+                    created_by=self.user,
+                    is_pending=is_pending,
+                )
+                FormData.objects.filter(pk=data.id).update(
+                    created=datetime(2024, month, 10)
+                )
+                data.refresh_from_db()
+                self.data.append(data)
+        call_command("build_data_rollup", "--test")
+
+    def get_summary(self, params: str):
+        return self.client.get(
+            "/api/v1/visualization/submission-summary"
+            f"?form={self.form.id}&{params}"
+        )
+
+    def get_item(self, administration, month, pending, approved):
+        return {
+            "administration": administration.id,
+            "name": administration.name,
+            "period": f"2024-{month:02d}",
+            "pending": pending,
+            "approved": approved,
+            "total": pending + approved,
+        }
+
+    def test_summary_per_administration(self):
+        response = self.get_summary("level=1")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            [
+                self.get_item(self.provinces[0], 5, 1, 2),
+                self.get_item(self.provinces[0], 6, 0, 1),
+                self.get_item(self.provinces[1], 6, 1, 0),
+            ],
+        )
+        response = self.get_summary("level=0")
+        national = Administration.objects.get(level__level=0)
+        self.assertEqual(
+            response.json(),
+            [
+                self.get_item(national, 5, 1, 2),
+                self.get_item(national, 6, 1, 1),
+            ],
+        )
+
+    def test_summary_of_an_administration(self):
+        district = self.provinces[1].parent_administration.first()
+        response = self.get_summary(
+            f"level=2&administration={self.provinces[1].id}"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [self.get_item(district, 6, 1, 0)])
+
+    def test_summary_follows_deleted_data(self):
+        response = self.client.delete(
+            f"/api/v1/data/{self.data[0].id}",
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+        )
+        self.assertEqual(response.status_code, 204)
+        response = self.get_summary("level=1")
+        self.assertEqual(
+            response.json()[0], self.get_item(self.provinces[0], 5, 1, 1)
+        )
+
+    def test_invalid_params(self):
+        response = self.get_summary("level=99")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(
+            "/api/v1/visualization/submission-summary?level=2"
+        )
+        self.assertEqual(response.status_code, 400)
@@ -1,9 +1,26 @@
 from django.urls import re_path
-from api.v1.v1_visualization.views import formdata_stats
+from api.v1.v1_visualization.views import (
+    administration_aggregate,
+    formdata_stats,
+    map_clusters,
+    submission_summary,
+)
 
 urlpatterns = [
     re_path(
         r"^(?P<version>(v1))/visualization/formdata-stats",
         formdata_stats,
     ),
+    re_path(
+        r"^(?P<version>(v1))/visualization/administration-aggregate",
+        administration_aggregate,
+    ),
+    re_path(
+        r"^(?P<version>(v1))/visualization/map-clusters",
+        map_clusters,
+    ),
+    re_path(
+        r"^(?P<version>(v1))/visualization/submission-summary",
+        submission_summary,
+    ),
 ]
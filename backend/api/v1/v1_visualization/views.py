@@ -1,11 +1,29 @@
+from django.core.cache import cache
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
-from datetime import datetime
-from api.v1.v1_data.models import FormData, Answers
-from api.v1.v1_visualization.serializers import FormDataStatSerializer
+from api.v1.v1_visualization.constants import StatsBuckets, StatsAggregates
+from api.v1.v1_visualization.functions import (
+    STATS_CACHE_TIMEOUT,
+    get_administration_aggregates,
+    get_formdata_stats,
+    get_map_clusters,
+    get_stats_cache_key,
+    get_submission_summary,
+)
+from api.v1.v1_visualization.serializers import (
+    FormDataStatSerializer,
+    FormDataStatRequestSerializer,
+    AdministrationAggregateSerializer,
+    AdministrationAggregateRequestSerializer,
+    MapClusterSerializer,
+    MapClusterRequestSerializer,
+    SubmissionSummarySerializer,
+    SubmissionSummaryRequestSerializer,
+)
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
+from utils.custom_serializer_fields import validate_serializers_message
 
 
 @extend_schema(
@@ -23,9 +41,10 @@ from drf_spectacular.types import OpenApiTypes
         OpenApiParameter(
             name="question_id",
             required=True,
-            type=OpenApiTypes.NUMBER,
+            type=OpenApiTypes.STR,
             location=OpenApiParameter.QUERY,
-            description="The question ID to extract the value from",
+            description="The question ID to extract the value from, "
+            "several comma separated IDs add the question to each item",
         ),
         OpenApiParameter(
             name="question_date",
@@ -34,57 +53,219 @@ from drf_spectacular.types import OpenApiTypes
             location=OpenApiParameter.QUERY,
             description="the question to extract the date from (optional)",
         ),
+        OpenApiParameter(
+            name="bucket",
+            required=False,
+            type=OpenApiTypes.STR,
+            enum=StatsBuckets.FieldStr.values(),
+            location=OpenApiParameter.QUERY,
+            description="Group the values per day, week or month",
+        ),
+        OpenApiParameter(
+            name="aggregate",
+            required=False,
+            type=OpenApiTypes.STR,
+            enum=StatsAggregates.FieldStr.values(),
+            location=OpenApiParameter.QUERY,
+            description="Function applied to each group, last by default",
+        ),
     ],
 )
 @api_view(["GET"])
 def formdata_stats(request, version):
-    parent_id = request.query_params.get("parent_id")
-    question_id = request.query_params.get("question_id")
-    question_date_key = request.query_params.get("question_date")
-
-    if not parent_id or not question_id:
+    serializer = FormDataStatRequestSerializer(data=request.query_params)
+    if not serializer.is_valid():
         return Response(
-            {"detail": "Missing required parameters."},
+            {"message": validate_serializers_message(serializer.errors)},
             status=status.HTTP_400_BAD_REQUEST,
         )
+    params = serializer.validated_data
+    parent_id = params.get("parent_id")
+    cache_key = get_stats_cache_key(parent_id, params)
+    data = cache.get(cache_key)
+    if data is not None:
+        return Response(data, status=status.HTTP_200_OK)
 
     try:
-        formdata_qs = FormData.objects.filter(parent_id=parent_id)
-        stats = []
+        stats = get_formdata_stats(
+            parent_id=parent_id,
+            question_ids=params.get("question_id"),
+            question_date=params.get("question_date"),
+            bucket=params.get("bucket"),
+            aggregate=params.get("aggregate"),
+        )
+        data = FormDataStatSerializer(stats, many=True).data
+        cache.set(cache_key, data, timeout=STATS_CACHE_TIMEOUT)
+        return Response(data, status=status.HTTP_200_OK)
 
-        for formdata in formdata_qs:
-            answer = Answers.objects.filter(
-                data=formdata, question_id=question_id
-            ).first()
-            if not answer:
-                continue
+    except Exception as e:
+        return Response(
+            {"detail": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
 
-            # Default date
-            date = formdata.created
 
-            # Optional override from another question
-            if question_date_key:
-                date_answer = Answers.objects.filter(
-                    data=formdata, question_id=question_date_key
-                ).first()
-                if date_answer and date_answer.name:
-                    parsed_date = datetime.strptime(
-                        date_answer.name, "%Y-%m-%dT%H:%M:%S.%fZ"
-                    )
-                    if parsed_date:
-                        date = parsed_date
+@extend_schema(
+    description="Option counts or number statistics of a question, "
+    "grouped by the administrations of a level",
+    tags=["Visualization"],
+    responses=AdministrationAggregateSerializer(many=True),
+    parameters=[
+        OpenApiParameter(
+            name="question",
+            required=True,
+            type=OpenApiTypes.NUMBER,
+            location=OpenApiParameter.QUERY,
+            description="Number, option or multiple option question ID",
+        ),
+        OpenApiParameter(
+            name="level",
+            required=True,
+            type=OpenApiTypes.NUMBER,
+            location=OpenApiParameter.QUERY,
+            description="Administration level to group the answers by",
+        ),
+        OpenApiParameter(
+            name="administration",
+            required=False,
+            type=OpenApiTypes.NUMBER,
+            location=OpenApiParameter.QUERY,
+            description="Only include the data of this administration",
+        ),
+        OpenApiParameter(
+            name="percentiles",
+            required=False,
+            type=OpenApiTypes.STR,
+            location=OpenApiParameter.QUERY,
+            description="Comma separated percentiles of the number "
+            "questions, 25,75 by default",
+        ),
+    ],
+)
+@api_view(["GET"])
+def administration_aggregate(request, version):
+    serializer = AdministrationAggregateRequestSerializer(
+        data=request.query_params
+    )
+    if not serializer.is_valid():
+        return Response(
+            {"message": validate_serializers_message(serializer.errors)},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    params = serializer.validated_data
+    administration = params.get("administration")
+    aggregates = get_administration_aggregates(
+        question=params["question"],
+        level=params["level"],
+        administration_id=administration.id if administration else None,
+        percentiles=params.get("percentiles"),
+    )
+    return Response(
+        AdministrationAggregateSerializer(aggregates, many=True).data,
+        status=status.HTTP_200_OK,
+    )
+
 
-            stats.append(
-                {
-                    "date": date.date(),
-                    "value": answer.name or answer.value or answer.options,
-                }
-            )
+@extend_schema(
+    description="Number of datapoints per map grid cell inside a bbox, "
+    "the cells get smaller as the zoom level grows",
+    tags=["Visualization"],
+    responses=MapClusterSerializer(many=True),
+    parameters=[
+        OpenApiParameter(
+            name="form",
+            required=True,
+            type=OpenApiTypes.NUMBER,
+            location=OpenApiParameter.QUERY,
+        ),
+        OpenApiParameter(
+            name="bbox",
+            required=True,
+            type=OpenApiTypes.STR,
+            location=OpenApiParameter.QUERY,
+            description="south,west,north,east coordinates",
+        ),
+        OpenApiParameter(
+            name="zoom",
+            required=True,
+            type=OpenApiTypes.NUMBER,
+            location=OpenApiParameter.QUERY,
+            description="Map zoom level",
+        ),
+        OpenApiParameter(
+            name="administration",
+            required=False,
+            type=OpenApiTypes.NUMBER,
+            location=OpenApiParameter.QUERY,
+            description="Only include the data of this administration",
+        ),
+    ],
+)
+@api_view(["GET"])
+def map_clusters(request, version):
+    serializer = MapClusterRequestSerializer(data=request.query_params)
+    if not serializer.is_valid():
+        return Response(
+            {"message": validate_serializers_message(serializer.errors)},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    params = serializer.validated_data
+    administration = params.get("administration")
+    clusters = get_map_clusters(
+        form_id=params["form"].id,
+        bbox=params["bbox"],
+        zoom=params["zoom"],
+        administration_id=administration.id if administration else None,
+    )
+    return Response(
+        MapClusterSerializer(clusters, many=True).data,
+        status=status.HTTP_200_OK,
+    )
 
-        serializer = FormDataStatSerializer(stats, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
 
-    except Exception as e:
+@extend_schema(
+    description="Number of pending and approved datapoints of a form per "
+    "administration of a level and month",
+    tags=["Visualization"],
+    responses=SubmissionSummarySerializer(many=True),
+    parameters=[
+        OpenApiParameter(
+            name="form",
+            required=True,
+            type=OpenApiTypes.NUMBER,
+            location=OpenApiParameter.QUERY,
+        ),
+        OpenApiParameter(
+            name="level",
+            required=True,
+            type=OpenApiTypes.NUMBER,
+            location=OpenApiParameter.QUERY,
+            description="Administration level to group the datapoints by",
+        ),
+        OpenApiParameter(
+            name="administration",
+            required=False,
+            type=OpenApiTypes.NUMBER,
+            location=OpenApiParameter.QUERY,
+            description="Only include the data of this administration",
+        ),
+    ],
+)
+@api_view(["GET"])
+def submission_summary(request, version):
+    serializer = SubmissionSummaryRequestSerializer(data=request.query_params)
+    if not serializer.is_valid():
         return Response(
-            {"detail": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            {"message": validate_serializers_message(serializer.errors)},
+            status=status.HTTP_400_BAD_REQUEST,
         )
+    params = serializer.validated_data
+    administration = params.get("administration")
+    summary = get_submission_summary(
+        form_id=params["form"].id,
+        level=params["level"],
+        administration_id=administration.id if administration else None,
+    )
+    return Response(
+        SubmissionSummarySerializer(summary, many=True).data,
+        status=status.HTTP_200_OK,
+    )
@@ -257,6 +257,13 @@ Q_CLUSTER = {
     "orm": "default",
 }
 
+# seconds the datapoint JSON writes of the same uuid are coalesced
+DATA_PUBLISH_WINDOW = int(environ.get("DATA_PUBLISH_WINDOW", 10))
+
+# data downloads above this many rows are rendered per child
+# administration on the cluster, then merged
+DATA_EXPORT_SHARD_ROWS = int(environ.get("DATA_EXPORT_SHARD_ROWS", 50000))
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -43,7 +43,7 @@ if [[ "${seed_administration_attribute}" == 'y' || "${seed_administration_attrib
     python manage.py administration_attribute_seeder
 fi
 
-python manage.py generate_sqlite
+python manage.py generate_sqlite --reset
 
 # python manage.py fake_approver_seeder
 # python manage.py fake_data_seeder
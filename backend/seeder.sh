@@ -55,5 +55,5 @@ if [[ "${seed_entities}" == 'y' || "${seed_entities}" == 'Y' ]]; then
     python manage.py entities_seeder
 fi
 
-python manage.py generate_sqlite
+python manage.py generate_sqlite --reset
 python manage.py generate_config
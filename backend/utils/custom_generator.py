@@ -1,55 +1,219 @@
 import os
+import json
+import hashlib
 import sqlite3
+from itertools import islice
 import pandas as pd
 import logging
 from django.conf import settings
 from mis.settings import MASTER_DATA, STORAGE_PATH, COUNTRY_NAME
-from api.v1.v1_profile.models import Administration
+from api.v1.v1_data.functions import get_sync_horizon
+from api.v1.v1_mobile.models import MasterDataChange, MasterDataBuild
+from api.v1.v1_profile.models import (
+    Administration,
+    AdministrationClosure,
+    Entity,
+    EntityData,
+)
+from api.v1.v1_profile.tree import administration_tree
+from api.v1.v1_users.models import Organisation
 
 logger = logging.getLogger(__name__)
 
+SQLITE_MODELS = {
+    m._meta.db_table: m
+    for m in [Administration, Organisation, Entity, EntityData]
+}
+# more changed rows than this and the device downloads the whole file
+SQLITE_PATCH_LIMIT = 1000
+SQLITE_CHUNK_SIZE = 2000
+SQLITE_PAGE_SIZE = 4096
+SQLITE_INTEGER_FIELDS = [
+    "AutoField",
+    "BigAutoField",
+    "IntegerField",
+    "BigIntegerField",
+    "SmallIntegerField",
+    "PositiveIntegerField",
+    "PositiveSmallIntegerField",
+    "BooleanField",
+]
 
-def generate_sqlite(model, test: bool = False):
+
+def get_sqlite_version() -> int:
+    """
+    Version of master data read from now on. Changes are logged with
+    the id of their transaction, which is handed out before it commits,
+    so a file or patch is versioned on the oldest transaction still in
+    progress: every change logged before it is visible already.
+    """
+    return get_sync_horizon()
+
+
+def log_sqlite_change(model, record_id=None) -> None:
+    """
+    Record a changed row of a master data file, without a record id the
+    whole table was changed.
+    """
+    MasterDataChange.objects.create(
+        table=model._meta.db_table, record_id=record_id
+    )
+
+
+def save_sqlite_build(model, version: int, checksum: str) -> None:
+    """
+    Record the version and checksum of a rebuilt master data file. Rows
+    that differ from the last build while no change was logged since
+    were changed without being logged, the table is then logged as
+    rebuilt so that devices download the whole file instead of keeping
+    their copy.
+    """
+    table_name = model._meta.db_table
+    build = MasterDataBuild.objects.filter(table=table_name).first()
+    if (
+        build
+        and build.checksum != checksum
+        and not MasterDataChange.objects.filter(
+            table=table_name, txid__gte=build.version
+        ).exists()
+    ):
+        logger.warning(f"Unlogged changes in {table_name}, rebuilt")
+        log_sqlite_change(model)
+    if not build:
+        build = MasterDataBuild(table=table_name)
+    build.version = version
+    build.checksum = checksum
+    build.save()
+
+
+def get_sqlite_columns(model) -> list:
+    """
+    Columns of the nodes table of a master data file with their SQLite
+    types
+    """
+    columns = []
+    for field in model._meta.fields:
+        internal_type = field.get_internal_type()
+        if field.is_relation or internal_type in SQLITE_INTEGER_FIELDS:
+            columns.append((field.name, "INTEGER"))
+        elif internal_type in ["FloatField", "DecimalField"]:
+            columns.append((field.name, "REAL"))
+        else:
+            columns.append((field.name, "TEXT"))
+    # Add full_path_name for Administration model
+    if model.__name__ == "Administration":
+        columns.append(("full_path_name", "TEXT"))
+    if "parent" not in dict(columns):
+        columns.append(("parent", "INTEGER"))
+    return columns
+
+
+def iter_sqlite_rows(model, ids=None):
+    """
+    Rows of the nodes table of a master data file, read with a server
+    side cursor. Full path names come from the in-memory tree.
+    """
+    field_names = [f.name for f in model._meta.fields]
+    objects = model.objects.order_by("id")
+    if ids is not None:
+        objects = objects.filter(pk__in=ids)
+    id_index = field_names.index("id")
+    parent_index = None
+    for name in ["parent", "administration"]:
+        if name in field_names:
+            parent_index = field_names.index(name)
+            break
+    is_administration = model.__name__ == "Administration"
+    for values in objects.values_list(*field_names).iterator(
+        chunk_size=SQLITE_CHUNK_SIZE
+    ):
+        row = list(values)
+        if is_administration:
+            row.append(administration_tree.get_full_name(row[id_index]))
+        parent = row[parent_index] if parent_index is not None else None
+        if "parent" in field_names:
+            row[parent_index] = parent or 0
+        else:
+            row.append(parent or 0)
+        yield row
+
+
+def get_sqlite_nodes(model, ids=None) -> list:
+    """
+    Rows of the nodes table of a master data file
+    """
+    columns = [name for name, _ in get_sqlite_columns(model)]
+    return [dict(zip(columns, row)) for row in iter_sqlite_rows(model, ids)]
+
+
+def generate_sqlite(model, test: bool = False, reset: bool = False):
+    """
+    Build the master data file of a model, the file is stamped with its
+    version in the SQLite user_version. Pass reset when the rows were
+    changed without being logged, devices then download the whole file.
+    Rows that differ from the last build at the same version are
+    treated as a reset as well.
+    """
     if not test:
         test = settings.TEST_ENV
     table_name = model._meta.db_table
-    field_names = [f.name for f in model._meta.fields]
-    objects = model.objects.all()
     file_name = "{0}/{1}{2}.sqlite".format(
         MASTER_DATA,
         "test_" if test else "",
         table_name,
     )
-    if os.path.exists(file_name):
-        os.remove(file_name)
-    data = pd.DataFrame(list(objects.values(*field_names)))
-    no_rows = data.shape[0]
+    if reset:
+        log_sqlite_change(model)
+    # taken before the rows are read, changes committed meanwhile are
+    # sent again in the next patch
+    version = get_sqlite_version()
+    checksum = hashlib.sha256()
+    columns = get_sqlite_columns(model)
+    column_names = [name for name, _ in columns]
+    # written next to the file and moved over it once complete, devices
+    # never download a half written file
+    tmp_file_name = f"{file_name}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_file_name):
+        os.remove(tmp_file_name)
+    conn = sqlite3.connect(tmp_file_name)
+    try:
+        conn.execute(f"PRAGMA page_size = {SQLITE_PAGE_SIZE}")
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        no_rows = 0
+        with conn:
+            conn.execute(
+                "CREATE TABLE nodes ({0})".format(
+                    ", ".join(f'"{name}" {type}' for name, type in columns)
+                )
+            )
+            query = "INSERT INTO nodes ({0}) VALUES ({1})".format(
+                ", ".join(f'"{name}"' for name in column_names),
+                ", ".join(["?"] * len(column_names)),
+            )
+            rows = iter_sqlite_rows(model)
+            while True:
+                chunk = list(islice(rows, SQLITE_CHUNK_SIZE))
+                if not chunk:
+                    break
+                conn.executemany(query, chunk)
+                checksum.update(json.dumps(chunk, default=str).encode())
+                no_rows += len(chunk)
+            conn.execute("CREATE INDEX nodes_parent ON nodes (parent)")
+            if "name" in column_names:
+                conn.execute("CREATE INDEX nodes_name ON nodes (name)")
+            save_sqlite_build(model, version, checksum.hexdigest())
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+        if no_rows:
+            conn.execute("VACUUM")
+    finally:
+        conn.close()
     if no_rows < 1:
+        os.remove(tmp_file_name)
+        if os.path.exists(file_name):
+            os.remove(file_name)
         return
-    # Add full_path_name for Administration model
-    if model.__name__ == "Administration":
-        # Get all Administration objects with their full_path_name property
-        full_path_names = {
-            obj.id: obj.full_path_name.replace("|", " - ") for obj in objects
-        }
-        # Add the full_path_name column to the DataFrame
-        data["full_path_name"] = data["id"].apply(
-            lambda id_: full_path_names.get(id_, "")
-        )
-
-    if "parent" in field_names:
-        data["parent"] = data["parent"].apply(
-            lambda x: int(x) if x == x else 0
-        )
-    elif "administration" in field_names:
-        data["parent"] = data["administration"].apply(
-            lambda x: int(x) if x == x else 0
-        )
-    else:
-        data["parent"] = 0
-    conn = sqlite3.connect(file_name)
-    data.to_sql("nodes", conn, if_exists="replace", index=False)
-    conn.close()
+    os.replace(tmp_file_name, file_name)
     return file_name
 
 
@@ -63,6 +227,8 @@ def update_sqlite(model, data, id=None):
     params = list(data.values())
     if id:
         params += [id]
+    # the row change is logged when it is saved, the file keeps the
+    # version it was built at and the change is sent again in a patch
     file_name = "{0}/{1}{2}.sqlite".format(
         MASTER_DATA,
         "test_" if test else "",
@@ -88,6 +254,69 @@ def update_sqlite(model, data, id=None):
         conn.close()
 
 
+def delete_sqlite(model, id):
+    test = settings.TEST_ENV
+    file_name = "{0}/{1}{2}.sqlite".format(
+        MASTER_DATA,
+        "test_" if test else "",
+        model._meta.db_table,
+    )
+    conn = sqlite3.connect(file_name)
+    try:
+        with conn:
+            conn.execute("DELETE FROM nodes WHERE id = ?", (id,))
+    except sqlite3.OperationalError:
+        generate_sqlite(model=model, test=test)
+    finally:
+        conn.close()
+
+
+def get_sqlite_patch(model, version: int) -> dict:
+    """
+    Rows of a master data file to upsert and ids to delete to bring a
+    device from its version to the latest one. When the table was
+    rebuilt since the file of the device, or too many rows changed, the
+    device has to download the whole file again.
+    """
+    table_name = model._meta.db_table
+    # taken before the changes are read, a change that commits later
+    # has a transaction id from here on and is in the next patch
+    latest = get_sqlite_version()
+    patch = {"version": latest, "full": False, "upserts": [], "deletes": []}
+    if version < 1 or version > latest:
+        patch["full"] = True
+        return patch
+    ids = set(
+        MasterDataChange.objects.filter(
+            table=table_name, txid__gte=version
+        ).values_list("record_id", flat=True)
+    )
+    if None in ids:
+        # a rebuild logged while the latest file was read is in it
+        build_version = (
+            MasterDataBuild.objects.filter(table=table_name)
+            .values_list("version", flat=True)
+            .first()
+        )
+        if build_version is None or version < build_version:
+            patch["full"] = True
+            return patch
+        ids.discard(None)
+    if ids and model.__name__ == "Administration":
+        # the full path names of the descendants change with the name
+        ids = set(
+            AdministrationClosure.objects.filter(
+                ancestor_id__in=ids
+            ).values_list("descendant_id", flat=True)
+        ) | ids
+    if len(ids) > SQLITE_PATCH_LIMIT:
+        patch["full"] = True
+        return patch
+    patch["upserts"] = get_sqlite_nodes(model, ids=ids)
+    patch["deletes"] = sorted(ids - {n["id"] for n in patch["upserts"]})
+    return patch
+
+
 def administration_csv_add(data: dict):
     test = settings.TEST_ENV
     filename = "{0}-administration.csv".format(
@@ -1,6 +1,20 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from hashlib import md5
+from math import ceil
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
 
+from mis.settings import REST_FRAMEWORK
+
+# seconds a total count is reused by the cursor pagination
+COUNT_CACHE_TIMEOUT = 60
+
 
 class Pagination(PageNumberPagination):
     page_size = 10
@@ -36,3 +50,107 @@ class Pagination(PageNumberPagination):
                 "data": schema,
             },
         }
+
+
+def count_cache_key(queryset):
+    sql = str(queryset.query)
+    database = connection.settings_dict.get("NAME")
+    return "count-{0}".format(
+        md5(f"{database}:{sql}".encode("utf-8")).hexdigest()
+    )
+
+
+def get_cached_count(queryset, timeout=COUNT_CACHE_TIMEOUT):
+    key = count_cache_key(queryset)
+    total = cache.get(key)
+    if total is None:
+        total = queryset.count()
+        cache.set(key, total, timeout=timeout)
+    return total
+
+
+class KeysetPagination(PageNumberPagination):
+    """
+    Page number pagination that switches to keyset (cursor) mode when
+    the request carries a `cursor` parameter (empty for the first
+    page). In cursor mode rows are fetched with a WHERE on the
+    ordering fields instead of an OFFSET, so deep pages cost the same
+    as the first one, and the total is a cached count.
+    """
+
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def __init__(self, ordering=("-created", "-id")):
+        self.ordering = list(ordering)
+        self.page_size = REST_FRAMEWORK.get("PAGE_SIZE")
+        self.cursor_mode = False
+        self.queryset = None
+        self.current = None
+        self.next_cursor = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.queryset = queryset
+        if self.cursor_query_param not in request.query_params:
+            self.current = int(request.query_params.get("page", "1"))
+            return super().paginate_queryset(queryset, request, view)
+        self.cursor_mode = True
+        self.current = request.query_params.get(self.cursor_query_param)
+        queryset = queryset.order_by(*self.ordering)
+        if self.current:
+            queryset = queryset.filter(
+                self.get_cursor_filter(queryset.model, self.current)
+            )
+        rows = list(queryset[: self.page_size + 1])
+        if len(rows) > self.page_size:
+            rows = rows[: self.page_size]
+            self.next_cursor = self.encode_cursor(rows[-1])
+        return rows
+
+    def get_fields(self):
+        return [o.lstrip("-") for o in self.ordering]
+
+    def encode_cursor(self, instance):
+        values = [
+            getattr(instance, field) for field in self.get_fields()
+        ]
+        values = [
+            v.isoformat() if hasattr(v, "isoformat") else v for v in values
+        ]
+        return urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def get_cursor_filter(self, model, cursor):
+        fields = self.get_fields()
+        try:
+            values = json.loads(urlsafe_b64decode(cursor.encode()))
+            values = [
+                model._meta.get_field(field).to_python(value)
+                for field, value in zip(fields, values)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+        if len(values) != len(fields):
+            raise NotFound(self.invalid_cursor_message)
+        # rows strictly after the cursor in the lexicographic ordering
+        criteria = Q()
+        for ix, order in enumerate(self.ordering):
+            lookup = "lt" if order.startswith("-") else "gt"
+            condition = Q(**{f"{fields[ix]}__{lookup}": values[ix]})
+            for field, value in zip(fields[:ix], values[:ix]):
+                condition &= Q(**{field: value})
+            criteria |= condition
+        return criteria
+
+    def get_page_info(self):
+        if self.cursor_mode:
+            return {
+                "cursor": self.current or None,
+                "next": self.next_cursor,
+                "total": get_cached_count(self.queryset),
+            }
+        total = self.page.paginator.count
+        return {
+            "current": self.current,
+            "total": total,
+            "total_page": ceil(total / self.page_size),
+        }
@@ -0,0 +1,32 @@
+import io
+import zlib
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+# limit of a decompressed request body
+MAX_DECOMPRESSED_SIZE = 64 * 1024 * 1024
+
+
+class GzipJSONParser(JSONParser):
+    """
+    JSON parser that also accepts gzip compressed bodies, sent with the
+    Content-Encoding: gzip header
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = (parser_context or {}).get("request")
+        encoding = ""
+        if request is not None:
+            encoding = request.META.get("HTTP_CONTENT_ENCODING", "")
+        if encoding.lower() == "gzip":
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            try:
+                body = decompressor.decompress(
+                    stream.read(), MAX_DECOMPRESSED_SIZE
+                )
+            except zlib.error as e:
+                raise ParseError(f"Gzip parse error - {e}")
+            if decompressor.unconsumed_tail:
+                raise ParseError("Decompressed body is too large")
+            stream = io.BytesIO(body)
+        return super().parse(stream, media_type, parser_context)
@@ -96,7 +96,7 @@ def get_definition(form: Forms):
     return framed
 
 
-def generate_definition_sheet(form: Forms, writer: pd.ExcelWriter):
+def get_definition_frames(form: Forms):
     definitions = get_definition(form=form)
     df = pd.DataFrame(definitions)
     question_columns = [
@@ -109,7 +109,6 @@ def generate_definition_sheet(form: Forms, writer: pd.ExcelWriter):
     ]
     df_questions = df[question_columns]
     df_questions = df_questions.drop_duplicates()
-    df_questions.to_excel(writer, sheet_name="questions", index=False)
     df_options = df[["name", "option", "option_label"]]
     df_options = df_options.dropna(subset=["option"])
     df_options = df_options.drop_duplicates()
@@ -120,9 +119,40 @@ def generate_definition_sheet(form: Forms, writer: pd.ExcelWriter):
             "option_label": "label",
         }
     )
+    return df_questions, df_options
+
+
+def generate_definition_sheet(form: Forms, writer: pd.ExcelWriter):
+    df_questions, df_options = get_definition_frames(form=form)
+    df_questions.to_excel(writer, sheet_name="questions", index=False)
     df_options.to_excel(writer, sheet_name="options", index=False)
 
 
+def write_sheet_rows(worksheet, columns: list, rows, header_format=None):
+    """
+    Write the header and rows strictly in row order, as required by
+    workbooks opened in xlsxwriter's constant_memory mode
+    """
+    worksheet.write_row(0, 0, columns, header_format)
+    total = 0
+    for total, row in enumerate(rows, start=1):
+        worksheet.write_row(total, 0, row)
+    return total
+
+
+def write_definition_sheets(form: Forms, workbook, header_format=None):
+    df_questions, df_options = get_definition_frames(form=form)
+    for name, df in [("questions", df_questions), ("options", df_options)]:
+        # NaN is not a valid cell value
+        df = df.astype(object).where(df.notna(), None)
+        write_sheet_rows(
+            workbook.add_worksheet(name),
+            list(df.columns),
+            df.itertuples(index=False, name=None),
+            header_format,
+        )
+
+
 def rearrange_definition_columns(col_names: list):
     col_question = list(filter(lambda x: x not in meta_columns, col_names))
     if len(col_question) == len(col_names):
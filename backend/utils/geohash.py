@@ -0,0 +1,78 @@
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_PRECISION = 12
+
+
+def encode(lat: float, lng: float, precision: int = GEOHASH_PRECISION) -> str:
+    """
+    Geohash of a point, bits interleave longitude then latitude
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(geohash) < precision:
+        coordinate, value_range = (lng, lng_range) if even else (
+            lat, lat_range
+        )
+        middle = (value_range[0] + value_range[1]) / 2
+        bits <<= 1
+        if coordinate >= middle:
+            bits |= 1
+            value_range[0] = middle
+        else:
+            value_range[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(geohash)
+
+
+def get_cell_size(precision: int):
+    """
+    Latitude and longitude span of the cells of a precision
+    """
+    lng_bits = (precision * 5 + 1) // 2
+    lat_bits = precision * 5 // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lng_bits)
+
+
+def get_geohash(geo) -> str:
+    """
+    Geohash of a [lat, lng] geo value, None when it is not a valid point
+    """
+    if not isinstance(geo, (list, tuple)) or len(geo) < 2:
+        return None
+    try:
+        lat, lng = float(geo[0]), float(geo[1])
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    return encode(lat, lng)
+
+
+def get_bbox_cells(
+    south: float, west: float, north: float, east: float, precision: int
+) -> list:
+    """
+    Geohash cells of a precision that cover a bounding box
+    """
+    lat_size, lng_size = get_cell_size(precision)
+    cells = set()
+    lat = south
+    while True:
+        lng = west
+        while True:
+            cells.add(encode(min(lat, 90.0), min(lng, 180.0), precision))
+            if lng >= east:
+                break
+            lng = min(lng + lng_size, east)
+        if lat >= north:
+            break
+        lat = min(lat + lat_size, north)
+    return sorted(cells)
@@ -17,6 +17,23 @@ def upload(file: str, folder: str = None, filename: str = None):
     return location
 
 
+def write(content: str, folder: str, filename: str):
+    # write straight into the storage folder, the rename keeps
+    # readers from seeing a half written file
+    Path(f"{STORAGE_PATH}/{folder}").mkdir(parents=True, exist_ok=True)
+    location = f"{STORAGE_PATH}/{folder}/{filename}"
+    tmp_location = f"{location}.{os.getpid()}.tmp"
+    with open(tmp_location, "w") as f:
+        f.write(content)
+    os.replace(tmp_location, location)
+    return location
+
+
+def read(url: str):
+    with open(f"{STORAGE_PATH}/{url}") as f:
+        return f.read()
+
+
 def delete(url: str):
     os.remove(f"{STORAGE_PATH}/{url}")
     return url